@@ -1,16 +1,39 @@
 ﻿#include <string>
+#include <cstring>
+#include <atomic>
 
 #include <GarrysMod/Lua/Interface.h>
 
 #include "_luastack.hpp"
 #include "valueconv.hpp"
 #include "stack_dump.hpp"
+#include "entity_batch.hpp"
+#include "trace_batch.hpp"
+#include "auto_pop.hpp"
+#include "method_cache.hpp"
+#include "lua_call.hpp"
+#include "realms.hpp"
+#include "gil_yield.hpp"
+#include "main_thread.hpp"
+#include "bridge_stats.hpp"
+#include "py_function_registry.hpp"
 
 using namespace GarrysMod::Lua;
 
-// Macro for retrieving ILuaBase from the module state
-#define MS_LUA (*reinterpret_cast<ILuaBase**>(PyModule_GetState(module)))
-#define Py_MODULE_FUNC(name) static PyObject *name(PyObject *module, PyObject *args)
+// Macros for retrieving the module state and ILuaBase from it
+#define MS (reinterpret_cast<LuastackState *>(PyModule_GetState(module)))
+#define MS_LUA (MS->lua)
+// Functions declared with Py_MODULE_FUNC raise RuntimeError if they are called from a thread other than the game one
+#define Py_MODULE_FUNC(name) \
+	static PyObject *name##Impl(PyObject *module, PyObject *args); \
+	static PyObject *name(PyObject *module, PyObject *args) { \
+		if (!checkMainThread()) \
+			return NULL; \
+		return name##Impl(module, args); \
+	} \
+	static PyObject *name##Impl(PyObject *module, PyObject *args)
+// Functions which don't use Lua and can be called from any thread
+#define Py_MODULE_FUNC_ANY_THREAD(name) static PyObject *name(PyObject *module, PyObject *args)
 
 // Function definitions
 
@@ -20,7 +43,14 @@ Py_MODULE_FUNC(init) {
 		return NULL;
 
     // Putting the pointer to ILuaBase to the module state
-	*reinterpret_cast<ILuaBase **>(PyModule_GetState(module)) = reinterpret_cast<ILuaBase *>(iLuaBasePtr);
+	MS_LUA = reinterpret_cast<ILuaBase *>(iLuaBasePtr);
+
+	std::string error;
+	if (!loadLuaHelpers(MS_LUA, MS->helperRefs, error)) {
+		PyErr_Format(PyExc_RuntimeError, "couldn't load the Lua helper library: %s", error.c_str());
+		return NULL;
+	}
+
 	Py_RETURN_NONE;
 }
 Py_MODULE_FUNC(top) {
@@ -122,22 +152,16 @@ Py_MODULE_FUNC(call) {
 	if (!PyArg_ParseTuple(args, "ii", &nArgs, &nResults))
 		return NULL;
 
+	countCrossing(COUNTER_LUA_CALL);
 	int errorResult = MS_LUA->PCall(nArgs, nResults, 0);
 	if (errorResult == 0)
 		Py_RETURN_NONE;
-	else {
-	    // Handling a Lua error by raising lua.LuaError
-		PyObject *luaModule = PyImport_ImportModule("pygmod.lua");
-		PyObject *luaErrorExc = PyObject_GetAttrString(luaModule, "LuaError");
-		PyErr_SetString(luaErrorExc, MS_LUA->GetString());
-		Py_DECREF(luaErrorExc);
-		Py_DECREF(luaModule);
-		MS_LUA->Pop();  // Popping the error message
-		return NULL;
-	}
+	else  // Handling a Lua error by raising lua.LuaError
+		return raiseLuaError(MS_LUA);
 }
 
 Py_MODULE_FUNC(referenceCreate) {
+	countCrossing(COUNTER_REFERENCE_CREATE);
 	return PyLong_FromLong(MS_LUA->ReferenceCreate());
 }
 Py_MODULE_FUNC(referencePush) {
@@ -157,10 +181,26 @@ Py_MODULE_FUNC(referenceFree) {
 		return NULL;
 
 	MS_LUA->ReferenceFree(ref);
+	countCrossing(COUNTER_REFERENCE_FREE);
 
 	Py_RETURN_NONE;
 }
 
+Py_MODULE_FUNC(helperRef) {
+	const char *name;
+
+	if (!PyArg_ParseTuple(args, "s", &name))
+		return NULL;
+
+	for (int i = 0; i < HELPER_COUNT; i++) {
+		if (strcmp(luaHelperNames[i], name) == 0)
+			return PyLong_FromLong(MS->helperRefs[i]);
+	}
+
+	PyErr_Format(PyExc_KeyError, "no such Lua helper: %s", name);
+	return NULL;
+}
+
 Py_MODULE_FUNC(convertLuaToPy) {
 	int stackIndex = -1;
 
@@ -176,11 +216,479 @@ Py_MODULE_FUNC(convertPyToLua) {
 		return NULL;
 
 	Py_INCREF(obj);
-	convertPyToLua(MS_LUA, obj);
+	bool converted = convertPyToLua(MS_LUA, obj);
 	Py_DECREF(obj);
+	if (!converted) {
+		MS_LUA->Pop();  // nil pushed in place of the object
+		return NULL;
+	}
+	Py_RETURN_NONE;
+}
+
+// Converts t[key] to Python, where t is the table on the top of the stack, and pops the table.
+static PyObject *getFromTableOnTop(ILuaBase *lua, PyObject *key) {
+	if (!convertPyToLua(lua, key)) {
+		lua->Pop(2);  // nil pushed in place of the key and the table
+		return NULL;
+	}
+	lua->GetTable(-2);
+	PyObject *value = convertLuaToPy(lua, -1);
+	lua->Pop(2);  // The value and the table
+	return value;
+}
+
+// Does t[key] = value, where t is the table on the top of the stack, and pops the table.
+// Returns false with a Python exception set if the key or the value couldn't be converted.
+static bool setToTableOnTop(ILuaBase *lua, PyObject *key, PyObject *value) {
+	int topBefore = lua->Top();
+	if (!convertPyToLua(lua, key) || !convertPyToLua(lua, value)) {
+		lua->Pop(lua->Top() - topBefore + 1);  // The converted values and the table
+		return false;
+	}
+	lua->SetTable(-3);
+	lua->Pop();  // The table
+	return true;
+}
+
+Py_MODULE_FUNC(tableGet) {
+	int ref;
+	PyObject *key;
+
+	if (!PyArg_ParseTuple(args, "iO", &ref, &key))
+		return NULL;
+
+	MS_LUA->ReferencePush(ref);
+	return getFromTableOnTop(MS_LUA, key);
+}
+Py_MODULE_FUNC(tableSet) {
+	int ref;
+	PyObject *key, *value;
+
+	if (!PyArg_ParseTuple(args, "iOO", &ref, &key, &value))
+		return NULL;
+
+	MS_LUA->ReferencePush(ref);
+	if (!setToTableOnTop(MS_LUA, key, value))
+		return NULL;
+	Py_RETURN_NONE;
+}
+Py_MODULE_FUNC(globalGet) {
+	PyObject *key;
+
+	if (!PyArg_ParseTuple(args, "O", &key))
+		return NULL;
+
+	MS_LUA->PushSpecial(SPECIAL_GLOB);
+	return getFromTableOnTop(MS_LUA, key);
+}
+Py_MODULE_FUNC(globalSet) {
+	PyObject *key, *value;
+
+	if (!PyArg_ParseTuple(args, "OO", &key, &value))
+		return NULL;
+
+	MS_LUA->PushSpecial(SPECIAL_GLOB);
+	if (!setToTableOnTop(MS_LUA, key, value))
+		return NULL;
+	Py_RETURN_NONE;
+}
+
+// Pushes the value at the dotted path, such as _G.net.WriteUInt, walking it from _G.
+// keys must be a tuple of strings.
+// Returns false with pygmod.lua.LuaError set and nothing pushed if an intermediate value can't be indexed.
+static bool pushGlobalPath(ILuaBase *lua, PyObject *keys) {
+	lua->PushSpecial(SPECIAL_GLOB);
+	for (Py_ssize_t i = 0; i < PyTuple_GET_SIZE(keys); i++) {
+		const char *key = PyUnicode_AsUTF8(PyTuple_GET_ITEM(keys, i));
+		if (key == NULL) {
+			lua->Pop();
+			return false;
+		}
+		int type = lua->GetType(-1);
+		if (type == Type::Nil || type == Type::Bool || type == Type::Number || type == Type::Function) {
+			// Indexing these would raise a Lua error outside of a protected call
+			std::string error = std::string("attempt to index a ") + lua->GetTypeName(type) + " value";
+			lua->Pop();
+			lua->PushString(error.c_str());
+			raiseLuaError(lua);
+			return false;
+		}
+		lua->GetField(-1, key);
+		lua->Remove(-2);  // The parent value
+	}
+	return true;
+}
+
+// Parses the keys tuple of path_get() and path_call().
+static PyObject *pathKeysArg(PyObject *args) {
+	PyObject *keys = PyTuple_Size(args) > 0 ? PyTuple_GET_ITEM(args, 0) : NULL;
+	if (keys == NULL || !PyTuple_Check(keys)) {
+		PyErr_SetString(PyExc_TypeError, "the first argument must be a tuple of keys");
+		return NULL;
+	}
+	return keys;
+}
+
+Py_MODULE_FUNC(rawEqual) {
+	PyObject *a, *b;
+
+	if (!PyArg_ParseTuple(args, "OO", &a, &b))
+		return NULL;
+
+	int topBefore = MS_LUA->Top();
+	if (!convertPyToLua(MS_LUA, a) || !convertPyToLua(MS_LUA, b)) {
+		MS_LUA->Pop(MS_LUA->Top() - topBefore);
+		return NULL;
+	}
+	bool equal = MS_LUA->RawEqual(-1, -2);
+	MS_LUA->Pop(2);
+	return PyBool_FromLong(equal);
+}
+
+Py_MODULE_FUNC(pathGet) {
+	PyObject *keys = pathKeysArg(args);
+	if (keys == NULL || !pushGlobalPath(MS_LUA, keys))
+		return NULL;
+
+	PyObject *value = convertLuaToPy(MS_LUA, -1);
+	MS_LUA->Pop();
+	return value;
+}
+Py_MODULE_FUNC(pathCall) {
+	PyObject *keys = pathKeysArg(args);
+	if (keys == NULL)
+		return NULL;
+
+	ILuaBase *lua = MS_LUA;
+	int topBefore = lua->Top();
+	if (!pushGlobalPath(lua, keys))
+		return NULL;
+	Py_ssize_t nArgs = PyTuple_GET_SIZE(args) - 1;
+	if (!pushPyArgs(lua, args, 1)) {
+		lua->Pop(lua->Top() - topBefore);  // The function and the arguments
+		return NULL;
+	}
+
+	countCrossing(COUNTER_LUA_CALL);
+	if (lua->PCall(static_cast<int>(nArgs), -1, 0) != 0)
+		return raiseLuaError(lua);
+
+	return popCallResults(lua, topBefore);
+}
+
+// Raises pygmod.lua.LuaError for the value on the top of the stack which can't be indexed and pops the value.
+// Always returns NULL.
+static PyObject *raiseIndexError(ILuaBase *lua) {
+	std::string error = std::string("attempt to index a ") + lua->GetTypeName(lua->GetType(-1)) + " value";
+	lua->Pop();  // The value
+	lua->PushString(error.c_str());
+	return raiseLuaError(lua);
+}
+
+Py_MODULE_FUNC(callMethod) {
+	PyObject *obj, *nameObj;
+	if (PyTuple_Size(args) < 2) {
+		PyErr_SetString(PyExc_TypeError, "call_method() takes at least 2 arguments (obj and name)");
+		return NULL;
+	}
+	obj = PyTuple_GET_ITEM(args, 0);
+	nameObj = PyTuple_GET_ITEM(args, 1);
+	const char *name = PyUnicode_AsUTF8(nameObj);
+	if (name == NULL)
+		return NULL;
+
+	ILuaBase *lua = MS_LUA;
+	int topBefore = lua->Top();
+	if (!convertPyToLua(lua, obj)) {
+		lua->Pop();  // nil pushed in place of the object
+		return NULL;
+	}
+	int objIndex = lua->Top();
+	if (!pushMethod(lua, objIndex, name))
+		return raiseIndexError(lua);
+
+	// Moving the method below the object, which becomes the self argument
+	lua->Insert(objIndex);
+	Py_ssize_t nArgs = PyTuple_GET_SIZE(args) - 2;
+	if (!pushPyArgs(lua, args, 2)) {
+		lua->Pop(lua->Top() - topBefore);  // The method, the object and the arguments
+		return NULL;
+	}
+
+	countCrossing(COUNTER_LUA_CALL);
+	if (lua->PCall(static_cast<int>(nArgs + 1), -1, 0) != 0)
+		return raiseLuaError(lua);
+
+	return popCallResults(lua, topBefore);
+}
+
+Py_MODULE_FUNC(callValueMethod) {
+	if (PyTuple_Size(args) < 2) {
+		PyErr_SetString(PyExc_TypeError, "call_value_method() takes at least 2 arguments (obj and name)");
+		return NULL;
+	}
+	PyObject *obj = PyTuple_GET_ITEM(args, 0);
+	const char *name = PyUnicode_AsUTF8(PyTuple_GET_ITEM(args, 1));
+	if (name == NULL)
+		return NULL;
+
+	ILuaBase *lua = MS_LUA;
+	if (!convertPyToLua(lua, obj)) {
+		lua->Pop();  // nil pushed in place of the object
+		return NULL;
+	}
+	// The value stays below the call, so the changes made to it by the method can be read back
+	int objIndex = lua->Top();
+	if (!pushMethod(lua, objIndex, name))
+		return raiseIndexError(lua);
+	lua->Push(objIndex);  // The self argument
+
+	Py_ssize_t nArgs = PyTuple_GET_SIZE(args) - 2;
+	if (!pushPyArgs(lua, args, 2)) {
+		lua->Pop(lua->Top() - objIndex + 1);  // The value, the method, self and the arguments
+		return NULL;
+	}
+
+	countCrossing(COUNTER_LUA_CALL);
+	if (lua->PCall(static_cast<int>(nArgs + 1), -1, 0) != 0) {
+		raiseLuaError(lua);
+		lua->Pop();  // The value
+		return NULL;
+	}
+
+	PyObject *result = popCallResults(lua, objIndex);
+	PyObject *updated = result == NULL ? NULL : convertLuaToPy(lua, objIndex);
+	lua->Pop();  // The value
+	if (updated == NULL) {
+		Py_XDECREF(result);
+		return NULL;
+	}
+	return Py_BuildValue("(NN)", updated, result);
+}
+
+Py_MODULE_FUNC(mapCall) {
+	PyObject *func, *argTuples;
+
+	if (!PyArg_ParseTuple(args, "OO", &func, &argTuples))
+		return NULL;
+
+	PyObject *iterator = PyObject_GetIter(argTuples);
+	if (iterator == NULL)
+		return NULL;
+	PyObject *results = PyList_New(0);
+	if (results == NULL) {
+		Py_DECREF(iterator);
+		return NULL;
+	}
+
+	ILuaBase *lua = MS_LUA;
+	if (!convertPyToLua(lua, func)) {
+		lua->Pop();  // nil pushed in place of the function
+		Py_DECREF(results);
+		Py_DECREF(iterator);
+		return NULL;
+	}
+	int funcIndex = lua->Top();
+
+	PyObject *item;
+	while ((item = PyIter_Next(iterator)) != NULL) {
+		// A single argument doesn't have to be wrapped in a tuple
+		PyObject *callArgs = PyTuple_Check(item) ? item : PyTuple_Pack(1, item);
+		PyObject *result = callArgs == NULL ? NULL : callLuaValue(lua, funcIndex, callArgs);
+		if (callArgs != item)
+			Py_XDECREF(callArgs);
+		Py_DECREF(item);
+
+		if (result == NULL || PyList_Append(results, result) < 0) {
+			Py_XDECREF(result);
+			Py_CLEAR(results);
+			break;
+		}
+		Py_DECREF(result);
+	}
+
+	lua->Pop();  // The function
+	Py_DECREF(iterator);
+	if (results != NULL && PyErr_Occurred())  // The iterator has raised an exception
+		Py_CLEAR(results);
+	return results;
+}
+
+Py_MODULE_FUNC(tableToDict) {
+	int ref, maxDepth = 0;
+
+	if (!PyArg_ParseTuple(args, "i|i", &ref, &maxDepth))
+		return NULL;
+
+	MS_LUA->ReferencePush(ref);
+	PyObject *dict = convertLuaTableToDict(MS_LUA, -1, maxDepth);
+	MS_LUA->Pop();
+	return dict;
+}
+Py_MODULE_FUNC(tableUpdate) {
+	int ref, recursive = 0, maxDepth = 32;
+	PyObject *mapping;
+
+	if (!PyArg_ParseTuple(args, "iO|pi", &ref, &mapping, &recursive, &maxDepth))
+		return NULL;
+
+	MS_LUA->ReferencePush(ref);
+	bool success = updateLuaTable(MS_LUA, -1, mapping, recursive, maxDepth);
+	MS_LUA->Pop();
+	if (!success)
+		return NULL;
+	Py_RETURN_NONE;
+}
+
+Py_MODULE_FUNC(entityBatch) {
+	const char *method;
+	int width;
+	PyObject *entities, *out;
+
+	if (!PyArg_ParseTuple(args, "siOO", &method, &width, &entities, &out))
+		return NULL;
+
+	Py_ssize_t count = fillEntityBatch(MS_LUA, method, width, entities, out);
+	if (count < 0)
+		return NULL;
+	return PyLong_FromSsize_t(count);
+}
+
+Py_MODULE_FUNC(traceBatch) {
+	TraceBatchArgs traceArgs;
+	int hull;
+
+	if (!PyArg_ParseTuple(args, "pOOOOOOOOOO", &hull, &traceArgs.starts, &traceArgs.ends,
+	                      &traceArgs.mask, &traceArgs.filter, &traceArgs.mins, &traceArgs.maxs,
+	                      &traceArgs.hitPos, &traceArgs.fraction, &traceArgs.normal, &traceArgs.entity))
+		return NULL;
+	traceArgs.hull = hull;
+
+	Py_ssize_t count = runTraceBatch(MS_LUA, traceArgs);
+	if (count < 0)
+		return NULL;
+	return PyLong_FromSsize_t(count);
+}
+
+Py_MODULE_FUNC_ANY_THREAD(interpreterSwaps) {
+	return PyLong_FromUnsignedLongLong(getInterpreterSwapCount());
+}
+
+Py_MODULE_FUNC(registryStats) {
+	return Py_BuildValue("{s:n,s:n,s:n}",
+		"live", static_cast<Py_ssize_t>(pyFunctionRegistry.liveCount()),
+		"freed", static_cast<Py_ssize_t>(pyFunctionRegistry.freedCount()),
+		"peak", static_cast<Py_ssize_t>(pyFunctionRegistry.peakCount()));
+}
+
+Py_MODULE_FUNC_ANY_THREAD(bridgeStats) {
+	return bridgeStatsDict();
+}
+
+Py_MODULE_FUNC(pySetCallSiteTracking) {
+	PyObject *prefixObj;
+	if (!PyArg_ParseTuple(args, "O", &prefixObj))
+		return NULL;
+
+	if (prefixObj == Py_None) {
+		setCallSiteTracking(nullptr);
+		Py_RETURN_NONE;
+	}
+	const char *prefix = PyUnicode_AsUTF8(prefixObj);
+	if (prefix == NULL)
+		return NULL;
+	setCallSiteTracking(prefix);
+	Py_RETURN_NONE;
+}
+
+Py_MODULE_FUNC(callSites) {
+	int reset = 0;
+	if (!PyArg_ParseTuple(args, "|p", &reset))
+		return NULL;
+
+	PyObject *result = callSitesDict();
+	if (result != NULL && reset)
+		clearCallSites();
+	return result;
+}
+
+Py_MODULE_FUNC(setGilYield) {
+	PyObject *windowObj;
+	if (!PyArg_ParseTuple(args, "O", &windowObj))
+		return NULL;
+
+	bool enabled = windowObj != Py_None;
+	double window = 0;
+	if (enabled) {
+		window = PyFloat_AsDouble(windowObj);
+		if (window == -1 && PyErr_Occurred())
+			return NULL;
+		if (window < 0 || window > 1) {
+			PyErr_SetString(PyExc_ValueError, "the window must be between 0 and 1 second");
+			return NULL;
+		}
+	}
+
+	if (enabled != MS->gilYieldEnabled && !setGilYieldHook(MS_LUA, enabled))
+		return NULL;
+	MS->gilYieldEnabled = enabled;
+	MS->gilYieldWindow = window;
+	Py_RETURN_NONE;
+}
+
+Py_MODULE_FUNC_ANY_THREAD(gilYieldStats) {
+	int reset = 0;
+	if (!PyArg_ParseTuple(args, "|p", &reset))
+		return NULL;
+
+	GilYieldStats &stats = MS->gilYieldStats;
+	PyObject *result = Py_BuildValue("(Kddd)", stats.yields, stats.releasedSeconds,
+	                                  stats.waitSeconds, stats.maxWaitSeconds);
+	if (result != NULL && reset)
+		stats = GilYieldStats{};
+	return result;
+}
+
+Py_MODULE_FUNC(setWatchdog) {
+	PyObject *thresholdObj;
+	if (!PyArg_ParseTuple(args, "O", &thresholdObj))
+		return NULL;
+
+	if (thresholdObj == Py_None) {
+		MS->watchdog.enabled = false;
+		Py_RETURN_NONE;
+	}
+	double threshold = PyFloat_AsDouble(thresholdObj);
+	if (threshold == -1 && PyErr_Occurred())
+		return NULL;
+	if (threshold < 0) {
+		PyErr_SetString(PyExc_ValueError, "the threshold can't be negative");
+		return NULL;
+	}
+	MS->watchdog.thresholdSeconds = threshold;
+	MS->watchdog.enabled = true;
 	Py_RETURN_NONE;
 }
 
+Py_MODULE_FUNC(watchdogStats) {
+	int reset = 0;
+	if (!PyArg_ParseTuple(args, "|p", &reset))
+		return NULL;
+
+	PyObject *result = watchdogStatsList(MS->watchdog);
+	if (result != NULL && reset)
+		clearWatchdogStats(MS->watchdog);
+	return result;
+}
+
+Py_MODULE_FUNC_ANY_THREAD(pyWatchdogCurrent) {
+	return watchdogCurrent(MS->watchdog);
+}
+
+Py_MODULE_FUNC_ANY_THREAD(pyIsMainThread) {
+	return PyBool_FromLong(isMainThread());
+}
+
 Py_MODULE_FUNC(pyStackDump) {
 	stackDump(MS_LUA);
 
@@ -190,31 +698,39 @@ Py_MODULE_FUNC(pyStackDump) {
 static PyMethodDef methods[] = {
 	{"init", init, METH_VARARGS,
 	 PyDoc_STR("init(lua_base_ptr: int) -> None\n" \
-	 "Initializes the module. Sets the internal ILuaBase pointer to lua_base_ptr.")},
+	 "Initializes the module. Sets the internal ILuaBase pointer to lua_base_ptr and loads the " \
+	 "Lua helper library.")},
 
 	{"top", top, METH_NOARGS,
 	 "top() -> int\n" \
 	 PyDoc_STR("Returns the index of the top element in the stack." \
-	 "Because indices start at 1, this result is equal to the number of elements in the stack (and so 0 means an empty stack).")},
+	 "Because indices start at 1, this result is equal to the number of elements in the stack " \
+	 "(and so 0 means an empty stack).")},
 	{"pop", pop, METH_VARARGS,
 	 PyDoc_STR("pop(amount: int = 1) -> None\n" \
 	 "Pops 'amount' elements from the stack.")},
 	{"get_table", getTable, METH_VARARGS,
 	 PyDoc_STR("get_table(stack_index: int) -> None\n" \
-	 "Pushes onto the stack the value t[k], where t is the value at the given valid index and k is the value at the top of the stack.\n\n" \
-     "This function pops the key from the stack (putting the resulting value in its place). As in Lua, this function may trigger a metamethod for the \"index\" event.")},
+	 "Pushes onto the stack the value t[k], where t is the value at the given valid index and k " \
+	 "is the value at the top of the stack.\n\n" \
+     "This function pops the key from the stack (putting the resulting value in its place). As " \
+     "in Lua, this function may trigger a metamethod for the \"index\" event.")},
 	{"get_field", getField, METH_VARARGS,
 	 PyDoc_STR("get_field(stack_index: int, name: str) -> None\n" \
-	 "Pushes onto the stack the value t[name], where t is the value at the given valid stack index. " \
-	 "As in Lua, this function may trigger a metamethod for the \"index\" event.")},
+	 "Pushes onto the stack the value t[name], where t is the value at the given valid stack " \
+	 "index. As in Lua, this function may trigger a metamethod for the \"index\" event.")},
 	{"set_table", setTable, METH_VARARGS,
 	 PyDoc_STR("set_table(stack_index: int) -> None\n" \
-	 "Does the equivalent to t[k] = v, where t is the value at the given valid index, v is the value at the top of the stack, and k is the value just below the top.\n\n" \
-     "This function pops both the key and the value from the stack. As in Lua, this function may trigger a metamethod for the \"newindex\" event.")},
+	 "Does the equivalent to t[k] = v, where t is the value at the given valid index, v is the " \
+	 "value at the top of the stack, and k is the value just below the top.\n\n" \
+     "This function pops both the key and the value from the stack. As in Lua, this function may " \
+     "trigger a metamethod for the \"newindex\" event.")},
 	{"set_field", setField, METH_VARARGS,
 	 PyDoc_STR("set_field(stack_index: int, name: str) -> None\n" \
-	 "Does the equivalent to t[k] = v, where t is the value at the given valid index and v is the value at the top of the stack.\n\n" \
-	 "This function pops the value from the stack. As in Lua, this function may trigger a metamethod for the \"newindex\" event.")},
+	 "Does the equivalent to t[k] = v, where t is the value at the given valid index and v is " \
+	 "the value at the top of the stack.\n\n" \
+	 "This function pops the value from the stack. As in Lua, this function may trigger a " \
+	 "metamethod for the \"newindex\" event.")},
 	{"push", push, METH_VARARGS,
 	 PyDoc_STR("push(stack_index: int) -> None\n" \
 	 "Pushes a copy of the element at the given valid index onto the stack.")},
@@ -230,7 +746,8 @@ static PyMethodDef methods[] = {
 	{"next", next, METH_VARARGS,
 	 PyDoc_STR("next(stack_index: int) -> int\n" \
 	 "Pops a key from the stack, and pushes a key-value pair from the table at the given index " \
-     "(the \"next\" pair after the given key). If there are no more elements in the table, then next() returns 0 (and pushes nothing).")},
+     "(the \"next\" pair after the given key). If there are no more elements in the table, then " \
+     "next() returns 0 (and pushes nothing).")},
 	{"get_type", getType, METH_VARARGS,
 	 PyDoc_STR("get_type(stack_index: int) -> str\n" \
 	 "Returns the name of the type of the Lua value at the given stack index.")},
@@ -238,13 +755,16 @@ static PyMethodDef methods[] = {
 	{"call", call, METH_VARARGS,
 	 PyDoc_STR("call(args: int, results: int) -> None\n" \
 	 "Calls a function.\n\n" \
-	 "To call a function you must use the following protocol: first, the function to be called is pushed onto the stack; " \
-	 "then, the arguments to the function are pushed in direct order; that is, the first argument is pushed first. " \
-	 "Finally you call '_luastack.call'; 'args' is the number of arguments that you pushed onto the stack.\n\n" \
-	 "All arguments and the function value are popped from the stack when the function is called. " \
-	 "The function results are pushed onto the stack when the function returns. The number of results is adjusted to 'results', unless 'results' is -1. " \
-	 "In this case, all results from the function are pushed. The function results are pushed onto the stack in direct order " \
-	 "(the first result is pushed first), so that after the call the last result is on the top of the stack.")},
+	 "To call a function you must use the following protocol: first, the function to be called " \
+	 "is pushed onto the stack; then, the arguments to the function are pushed in direct order; " \
+	 "that is, the first argument is pushed first. Finally you call '_luastack.call'; 'args' is " \
+	 "the number of arguments that you pushed onto the stack.\n\n" \
+	 "All arguments and the function value are popped from the stack when the function is " \
+	 "called. The function results are pushed onto the stack when the function returns. The " \
+	 "number of results is adjusted to 'results', unless 'results' is -1. In this case, all " \
+	 "results from the function are pushed. The function results are pushed onto the stack in " \
+	 "direct order (the first result is pushed first), so that after the call the last result is " \
+	 "on the top of the stack.")},
 
 	{"reference_create", referenceCreate, METH_NOARGS,
 	 PyDoc_STR("reference_create() -> int\n" \
@@ -257,44 +777,353 @@ static PyMethodDef methods[] = {
 	 PyDoc_STR("reference_free(ref: int) -> None\n" \
 	 "Frees the reference ref.")},
 
+	{"helper_ref", helperRef, METH_VARARGS,
+	 PyDoc_STR("helper_ref(name: str) -> int\n" \
+	 "Returns the reference to the function 'name' of the Lua helper library, " \
+	 "which is loaded by init().\n" \
+	 "The reference is owned by the module and must not be freed.")},
+
 	{"convert_lua_to_py", convertLuaToPy, METH_VARARGS,
 	 PyDoc_STR("convert_lua_to_py(stack_index: int = -1) -> object\n" \
 	 "Converts a Lua value on the given index of the stack to a Python value and returns it.\n" \
-     "Raises NotImplementedError if Lua to Python conversion for this value type is not supported yet.")},
+     "Raises NotImplementedError " \
+     "if Lua to Python conversion for this value type is not supported yet.")},
 	{"convert_py_to_lua", convertPyToLua, METH_VARARGS,
 	 PyDoc_STR("convert_py_to_lua(o) -> None\n" \
 	 "Converts a Python object to a Lua object and pushes it to the stack.")},
 
+	{"table_get", tableGet, METH_VARARGS,
+	 PyDoc_STR("table_get(ref: int, key) -> object\n" \
+	 "Returns t[key], where t is the value which the reference ref points to. Leaves the stack " \
+	 "unchanged. As in Lua, this function may trigger a metamethod for the \"index\" event.")},
+	{"table_set", tableSet, METH_VARARGS,
+	 PyDoc_STR("table_set(ref: int, key, value) -> None\n" \
+	 "Does the equivalent to t[key] = value, where t is the value which the reference ref points " \
+	 "to. Leaves the stack unchanged. As in Lua, this function may trigger a metamethod for the " \
+	 "\"newindex\" event.")},
+	{"global_get", globalGet, METH_VARARGS,
+	 PyDoc_STR("global_get(key) -> object\n" \
+	 "Returns _G[key]. Leaves the stack unchanged.")},
+	{"global_set", globalSet, METH_VARARGS,
+	 PyDoc_STR("global_set(key, value) -> None\n" \
+	 "Does the equivalent to _G[key] = value. Leaves the stack unchanged.")},
+
+	{"raw_equal", rawEqual, METH_VARARGS,
+	 PyDoc_STR("raw_equal(a, b) -> bool\n" \
+	 "Converts a and b to Lua values and returns whether they are primitively equal (without " \
+	 "calling the __eq metamethod), like rawequal() in Lua. " \
+	 "Wrappers of the same Lua table are equal.")},
+
+	{"path_get", pathGet, METH_VARARGS,
+	 PyDoc_STR("path_get(keys: tuple) -> object\n" \
+	 "Returns the value at the path of global keys, e.g. ('net', 'WriteUInt') for net.WriteUInt. " \
+	 "The path is walked from _G in a single call without wrapping the intermediate tables. " \
+	 "Raises pygmod.lua.LuaError if an intermediate value can't be indexed.")},
+	{"path_call", pathCall, METH_VARARGS,
+	 PyDoc_STR("path_call(keys: tuple, *args) -> object\n" \
+	 "Calls the value at the path of global keys with args in a single call. " \
+	 "Returns None, the only result or a tuple of results. " \
+	 "Raises pygmod.lua.LuaError on Lua errors.")},
+
+	{"call_method", callMethod, METH_VARARGS,
+	 PyDoc_STR("call_method(obj, name: str, *args) -> object\n" \
+	 "Does obj:name(*args) in a single call. Methods of userdata are looked up in the metatable " \
+	 "and its MetaBaseClass chain through a per-metatable cache, so e.g. all players share the " \
+	 "resolved method; other values and names which no metatable defines are looked up normally. " \
+	 "Returns None, the only result or a tuple of results. " \
+	 "Raises pygmod.lua.LuaError on Lua errors.")},
+
+	{"call_value_method", callValueMethod, METH_VARARGS,
+	 PyDoc_STR("call_value_method(obj, name: str, *args) -> tuple\n" \
+	 "Converts obj, usually a pygmod.valuetypes value, to Lua and does obj:name(*args) like " \
+	 "call_method(). Returns (obj after the call, converted back to Python, result), so the " \
+	 "changes which the method has made to the Lua copy can be copied back.")},
+
+	{"map_call", mapCall, METH_VARARGS,
+	 PyDoc_STR("map_call(func, arg_tuples) -> list\n" \
+	 "Calls the Lua function func once for every tuple of arguments from the iterable arg_tuples " \
+	 "in a single call and returns the list of results. Items which are not tuples are passed as " \
+	 "the only argument. Stops and raises pygmod.lua.LuaError on the first Lua error.")},
+
+	{"table_to_dict", tableToDict, METH_VARARGS,
+	 PyDoc_STR("table_to_dict(ref: int, max_depth: int = 0) -> dict\n" \
+	 "Converts the table which the reference ref points to, to a dict in a single call.\n" \
+	 "Nested tables are converted to dicts too until they are max_depth levels deep, deeper ones " \
+	 "are wrapped in pygmod.lua.Table. A table which occurs several times (or contains itself) " \
+	 "is converted to a single shared dict.")},
+	{"table_update", tableUpdate, METH_VARARGS,
+	 PyDoc_STR("table_update(ref: int, mapping, recursive: bool = False, max_depth: int = 32) -> None\n" \
+	 "Sets every key-value pair of mapping to the table which the reference ref points to, " \
+	 "in a single call.\n" \
+	 "If recursive is True, nested dicts, lists and tuples are converted to Lua tables instead " \
+	 "of being wrapped in PyObject userdata. Containers nested more than max_depth levels deep " \
+	 "raise RecursionError.")},
+
+	{"entity_batch", entityBatch, METH_VARARGS,
+	 PyDoc_STR("entity_batch(method: str, width: int, entities, out) -> int\n" \
+	 "Calls Entity.<method>(ent) for every entity and writes 'width' values of every result to " \
+	 "the buffer 'out' in a single call. 'entities' is a reference to a sequential table of " \
+	 "entities or a sequence of Lua objects. 'out' must be a writable C-contiguous buffer of " \
+	 "doubles, floats or integers. Values of the entities for which the call fails are set to " \
+	 "NaN (0 in integer buffers).\n" \
+	 "Returns the number of entities.")},
+
+	{"trace_batch", traceBatch, METH_VARARGS,
+	 PyDoc_STR("trace_batch(hull: bool, starts, ends, mask, filter, mins, maxs, hit_pos, " \
+	 "fraction, normal, entity) -> int\n" \
+	 "Runs util.TraceLine (or util.TraceHull if hull is True) for every pair of points from the " \
+	 "buffers starts and ends (3 numbers per point), reusing the same trace structure and result " \
+	 "table. mask, filter, mins and maxs are shared by all traces and are not set if None. " \
+	 "The results are written to the buffers hit_pos and normal (3 numbers per trace), fraction " \
+	 "and entity (the hit entity index or -1); outputs which are None are skipped.\n" \
+	 "Returns the number of traces.")},
+
+	{"interpreter_swaps", interpreterSwaps, METH_NOARGS,
+	 PyDoc_STR("interpreter_swaps() -> int\n" \
+	 "Returns how many times a call from Lua has swapped the current Python interpreter to the " \
+	 "one of the other realm. Calls into the interpreter which is already current don't swap it.")},
+
+	{"registry_stats", registryStats, METH_NOARGS,
+	 PyDoc_STR("registry_stats() -> dict\n" \
+	 "Returns {\"live\": ..., \"freed\": ..., \"peak\": ...}, the statistics of Python functions " \
+	 "passed to Lua, the same as py.RegistryStats() returns in Lua.")},
+
+	{"bridge_stats", bridgeStats, METH_NOARGS,
+	 PyDoc_STR("bridge_stats() -> dict\n" \
+	 "Returns {name: (total, rate)} of every bridge crossing counter: conversions between Python " \
+	 "and Lua values, calls of Lua functions from Python and of Python functions from Lua, Lua " \
+	 "reference creations and frees and interpreter swaps. rate is the number of crossings per " \
+	 "second measured over the last second. The counters are shared by both realms. Can be " \
+	 "called from any thread.")},
+
+	{"set_call_site_tracking", pySetCallSiteTracking, METH_VARARGS,
+	 PyDoc_STR("set_call_site_tracking(skip_prefix: str | None) -> None\n" \
+	 "Starts attributing every crossing to the innermost Python frame whose file name doesn't " \
+	 "start with skip_prefix, or stops if skip_prefix is None. Clears the collected call sites.")},
+
+	{"call_sites", callSites, METH_VARARGS,
+	 PyDoc_STR("call_sites(reset=False) -> dict\n" \
+	 "Returns {\"file:line\": {name: count}} of the crossings attributed to Python call sites. " \
+	 "Clears them if reset is True.")},
+
+	{"set_gil_yield", setGilYield, METH_VARARGS,
+	 PyDoc_STR("set_gil_yield(window: float | None) -> None\n" \
+	 "Makes a Think hook release the GIL of this interpreter for up to window seconds every frame, " \
+	 "so other Python threads can run. The window ends at once if no thread takes the GIL. 0 releases the GIL and takes it back immediately. " \
+	 "None removes the hook.")},
+
+	{"gil_yield_stats", gilYieldStats, METH_VARARGS,
+	 PyDoc_STR("gil_yield_stats(reset=False) -> (int, float, float, float)\n" \
+	 "Returns the number of GIL yields, the total time the GIL was released, " \
+	 "and the total and maximum time spent waiting to take it back after the window, in seconds. " \
+	 "Resets the statistics if reset is True.")},
+
+	{"set_watchdog", setWatchdog, METH_VARARGS,
+	 PyDoc_STR("set_watchdog(threshold: float | None) -> None\n" \
+	 "Starts timing every Python callback called from Lua, reporting the calls which take longer " \
+	 "than threshold seconds to pygmod.watchdog. None stops timing.")},
+
+	{"watchdog_stats", watchdogStats, METH_VARARGS,
+	 PyDoc_STR("watchdog_stats(reset=False) -> list\n" \
+	 "Returns (name, calls, total seconds, max seconds, histogram) of every timed callable. " \
+	 "The histogram counts the calls by duration, see watchdog_bucket_bounds. " \
+	 "Resets the statistics if reset is True.")},
+
+	{"watchdog_current", pyWatchdogCurrent, METH_NOARGS,
+	 PyDoc_STR("watchdog_current() -> (int, float) | None\n" \
+	 "Returns the sequence number and the elapsed seconds of the running timed callback or None. " \
+	 "Can be called from any thread.")},
+
+	{"is_main_thread", pyIsMainThread, METH_NOARGS,
+	 PyDoc_STR("is_main_thread() -> bool\n" \
+	 "Returns True if called from the game thread. Other functions of this module, " \
+	 "except interpreter_swaps(), bridge_stats(), gil_yield_stats() and watchdog_current(), " \
+	 "raise RuntimeError in other threads.")},
+
 	{"stack_dump", pyStackDump, METH_NOARGS,
 	 PyDoc_STR("stack_dump() -> None\n" \
-	 "Performs a Lua stack dump. Logs the type and the string representation of every stack object.")},
+	 "Performs a Lua stack dump. " \
+	 "Logs the type and the string representation of every stack object.")},
 
 	{NULL, NULL, 0, NULL}
 };
 
+// Drops every class cached by getCachedTypes().
+static void clearCachedTypes(LuastackState *state) {
+	Py_CLEAR(state->tableType);
+	Py_CLEAR(state->callableType);
+	Py_CLEAR(state->refAttrName);
+	Py_CLEAR(state->vectorType);
+	Py_CLEAR(state->angleType);
+	Py_CLEAR(state->colorType);
+}
+
+// Key of the _luastack module in the dict of its interpreter
+#define INTERPRETER_DICT_KEY "pygmod._luastack"
+
+// Incremented whenever a _luastack module is freed, invalidating the lookup caches of all threads
+static std::atomic<unsigned long> moduleGeneration{0};
+
+// The last module state returned by getLuastackState() on this thread
+struct StateCache {
+	PyInterpreterState *interp;
+	unsigned long generation;
+	LuastackState *state;
+};
+static thread_local StateCache stateCache = {nullptr, 0, nullptr};
+
+// Runs once per interpreter which imports _luastack.
+static int execModule(PyObject *module) {
+	PyObject *autoPopType = createAutoPopType(module);
+	if (autoPopType == NULL || PyModule_AddObject(module, "auto_pop", autoPopType) < 0) {
+		Py_XDECREF(autoPopType);
+		return -1;
+	}
+	PyObject *luaCallableType = createLuaCallableType(module);
+	if (luaCallableType == NULL || PyModule_AddObject(module, "LuaCallable", luaCallableType) < 0) {
+		Py_XDECREF(luaCallableType);
+		return -1;
+	}
+
+	PyObject *bounds = PyTuple_New(WATCHDOG_BUCKETS - 1);
+	if (bounds == NULL)
+		return -1;
+	for (int i = 0; i < WATCHDOG_BUCKETS - 1; i++)
+		PyTuple_SET_ITEM(bounds, i, PyFloat_FromDouble(watchdogBucketBounds[i]));
+	if (PyModule_AddObject(module, "watchdog_bucket_bounds", bounds) < 0) {
+		Py_DECREF(bounds);
+		return -1;
+	}
+
+	PyObject *counterNames = PyTuple_New(COUNTER_COUNT);
+	if (counterNames == NULL)
+		return -1;
+	for (int i = 0; i < COUNTER_COUNT; i++) {
+		PyObject *name = PyUnicode_FromString(bridgeCounterNames[i]);
+		if (name == NULL) {
+			Py_DECREF(counterNames);
+			return -1;
+		}
+		PyTuple_SET_ITEM(counterNames, i, name);
+	}
+	if (PyModule_AddObject(module, "bridge_counter_names", counterNames) < 0) {
+		Py_DECREF(counterNames);
+		return -1;
+	}
+
+	// PyState_FindModule() doesn't support multi-phase initialization,
+	// so the module is stored where getLuastackState() can find it
+	PyObject *interpDict = PyInterpreterState_GetDict(PyInterpreterState_Get());
+	if (interpDict == NULL) {
+		PyErr_SetString(PyExc_RuntimeError, "the interpreter has no dict");
+		return -1;
+	}
+	return PyDict_SetItemString(interpDict, INTERPRETER_DICT_KEY, module);
+}
+
+static void freeModule(void *moduleObject) {
+	PyObject *module = reinterpret_cast<PyObject *>(moduleObject);
+	moduleGeneration++;
+	LuastackState *state = MS;
+	if (state == NULL)
+		return;
+	clearCachedTypes(state);
+	clearWatchdogStats(state->watchdog);
+}
+
+static PyModuleDef_Slot slots[] = {
+	{Py_mod_exec, reinterpret_cast<void *>(execModule)},
+#if PY_VERSION_HEX >= 0x030C0000
+	// The module state is per interpreter, but process-wide C++ state (pyFunctionRegistry, the realm cache,
+	// the bridge counters) is shared by the interpreters without synchronization. It's safe while they share
+	// one GIL, so per-interpreter GIL support isn't declared until that state is per interpreter too.
+	{Py_mod_multiple_interpreters, Py_MOD_MULTIPLE_INTERPRETERS_SUPPORTED},
+#endif
+	{0, NULL}
+};
+
 static PyModuleDef luastackModule = {
 	PyModuleDef_HEAD_INIT,
 	"_luastack",
-	PyDoc_STR("Functions for manipulating the Lua stack. The lowest level of Garry's Mod Lua interoperability.\n\n" \
+	PyDoc_STR("Functions for manipulating the Lua stack. The lowest level of Garry's Mod Lua " \
+              "interoperability.\n\n" \
 
               "Lua uses a virtual stack to pass values to and from C.\n" \
               "Each element in this stack represents a Lua value(nil, number, string, etc.).\n\n" \
 
-              "For convenience, most query operations in the API do not follow a strict stack discipline.\n" \
+              "For convenience, most query operations in the API do not follow a strict stack " \
+              "discipline.\n" \
               "Instead, they can refer to any element in the stack by using an index:\n\n" \
 
               "- A positive index represents an absolute stack position (starting at 1)\n" \
               "- A negative index represents an offset relative to the top of the stack.\n\n" \
 
-              "More specifically, if the stack has **n** elements, then index 1 represents the first element\n" \
-              "(that is, the element that was pushed onto the stack first) and index n represents the last element;\n" \
+              "More specifically, if the stack has **n** elements, then index 1 represents the " \
+              "first element\n" \
+              "(that is, the element that was pushed onto the stack first) and index n " \
+              "represents the last element;\n" \
               "index -1 also represents the last element (that is, the element at the top)\n" \
               "and index -n represents the first element.\n" \
-              "We say that an index is valid if it lies between 1 and the stack top (that is, if 1 ≤ abs(index) ≤ top)."),
-	sizeof(ILuaBase *),
-	methods
+              "We say that an index is valid if it lies between 1 and the stack top (that is, if " \
+              "1 ≤ abs(index) ≤ top)."),
+	sizeof(LuastackState),
+	methods,
+	slots,
+	NULL,  // m_traverse
+	NULL,  // m_clear
+	freeModule
 };
 
 PyMODINIT_FUNC PyInit__luastack() {
-	return PyModule_Create(&luastackModule);
+	return PyModuleDef_Init(&luastackModule);
+}
+
+LuastackState *getLuastackState() {
+	PyInterpreterState *interp = PyInterpreterState_Get();
+	unsigned long generation = moduleGeneration.load(std::memory_order_relaxed);
+	if (stateCache.interp == interp && stateCache.generation == generation)
+		return stateCache.state;
+
+	PyObject *interpDict = PyInterpreterState_GetDict(interp);
+	PyObject *module = interpDict == NULL ? NULL : PyDict_GetItemString(interpDict, INTERPRETER_DICT_KEY);
+	if (module == NULL)
+		return nullptr;
+
+	stateCache = {interp, generation, MS};
+	return stateCache.state;
+}
+
+LuastackState *getCachedTypes() {
+	LuastackState *state = getLuastackState();
+	if (state == nullptr) {
+		PyErr_SetString(PyExc_ImportError, "_luastack is not imported");
+		return nullptr;
+	}
+	if (state->tableType != NULL)
+		return state;
+
+	PyObject *luaModule = PyImport_ImportModule("pygmod.lua");
+	if (luaModule == NULL)
+		return nullptr;
+	PyObject *valuetypesModule = PyImport_ImportModule("pygmod.valuetypes");
+	if (valuetypesModule == NULL) {
+		Py_DECREF(luaModule);
+		return nullptr;
+	}
+
+	state->tableType = PyObject_GetAttrString(luaModule, "Table");
+	state->callableType = PyObject_GetAttrString(luaModule, "CallableLuaObject");
+	state->refAttrName = PyUnicode_InternFromString("_ref");
+	state->vectorType = PyObject_GetAttrString(valuetypesModule, "Vector");
+	state->angleType = PyObject_GetAttrString(valuetypesModule, "Angle");
+	state->colorType = PyObject_GetAttrString(valuetypesModule, "Color");
+	Py_DECREF(luaModule);
+	Py_DECREF(valuetypesModule);
+
+	if (state->tableType == NULL || state->callableType == NULL || state->refAttrName == NULL
+			|| state->vectorType == NULL || state->angleType == NULL || state->colorType == NULL) {
+		clearCachedTypes(state);
+		return nullptr;
+	}
+	return state;
 }
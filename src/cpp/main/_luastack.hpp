@@ -2,5 +2,47 @@
 
 #pragma once
 #include <Python.h>
+#include <GarrysMod/Lua/Interface.h>
+
+#include "lua_helpers.hpp"
+#include "gil_yield.hpp"
+#include "watchdog.hpp"
+
+using namespace GarrysMod::Lua;
+
+// Per-interpreter state of the _luastack module.
+struct LuastackState {
+	ILuaBase *lua;
+	// References to the functions of the Lua helper library, indexed by LuaHelper
+	int helperRefs[HELPER_COUNT];
+
+	// Classes used by the value conversion, cached by getCachedTypes()
+	PyObject *tableType;  // pygmod.lua.Table
+	PyObject *callableType;  // pygmod.lua.CallableLuaObject
+	PyObject *refAttrName;  // "_ref"
+	PyObject *vectorType;  // pygmod.valuetypes.Vector
+	PyObject *angleType;  // pygmod.valuetypes.Angle
+	PyObject *colorType;  // pygmod.valuetypes.Color
+	// Reference to the Color metatable of Garry's Mod, 0 until it's looked up (references are positive)
+	int colorMetatableRef;
+
+	// Per-frame GIL release, see gil_yield.hpp
+	bool gilYieldEnabled;
+	double gilYieldWindow;  // Seconds
+	GilYieldStats gilYieldStats;
+
+	// Timing of Python callbacks called from Lua, see watchdog.hpp
+	WatchdogState watchdog;
+};
+
+// Returns the _luastack module state of the current interpreter
+// or nullptr if the module isn't imported yet.
+LuastackState *getLuastackState();
+
+// Returns the _luastack module state of the current interpreter
+// with classes from pygmod.lua and pygmod.valuetypes cached.
+// These modules are imported only once per interpreter, by the first call.
+// Returns nullptr with a Python exception set on failure.
+LuastackState *getCachedTypes();
 
 PyMODINIT_FUNC PyInit__luastack();
@@ -0,0 +1,111 @@
+#include "auto_pop.hpp"
+#include <structmember.h>
+#include "_luastack.hpp"
+#include "main_thread.hpp"
+
+struct AutoPopObject {
+	PyObject_HEAD
+	PyObject *func;
+	PyObject *dict;  // For functools.update_wrapper()
+};
+
+static PyObject *autoPopNew(PyTypeObject *type, PyObject *args, PyObject *kwargs) {
+	PyObject *func;
+	if (!PyArg_ParseTuple(args, "O:auto_pop", &func))
+		return NULL;
+	if (!PyCallable_Check(func)) {
+		PyErr_SetString(PyExc_TypeError, "auto_pop() argument must be callable");
+		return NULL;
+	}
+
+	AutoPopObject *self = reinterpret_cast<AutoPopObject *>(type->tp_alloc(type, 0));
+	if (self == NULL)
+		return NULL;
+	Py_INCREF(func);
+	self->func = func;
+	return reinterpret_cast<PyObject *>(self);
+}
+
+static PyObject *autoPopCall(PyObject *selfObject, PyObject *args, PyObject *kwargs) {
+	if (!checkMainThread())
+		return NULL;
+	AutoPopObject *self = reinterpret_cast<AutoPopObject *>(selfObject);
+	ILuaBase *lua = reinterpret_cast<LuastackState *>(PyType_GetModuleState(Py_TYPE(selfObject)))->lua;
+
+	int topBefore = lua->Top();
+	PyObject *result = PyObject_Call(self->func, args, kwargs);
+	int pushed = lua->Top() - topBefore;
+	if (pushed > 0)
+		lua->Pop(pushed);
+	return result;
+}
+
+// Binds the wrapper to the instance when it is accessed as a method
+static PyObject *autoPopDescrGet(PyObject *self, PyObject *obj, PyObject *type) {
+	if (obj == NULL || obj == Py_None) {
+		Py_INCREF(self);
+		return self;
+	}
+	return PyMethod_New(self, obj);
+}
+
+static int autoPopTraverse(PyObject *selfObject, visitproc visit, void *arg) {
+	AutoPopObject *self = reinterpret_cast<AutoPopObject *>(selfObject);
+	Py_VISIT(Py_TYPE(selfObject));
+	Py_VISIT(self->func);
+	Py_VISIT(self->dict);
+	return 0;
+}
+
+static int autoPopClear(PyObject *selfObject) {
+	AutoPopObject *self = reinterpret_cast<AutoPopObject *>(selfObject);
+	Py_CLEAR(self->func);
+	Py_CLEAR(self->dict);
+	return 0;
+}
+
+static void autoPopDealloc(PyObject *selfObject) {
+	PyTypeObject *type = Py_TYPE(selfObject);
+	PyObject_GC_UnTrack(selfObject);
+	autoPopClear(selfObject);
+	type->tp_free(selfObject);
+	Py_DECREF(type);
+}
+
+// __wrapped__ and the other attributes copied by functools.update_wrapper() are stored in the instance dict
+static PyMemberDef autoPopMembers[] = {
+	{"__dictoffset__", T_PYSSIZET, offsetof(AutoPopObject, dict), READONLY, NULL},
+	{NULL, 0, 0, 0, NULL}
+};
+
+static PyGetSetDef autoPopGetSet[] = {
+	{"__dict__", PyObject_GenericGetDict, PyObject_GenericSetDict, NULL, NULL},
+	{NULL, NULL, NULL, NULL, NULL}
+};
+
+static PyType_Slot autoPopSlots[] = {
+	{Py_tp_doc, const_cast<char *>(
+		"auto_pop(func)\n" \
+		"Wraps func, so all Lua stack values pushed during its call are popped when it returns or raises an exception.")},
+	{Py_tp_new, reinterpret_cast<void *>(autoPopNew)},
+	{Py_tp_call, reinterpret_cast<void *>(autoPopCall)},
+	{Py_tp_descr_get, reinterpret_cast<void *>(autoPopDescrGet)},
+	{Py_tp_traverse, reinterpret_cast<void *>(autoPopTraverse)},
+	{Py_tp_clear, reinterpret_cast<void *>(autoPopClear)},
+	{Py_tp_dealloc, reinterpret_cast<void *>(autoPopDealloc)},
+	{Py_tp_members, autoPopMembers},
+	{Py_tp_getset, autoPopGetSet},
+	{0, NULL}
+};
+
+static PyType_Spec autoPopSpec = {
+	"_luastack.auto_pop",
+	sizeof(AutoPopObject),
+	0,
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC,
+	autoPopSlots
+};
+
+PyObject *createAutoPopType(PyObject *module) {
+	return PyType_FromModuleAndSpec(module, &autoPopSpec, NULL);
+}
@@ -0,0 +1,12 @@
+// Native version of the pygmod.lua.auto_pop decorator.
+
+#pragma once
+
+#include <Python.h>
+
+// Creates the _luastack.auto_pop type, which belongs to the given _luastack module.
+// auto_pop(func) wraps func in a callable which pops all Lua stack values
+// pushed during the func call, saving and restoring the stack top without calling back into Python.
+// Instances are descriptors, so they can wrap methods.
+// Returns a new reference or NULL with a Python exception set.
+PyObject *createAutoPopType(PyObject *module);
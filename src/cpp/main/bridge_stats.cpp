@@ -0,0 +1,116 @@
+#include <array>
+#include <chrono>
+#include <string>
+#include <string_view>
+#include <unordered_map>
+
+#include "bridge_stats.hpp"
+
+const char *const bridgeCounterNames[COUNTER_COUNT] = {
+	"convert_py_to_lua",
+	"convert_lua_to_py",
+	"lua_call",
+	"reference_create",
+	"reference_free",
+	"realm_swap",
+	"python_call",
+};
+
+unsigned long long bridgeCounters[COUNTER_COUNT] = {};
+bool callSiteTracking = false;
+
+using Clock = std::chrono::steady_clock;
+
+// Counts at the start of the current one second window and the rates measured in the previous one
+static Clock::time_point windowStart = Clock::now();
+static unsigned long long windowStartCounters[COUNTER_COUNT] = {};
+static double rates[COUNTER_COUNT] = {};
+
+static std::string skipPrefix;
+static std::unordered_map<std::string, std::array<unsigned long long, COUNTER_COUNT>> callSites;
+
+int updateBridgeRates(lua_State *state) {
+	Clock::time_point now = Clock::now();
+	double elapsed = std::chrono::duration<double>(now - windowStart).count();
+	if (elapsed < 1)
+		return 0;
+
+	for (int i = 0; i < COUNTER_COUNT; i++) {
+		rates[i] = (bridgeCounters[i] - windowStartCounters[i]) / elapsed;
+		windowStartCounters[i] = bridgeCounters[i];
+	}
+	windowStart = now;
+	return 0;
+}
+
+PyObject *bridgeStatsDict() {
+	PyObject *result = PyDict_New();
+	for (int i = 0; result != NULL && i < COUNTER_COUNT; i++) {
+		PyObject *item = Py_BuildValue("(Kd)", bridgeCounters[i], rates[i]);
+		if (item == NULL || PyDict_SetItemString(result, bridgeCounterNames[i], item) < 0)
+			Py_CLEAR(result);
+		Py_XDECREF(item);
+	}
+	return result;
+}
+
+void attributeToCallSite(BridgeCounter counter) {
+	// Crossings from Lua to Python happen outside of any Python frame of interest
+	PyFrameObject *frame = PyEval_GetFrame();
+	Py_XINCREF(frame);
+	while (frame != NULL) {
+		PyCodeObject *code = PyFrame_GetCode(frame);
+		const char *filename = PyUnicode_AsUTF8(code->co_filename);
+		if (filename == NULL) {
+			PyErr_Clear();
+		} else if (std::string_view(filename).substr(0, skipPrefix.size()) != skipPrefix) {
+			std::string site = std::string(filename) + ":" + std::to_string(PyFrame_GetLineNumber(frame));
+			callSites[site][counter]++;
+			Py_DECREF(code);
+			Py_DECREF(frame);
+			return;
+		}
+		Py_DECREF(code);
+		PyFrameObject *back = PyFrame_GetBack(frame);
+		Py_DECREF(frame);
+		frame = back;
+	}
+}
+
+void clearCallSites() {
+	callSites.clear();
+}
+
+void setCallSiteTracking(const char *prefix) {
+	clearCallSites();
+	callSiteTracking = prefix != nullptr;
+	skipPrefix = prefix != nullptr ? prefix : "";
+}
+
+PyObject *callSitesDict() {
+	PyObject *result = PyDict_New();
+	if (result == NULL)
+		return NULL;
+
+	for (auto &[site, counts] : callSites) {
+		PyObject *siteCounts = PyDict_New();
+		if (siteCounts == NULL || PyDict_SetItemString(result, site.c_str(), siteCounts) < 0) {
+			Py_XDECREF(siteCounts);
+			Py_DECREF(result);
+			return NULL;
+		}
+		Py_DECREF(siteCounts);
+		for (int i = 0; i < COUNTER_COUNT; i++) {
+			if (counts[i] == 0)
+				continue;
+			PyObject *count = PyLong_FromUnsignedLongLong(counts[i]);
+			if (count == NULL || PyDict_SetItemString(siteCounts, bridgeCounterNames[i], count) < 0) {
+				Py_XDECREF(count);
+				Py_DECREF(result);
+				return NULL;
+			}
+			Py_DECREF(count);
+		}
+	}
+	return result;
+}
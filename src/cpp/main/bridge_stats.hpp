@@ -0,0 +1,50 @@
+// Counters of the crossings between Python and Lua.
+
+#pragma once
+
+#include <Python.h>
+#include <GarrysMod/Lua/Interface.h>
+
+using namespace GarrysMod::Lua;
+
+enum BridgeCounter {
+	COUNTER_PY_TO_LUA,  // Python values converted to Lua
+	COUNTER_LUA_TO_PY,  // Lua values converted to Python
+	COUNTER_LUA_CALL,  // Lua functions called from Python
+	COUNTER_REFERENCE_CREATE,
+	COUNTER_REFERENCE_FREE,
+	COUNTER_REALM_SWAP,  // Interpreter swaps, see realms.hpp
+	COUNTER_PY_CALL,  // Python functions called from Lua
+	COUNTER_COUNT
+};
+
+// Names of the counters in Python, indexed by BridgeCounter
+extern const char *const bridgeCounterNames[COUNTER_COUNT];
+
+extern unsigned long long bridgeCounters[COUNTER_COUNT];
+// True if the crossings are attributed to Python call sites
+extern bool callSiteTracking;
+
+void attributeToCallSite(BridgeCounter counter);
+
+// Counts a crossing. Only called on the game thread, so the counters are plain integers.
+inline void countCrossing(BridgeCounter counter) {
+	bridgeCounters[counter]++;
+	if (callSiteTracking)
+		attributeToCallSite(counter);
+}
+
+// Think hook which updates the per-second rates once a second. Doesn't use Python.
+int updateBridgeRates(lua_State *state);
+
+// Returns {name: (total, rate per second)} of every counter.
+PyObject *bridgeStatsDict();
+
+// Starts attributing crossings made from Python to the innermost frames whose files are not under skipPrefix
+// (the pygmod package), or stops if skipPrefix is nullptr. Clears the collected call sites.
+void setCallSiteTracking(const char *skipPrefix);
+
+// Returns {"file:line": {name: count}} of the collected call sites.
+PyObject *callSitesDict();
+
+void clearCallSites();
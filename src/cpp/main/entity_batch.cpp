@@ -0,0 +1,114 @@
+#include <cmath>
+
+#include "entity_batch.hpp"
+#include "valueconv.hpp"
+#include "number_buffer.hpp"
+
+// Converts the result of the method on the top of the stack to up to 3 numbers.
+// Returns the number of values written to values.
+static int resultValues(ILuaBase *lua, double values[3]) {
+	int type = lua->GetType(-1);
+	if (type == Type::Number) {
+		values[0] = lua->GetNumber(-1);
+		return 1;
+	}
+	if (type == Type::Vector) {
+		const Vector &v = lua->GetVector(-1);
+		values[0] = v.x;
+		values[1] = v.y;
+		values[2] = v.z;
+		return 3;
+	}
+	if (type == Type::Angle) {
+		const QAngle &a = lua->GetAngle(-1);
+		values[0] = a.x;
+		values[1] = a.y;
+		values[2] = a.z;
+		return 3;
+	}
+	return 0;
+}
+
+Py_ssize_t fillEntityBatch(ILuaBase *lua, const char *method, int width, PyObject *entities, PyObject *out) {
+	if (width < 1 || width > 3) {
+		PyErr_SetString(PyExc_ValueError, "width must be 1, 2 or 3");
+		return -1;
+	}
+
+	// Either the Lua table of entities or the Python sequence is used, the other one stays unset
+	bool fromTable = PyLong_Check(entities);
+	int tableIndex = 0;
+	PyObject *fast = NULL;
+	Py_ssize_t count;
+	if (fromTable) {
+		int ref = PyLong_AsLong(entities);
+		if (ref == -1 && PyErr_Occurred())
+			return -1;
+		lua->ReferencePush(ref);
+		tableIndex = lua->Top();
+		count = lua->ObjLen(tableIndex);
+	} else {
+		fast = PySequence_Fast(entities, "entities must be a sequence or a table reference");
+		if (fast == NULL)
+			return -1;
+		count = PySequence_Fast_GET_SIZE(fast);
+	}
+
+	// Releases everything acquired above; used on every exit path from here on
+	auto cleanUp = [&]() {
+		if (fromTable)
+			lua->Pop();  // The table of entities
+		Py_XDECREF(fast);
+	};
+
+	NumberBuffer output;
+	if (!output.acquire(out, true, "out")) {
+		cleanUp();
+		return -1;
+	}
+	if (output.size() < count * width) {
+		PyErr_Format(PyExc_ValueError, "out is too small: %zd values are needed for %zd entities, but it holds %zd",
+		             count * width, count, output.size());
+		cleanUp();
+		return -1;
+	}
+
+	// Taking the method from the Entity metatable once instead of going through __index of every entity
+	lua->PushSpecial(SPECIAL_REG);
+	lua->GetField(-1, "Entity");
+	lua->GetField(-1, method);
+	lua->Remove(-2);  // The Entity metatable
+	lua->Remove(-2);  // The registry
+	int methodIndex = lua->Top();
+	if (lua->GetType(methodIndex) != Type::Function) {
+		lua->Pop();
+		PyErr_Format(PyExc_ValueError, "Entity.%s is not a function", method);
+		cleanUp();
+		return -1;
+	}
+
+	double values[3];
+	for (Py_ssize_t i = 0; i < count; i++) {
+		lua->Push(methodIndex);
+		if (fromTable) {
+			lua->PushNumber(i + 1);  // Lua arrays start at 1
+			lua->RawGet(tableIndex);
+		} else if (!convertPyToLua(lua, PySequence_Fast_GET_ITEM(fast, i))) {
+			lua->Pop(3);  // nil pushed in place of the entity, the method to call and the one at methodIndex
+			cleanUp();
+			return -1;
+		}
+
+		int valueCount = 0;
+		if (lua->PCall(1, 1, 0) == 0)
+			valueCount = resultValues(lua, values);
+		lua->Pop();  // The result or the error message
+
+		for (int j = 0; j < width; j++)
+			output.set(i * width + j, j < valueCount ? values[j] : NAN);
+	}
+
+	lua->Pop();  // The method
+	cleanUp();
+	return count;
+}
@@ -0,0 +1,20 @@
+// Reads the state of many entities in a single call, without going through Python for every entity.
+
+#pragma once
+
+#include <Python.h>
+#include <GarrysMod/Lua/Interface.h>
+
+using namespace GarrysMod::Lua;
+
+// Calls Entity.<method>(ent) for every entity and writes the results to the writable buffer out,
+// width values per entity, one entity after another.
+// The method is taken from the Entity metatable once, so it works for players, NPCs, etc. as well.
+// Numbers fill a single value, vectors and angles fill three. If the call fails (e.g. for a NULL entity)
+// or returns something else, the values of that entity are set to NaN (0 in integer buffers).
+//
+// entities is either a Lua reference to a sequential table of entities or a Python sequence of entities.
+// out must be a C-contiguous NumberBuffer with at least width values for every entity.
+//
+// Returns the number of entities or -1 with a Python exception set.
+Py_ssize_t fillEntityBatch(ILuaBase *lua, const char *method, int width, PyObject *entities, PyObject *out);
@@ -0,0 +1,105 @@
+#include <algorithm>
+#include <chrono>
+#include <thread>
+
+#include "gil_yield.hpp"
+#include "_luastack.hpp"
+#include "lua_call.hpp"
+#include "realms.hpp"
+
+#define GIL_YIELD_HOOK_ID "PyGmod GIL yield"
+
+using Clock = std::chrono::steady_clock;
+
+// Taking the GIL back after releasing it takes well under this time if no other thread took it meanwhile
+constexpr std::chrono::microseconds WAITER_SEEN_THRESHOLD{20};
+
+static double secondsBetween(Clock::time_point start, Clock::time_point end) {
+	return std::chrono::duration<double>(end - start).count();
+}
+
+// Returns true if the current interpreter has threads other than the current one.
+// Without them no thread can be waiting for the GIL.
+static bool hasOtherThreads() {
+	PyThreadState *current = PyThreadState_Get();
+	for (PyThreadState *threadState = PyInterpreterState_ThreadHead(PyInterpreterState_Get());
+	     threadState != nullptr; threadState = PyThreadState_Next(threadState)) {
+		if (threadState != current)
+			return true;
+	}
+	return false;
+}
+
+static void yieldGil(double windowSeconds, GilYieldStats &stats) {
+	if (!hasOtherThreads())
+		return;
+
+	Clock::time_point released = Clock::now();
+	Clock::time_point deadline = released + std::chrono::duration_cast<Clock::duration>(
+		std::chrono::duration<double>(windowSeconds));
+
+	// Releasing the GIL wakes a thread waiting for it. If the thread takes the GIL,
+	// taking it back blocks until the thread lets it go, which shows that a waiter has run.
+	PyThreadState *threadState = PyEval_SaveThread();
+	std::this_thread::yield();
+	Clock::time_point windowEnd = Clock::now();
+	PyEval_RestoreThread(threadState);
+	Clock::time_point reacquired = Clock::now();
+	bool waiterSeen = reacquired - windowEnd > WAITER_SEEN_THRESHOLD;
+
+	// More threads may be waiting behind the first one, so the rest of the window is only given
+	// when a waiter has been seen. Sleeping has a coarse resolution on some platforms,
+	// so the window is waited out by yielding the CPU.
+	if (waiterSeen && reacquired < deadline) {
+		threadState = PyEval_SaveThread();
+		while (Clock::now() < deadline)
+			std::this_thread::yield();
+		windowEnd = Clock::now();
+		PyEval_RestoreThread(threadState);
+		reacquired = Clock::now();
+	}
+
+	// A waiter which ran past the end of the window kept the GIL for longer than the window
+	Clock::time_point waitStart = waiterSeen ? std::max(windowEnd, deadline) : windowEnd;
+	double wait = reacquired > waitStart ? secondsBetween(waitStart, reacquired) : 0.0;
+	stats.yields++;
+	stats.releasedSeconds += secondsBetween(released, reacquired);
+	stats.waitSeconds += wait;
+	if (wait > stats.maxWaitSeconds)
+		stats.maxWaitSeconds = wait;
+}
+
+// The Think hook. It's registered separately in each realm, so it yields the GIL of that realm's interpreter.
+static int gilYieldThink(lua_State *state) {
+	if (!prepareInterpreterForCurrentRealm(state))
+		return 0;
+
+	LuastackState *moduleState = getLuastackState();
+	if (moduleState != nullptr && moduleState->gilYieldEnabled)
+		yieldGil(moduleState->gilYieldWindow, moduleState->gilYieldStats);
+	return 0;
+}
+
+bool setGilYieldHook(ILuaBase *lua, bool enabled) {
+	int topBefore = lua->Top();
+	lua->PushSpecial(SPECIAL_GLOB);
+	lua->GetField(-1, "hook");
+	if (!lua->IsType(-1, Type::Table)) {
+		lua->Pop(lua->Top() - topBefore);
+		PyErr_SetString(PyExc_RuntimeError, "the hook library is not loaded");
+		return false;
+	}
+
+	lua->GetField(-1, enabled ? "Add" : "Remove");
+	lua->PushString("Think");
+	lua->PushString(GIL_YIELD_HOOK_ID);
+	if (enabled)
+		lua->PushCFunction(gilYieldThink);
+	if (lua->PCall(enabled ? 3 : 2, 0, 0) != 0) {
+		raiseLuaError(lua);
+		lua->Pop(lua->Top() - topBefore);
+		return false;
+	}
+	lua->Pop(lua->Top() - topBefore);
+	return true;
+}
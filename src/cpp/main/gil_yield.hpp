@@ -0,0 +1,28 @@
+// Releases the GIL once per frame, so Python threads started by addons make progress
+// while the game thread runs Lua and engine code.
+// The GIL is only released if the interpreter has other threads, and the release window is only
+// waited out after one of them has taken the GIL.
+
+#pragma once
+
+#include <Python.h>
+#include <GarrysMod/Lua/Interface.h>
+
+using namespace GarrysMod::Lua;
+
+// Statistics of the GIL yields of one interpreter.
+struct GilYieldStats {
+	// Frames in which the GIL was released
+	unsigned long long yields;
+	// Total time the game thread didn't hold the GIL, including waiting for it
+	double releasedSeconds;
+	// Total and maximum time spent waiting to take the GIL back after the release window,
+	// that is, how much longer than the window other threads kept the GIL
+	double waitSeconds;
+	double maxWaitSeconds;
+};
+
+// Adds a Think hook which releases the GIL of the current interpreter every frame, or removes it if enabled is false.
+// The hook reads the release window from the _luastack module state and updates the statistics there.
+// Returns false with a Python exception set if the hook library call fails.
+bool setGilYieldHook(ILuaBase *lua, bool enabled);
@@ -1,9 +1,12 @@
 #include <string>
+#include <cstdint>
 #include "lua2py_interop.hpp"
 #include "_luastack.hpp"
 #include "valueconv.hpp"
 #include "realms.hpp"
 #include "py_function_registry.hpp"
+#include "watchdog.hpp"
+#include "bridge_stats.hpp"
 
 #define LUA_FUNC(name) int name(lua_State *state)
 
@@ -31,25 +34,146 @@ LUA_FUNC(py_Import) {
     return 1;
 }
 
-LUA_FUNC(passCallToPyFunc) {
-    int argCount = LUA->Top() - 1;  // How much args have we got for our Python function?
-    auto funcId = LUA->CheckNumber(1);
-    auto args = PyTuple_New(argCount);
+// Calls a Python function from pyFunctionRegistry, passing the Lua stack values
+// starting at index firstArg as its arguments, and pushes the result.
+static int callRegisteredPyFunc(lua_State *state, PyFuncId funcId, int firstArg) {
+    prepareInterpreterForCurrentRealm(state);
 
+    int argCount = LUA->Top() - firstArg + 1;  // How much args have we got for our Python function?
+    PyObject *args = PyTuple_New(argCount);
     for (int i = 0; i < argCount; i++) {
-        PyTuple_SET_ITEM(args, i, convertLuaToPy(LUA, i + 2));  // args for our function start at stack index 2
+        PyObject *arg = convertLuaToPy(LUA, firstArg + i);
+        if (arg == NULL) {
+            PyErr_Print();
+            Py_DECREF(args);
+            LUA->ThrowError("couldn't convert arguments of Python function");
+            return 0;
+        }
+        PyTuple_SET_ITEM(args, i, arg);
+    }
+
+    PyObject *func = pyFunctionRegistry[funcId];
+    if (func == nullptr) {
+        Py_DECREF(args);
+        LUA->ThrowError("no such Python function, probably it was already freed");
+        return 0;
     }
 
-    auto result = PyObject_Call(pyFunctionRegistry[funcId], args, NULL);
+    countCrossing(COUNTER_PY_CALL);
+    WatchedCall watchedCall = watchdogBegin();
+    PyObject *result = PyObject_Call(func, args, NULL);
+    watchdogEnd(watchedCall, func);
+    Py_DECREF(args);
     if (!result) {
         PyErr_Print();
         LUA->ThrowError("exception in Python function");
+        return 0;
     }
-    convertPyToLua(LUA, result);
+    bool converted = convertPyToLua(LUA, result);
+    Py_DECREF(result);
+    if (!converted)
+        throwConversionError(LUA);
     return 1;
 }
 
+// Lua closure which represents a Python function in Lua.
+// Upvalues are the ID of the function in pyFunctionRegistry
+// and the proxy userdata which releases the function when the closure is collected.
+LUA_FUNC(pyFuncClosure) {
+    auto funcId = static_cast<PyFuncId>(LUA->GetNumber(UPVALUE_INDEX(1)));
+    return callRegisteredPyFunc(state, funcId, 1);
+}
+
+// py._passCallToPyFunc(funcId, ...): calls the Python function with ID funcId from pyFunctionRegistry.
+LUA_FUNC(passCallToPyFunc) {
+    auto funcId = static_cast<PyFuncId>(LUA->CheckNumber(1));
+    return callRegisteredPyFunc(state, funcId, 2);
+}
+
+// __gc of the proxy userdata. Releases the function, because its closure was collected.
+LUA_FUNC(pyFuncProxy_gc) {
+    // The interpreter may be already finalized at the shutdown
+    if (!prepareInterpreterForCurrentRealm(state))
+        return 0;
+
+    UserData *ud = reinterpret_cast<UserData *>(LUA->GetUserdata(1));
+    pyFunctionRegistry.release(static_cast<PyFuncId>(reinterpret_cast<uintptr_t>(ud->data)));
+    return 0;
+}
+
+// Pushes the proxy userdata which lives exactly as long as the closure which holds it as an upvalue.
+// Closures are collected before their weak py function cache entries can be looked up again,
+// so a released ID is never used by a closure from the cache.
+static void pushPyFuncProxy(ILuaBase *lua, PyFuncId funcId) {
+    UserData *ud = reinterpret_cast<UserData *>(lua->NewUserdata(sizeof(UserData)));
+    ud->data = reinterpret_cast<void *>(static_cast<uintptr_t>(funcId));
+    ud->type = LUA_TYPE_PYFUNCPROXY;
+    lua->CreateMetaTableType("PyFuncProxy", LUA_TYPE_PYFUNCPROXY);
+    lua->SetMetaTable(-2);
+}
+
+// py.RegistryStats(): returns the statistics of pyFunctionRegistry.
+LUA_FUNC(py_RegistryStats) {
+    LUA->CreateTable();
+
+    LUA->PushNumber(pyFunctionRegistry.liveCount());
+    LUA->SetField(-2, "live");
+    LUA->PushNumber(pyFunctionRegistry.freedCount());
+    LUA->SetField(-2, "freed");
+    LUA->PushNumber(pyFunctionRegistry.peakCount());
+    LUA->SetField(-2, "peak");
+
+    return 1;
+}
+
+void pushPyFunction(ILuaBase *lua, PyObject *func) {
+    PyFuncId funcId = pyFunctionRegistry.add(func);
+
+    lua->PushSpecial(SPECIAL_REG);
+    lua->GetField(-1, PY_FUNC_CACHE_NAME);  // Stack: registry, cache
+    lua->PushNumber(funcId);
+    lua->RawGet(-2);  // Stack: registry, cache, closure or nil
+
+    // Creating the closure if this function wasn't pushed before or its closure was collected
+    if (lua->GetType(-1) != Type::Function) {
+        lua->Pop();
+        lua->PushNumber(funcId);
+        pushPyFuncProxy(lua, funcId);
+        lua->PushCClosure(pyFuncClosure, 2);
+        pyFunctionRegistry.retain(funcId);
+
+        lua->PushNumber(funcId);
+        lua->Push(-2);
+        lua->RawSet(-4);  // cache[funcId] = closure
+    }
+
+    lua->Insert(-3);  // Stack: closure, registry, cache
+    lua->Pop(2);
+}
+
+// Creates the table of Lua closures of Python functions in the Lua registry.
+// The table has weak values, so closures which are not used by Lua anymore can be collected.
+static void createPyFuncCache(ILuaBase *lua) {
+    lua->PushSpecial(SPECIAL_REG);
+    lua->CreateTable();
+
+    lua->CreateTable();  // Metatable
+    lua->PushString("v");
+    lua->SetField(-2, "__mode");
+    lua->SetMetaTable(-2);
+
+    lua->SetField(-2, PY_FUNC_CACHE_NAME);
+    lua->Pop();
+}
+
 void extendLua(ILuaBase *lua) {
+    createPyFuncCache(lua);
+
+    lua->CreateMetaTableType("PyFuncProxy", LUA_TYPE_PYFUNCPROXY);
+    lua->PushCFunction(pyFuncProxy_gc);
+    lua->SetField(-2, "__gc");
+    lua->Pop();
+
     lua->PushSpecial(SPECIAL_GLOB);
     lua->CreateTable();  // To be "py" table
 
@@ -62,6 +186,9 @@ void extendLua(ILuaBase *lua) {
     lua->PushCFunction(passCallToPyFunc);
     lua->SetField(-2, "_passCallToPyFunc");
 
+    lua->PushCFunction(py_RegistryStats);
+    lua->SetField(-2, "RegistryStats");
+
     // Adding "py" table to the global namespace
     lua->SetField(-2, "py");
     lua->Pop();
@@ -7,5 +7,22 @@
 
 using namespace GarrysMod::Lua;
 
-// Adds py.Exec and py.Import to the Lua global namespace.
+// Pseudo-index of the i-th upvalue of the running C closure, same as lua_upvalueindex() in the Lua C API.
+// -10002 is LUA_GLOBALSINDEX.
+#define UPVALUE_INDEX(i) (-10002 - (i))
+
+// Lua type of the userdata which releases a Python function when its Lua closure is collected
+#define LUA_TYPE_PYFUNCPROXY (Type::Type_Count + 13)
+
+// Name of the Lua registry field with the table of Lua closures of Python functions, keyed by their IDs.
+#define PY_FUNC_CACHE_NAME "pygmod_py_funcs"
+
+// Adds the "py" table with py.Exec, py.Import and py.RegistryStats to the Lua global namespace.
+// Python reads the same statistics through _luastack.registry_stats().
 void extendLua(ILuaBase *lua);
+
+// Pushes a Lua closure which calls the Python function func.
+// The function is registered in pyFunctionRegistry, and pushing the same function again
+// reuses its registry entry and its closure, as long as the closure is alive.
+// The registry entry is removed when the last closure of the function is collected by Lua.
+void pushPyFunction(ILuaBase *lua, PyObject *func);
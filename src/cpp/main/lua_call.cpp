@@ -0,0 +1,114 @@
+#include "lua_call.hpp"
+#include "valueconv.hpp"
+#include "_luastack.hpp"
+#include "main_thread.hpp"
+#include "bridge_stats.hpp"
+
+PyObject *raiseLuaError(ILuaBase *lua) {
+	PyObject *luaModule = PyImport_ImportModule("pygmod.lua");
+	if (luaModule != NULL) {
+		PyObject *luaErrorExc = PyObject_GetAttrString(luaModule, "LuaError");
+		if (luaErrorExc != NULL) {
+			PyErr_SetString(luaErrorExc, lua->GetString());
+			Py_DECREF(luaErrorExc);
+		}
+		Py_DECREF(luaModule);
+	}
+	lua->Pop();  // Popping the error message
+	return NULL;
+}
+
+PyObject *popCallResults(ILuaBase *lua, int topBefore) {
+	int nResults = lua->Top() - topBefore;
+	PyObject *result;
+	if (nResults == 0) {
+		Py_INCREF(Py_None);
+		result = Py_None;
+	} else if (nResults == 1) {
+		result = convertLuaToPy(lua, -1);
+	} else {
+		result = PyTuple_New(nResults);
+		for (int i = 0; result != NULL && i < nResults; i++) {
+			PyObject *item = convertLuaToPy(lua, topBefore + 1 + i);
+			if (item == NULL)
+				Py_CLEAR(result);
+			else
+				PyTuple_SET_ITEM(result, i, item);
+		}
+	}
+	lua->Pop(nResults);
+	return result;
+}
+
+bool pushPyArgs(ILuaBase *lua, PyObject *args, Py_ssize_t start) {
+	for (Py_ssize_t i = start; i < PyTuple_GET_SIZE(args); i++) {
+		if (!convertPyToLua(lua, PyTuple_GET_ITEM(args, i)))
+			return false;
+	}
+	return true;
+}
+
+PyObject *callLuaValue(ILuaBase *lua, int funcIndex, PyObject *args, Py_ssize_t start) {
+	int topBefore = lua->Top();
+	lua->Push(funcIndex);
+	Py_ssize_t nArgs = PyTuple_GET_SIZE(args) - start;
+	if (!pushPyArgs(lua, args, start)) {
+		lua->Pop(lua->Top() - topBefore);  // The function and the arguments
+		return NULL;
+	}
+
+	countCrossing(COUNTER_LUA_CALL);
+	if (lua->PCall(static_cast<int>(nArgs), -1, 0) != 0)
+		return raiseLuaError(lua);
+	return popCallResults(lua, topBefore);
+}
+
+static PyObject *luaCallableCall(PyObject *self, PyObject *args, PyObject *kwargs) {
+	if (kwargs != NULL && PyDict_GET_SIZE(kwargs) > 0) {
+		PyErr_SetString(PyExc_TypeError, "Lua functions don't take keyword arguments");
+		return NULL;
+	}
+	if (!checkMainThread())
+		return NULL;
+	LuastackState *state = getLuastackState();
+	if (state == nullptr) {
+		PyErr_SetString(PyExc_ImportError, "_luastack is not imported");
+		return NULL;
+	}
+
+	PyObject *refPyInt = PyObject_GetAttrString(self, "_ref");
+	if (refPyInt == NULL)
+		return NULL;
+	int ref = PyLong_AsLong(refPyInt);
+	Py_DECREF(refPyInt);
+	if (ref == -1 && PyErr_Occurred())
+		return NULL;
+
+	ILuaBase *lua = state->lua;
+	lua->ReferencePush(ref);
+	PyObject *result = callLuaValue(lua, lua->Top(), args);
+	lua->Pop();  // The function
+	return result;
+}
+
+static PyType_Slot luaCallableSlots[] = {
+	{Py_tp_doc, const_cast<char *>(
+		"Native base class of pygmod.lua.CallableLuaObject.\n" \
+		"Calling an instance calls the Lua value which its _ref attribute refers to, " \
+		"pushing all arguments and collecting all results in a single call.")},
+	{Py_tp_new, reinterpret_cast<void *>(PyType_GenericNew)},
+	{Py_tp_call, reinterpret_cast<void *>(luaCallableCall)},
+	{0, NULL}
+};
+
+static PyType_Spec luaCallableSpec = {
+	"_luastack.LuaCallable",
+	sizeof(PyObject),
+	0,
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,
+	luaCallableSlots
+};
+
+PyObject *createLuaCallableType(PyObject *module) {
+	return PyType_FromModuleAndSpec(module, &luaCallableSpec, NULL);
+}
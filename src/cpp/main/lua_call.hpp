@@ -0,0 +1,32 @@
+// Calling Lua values from Python.
+
+#pragma once
+
+#include <Python.h>
+#include <GarrysMod/Lua/Interface.h>
+
+using namespace GarrysMod::Lua;
+
+// Raises pygmod.lua.LuaError with the message on the top of the stack and pops the message.
+// Always returns NULL.
+PyObject *raiseLuaError(ILuaBase *lua);
+
+// Converts the results of a call, which are above the given stack top, and pops them.
+// Returns None if there are no results, the only result or a tuple of all results.
+PyObject *popCallResults(ILuaBase *lua, int topBefore);
+
+// Pushes the items of the args tuple, starting with args[start], as call arguments.
+// Returns false with a Python exception set if one of them couldn't be converted,
+// leaving the values pushed so far on the stack.
+bool pushPyArgs(ILuaBase *lua, PyObject *args, Py_ssize_t start = 0);
+
+// Calls the Lua value at the given absolute stack index with the items of the args tuple, starting with args[start].
+// All arguments are pushed and all results are collected in this single call; the stack is left unchanged.
+// Returns None, the only result or a tuple of results, or NULL with pygmod.lua.LuaError set on Lua errors
+// or another Python exception set if an argument couldn't be converted.
+PyObject *callLuaValue(ILuaBase *lua, int funcIndex, PyObject *args, Py_ssize_t start = 0);
+
+// Creates the _luastack.LuaCallable type, the native base class of pygmod.lua.CallableLuaObject.
+// Calling an instance pushes the Lua value which its "_ref" attribute refers to and calls it with callLuaValue().
+// Returns a new reference or NULL with a Python exception set.
+PyObject *createLuaCallableType(PyObject *module);
@@ -0,0 +1,71 @@
+#include "lua_helpers.hpp"
+
+const char *const luaHelperNames[HELPER_COUNT] = {
+	"len",
+	"rawget",
+	"rawset",
+	"get_many",
+	"insert",
+	"insert_many",
+};
+
+static const char *helpersSource = R"lua(
+local rawget, rawset, select, unpack = rawget, rawset, select, unpack
+
+return {
+	len = function(tbl)
+		return #tbl
+	end,
+
+	rawget = rawget,
+	rawset = rawset,
+
+	-- Returns tbl[k] for every passed key k
+	get_many = function(tbl, ...)
+		local keys, n = {...}, select("#", ...)
+		local values = {}
+		for i = 1, n do
+			values[i] = tbl[keys[i]]
+		end
+		return unpack(values, 1, n)
+	end,
+
+	-- Same as table.insert(tbl, value)
+	insert = function(tbl, value)
+		rawset(tbl, #tbl + 1, value)
+	end,
+
+	-- Appends all passed values to the end of tbl
+	insert_many = function(tbl, ...)
+		local values, n = {...}, select("#", ...)
+		local len = #tbl
+		for i = 1, n do
+			rawset(tbl, len + i, values[i])
+		end
+	end,
+}
+)lua";
+
+bool loadLuaHelpers(ILuaBase *lua, int refs[HELPER_COUNT], std::string &error) {
+	lua->PushSpecial(SPECIAL_GLOB);
+	lua->GetField(-1, "CompileString");
+	lua->PushString(helpersSource);
+	lua->PushString("pygmod_helpers");
+	lua->PushBool(false);  // Return the error message instead of throwing it
+	lua->Call(3, 1);
+
+	// CompileString returns the error message if the compilation fails
+	if (lua->GetType(-1) != Type::Function || lua->PCall(0, 1, 0) != 0) {
+		error = lua->GetString(-1);
+		lua->Pop(2);  // The error message, _G
+		return false;
+	}
+
+	for (int i = 0; i < HELPER_COUNT; i++) {
+		lua->GetField(-1, luaHelperNames[i]);
+		refs[i] = lua->ReferenceCreate();
+	}
+
+	lua->Pop(2);  // The helper table, _G
+	return true;
+}
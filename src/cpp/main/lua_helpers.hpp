@@ -0,0 +1,29 @@
+// Lua helper library: small Lua functions which PyGmod needs, but ILuaBase doesn't provide.
+// The library is compiled once, when _luastack is initialized,
+// so the hot paths never have to compile Lua code or touch _G.
+
+#pragma once
+
+#include <string>
+#include <GarrysMod/Lua/Interface.h>
+
+using namespace GarrysMod::Lua;
+
+enum LuaHelper {
+	HELPER_LEN,
+	HELPER_RAWGET,
+	HELPER_RAWSET,
+	HELPER_GET_MANY,
+	HELPER_INSERT,
+	HELPER_INSERT_MANY,
+
+	HELPER_COUNT
+};
+
+// Names of the helpers, indexed by LuaHelper.
+extern const char *const luaHelperNames[HELPER_COUNT];
+
+// Compiles and runs the helper library chunk and creates a reference to each of its functions.
+// The references are written to refs, indexed by LuaHelper.
+// Returns false and sets error to the Lua error message on failure.
+bool loadLuaHelpers(ILuaBase *lua, int refs[HELPER_COUNT], std::string &error);
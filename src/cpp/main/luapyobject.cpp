@@ -3,6 +3,8 @@
 #include "luapyobject.hpp"
 #include "valueconv.hpp"
 #include "realms.hpp"
+#include "watchdog.hpp"
+#include "bridge_stats.hpp"
 
 #define LUA_FUNC(name) static int name(lua_State *state)
 
@@ -23,17 +25,22 @@ LUA_FUNC(luapycallable_call) {
 	for (int i = 2; i <= LUA->Top(); i++) {  // Filling the tuple with arguments
 		PyTuple_SetItem(argsTuple, i - 2, convertLuaToPy(LUA, i));
 	}
+	countCrossing(COUNTER_PY_CALL);
+	WatchedCall watchedCall = watchdogBegin();
 	PyObject *result = PyObject_CallObject(func, argsTuple);  // Calling the function
+	watchdogEnd(watchedCall, func);
 	if (result == NULL) {  // If result == NULL, func has thrown an exception
 		PyErr_Print();
 		Py_DECREF(argsTuple);
 		LUA->ThrowError("Exception in Python function");
 		return 0;
 	}
-	convertPyToLua(LUA, result);  // Pushing the result to the stack
+	bool converted = convertPyToLua(LUA, result);  // Pushing the result to the stack
 
 	Py_DECREF(argsTuple);
 	Py_DECREF(result);
+	if (!converted)
+		throwConversionError(LUA);
 	return 1;
 }
 
@@ -55,11 +62,13 @@ LUA_FUNC(luapyobject_index) {
         return 0;
     }
 
-    convertPyToLua(LUA, val);
+    bool converted = convertPyToLua(LUA, val);
 
     Py_DECREF(val);
     Py_DECREF(attr);
     Py_DECREF(self);
+    if (!converted)
+        throwConversionError(LUA);
 
     return 1;
 }
@@ -112,10 +121,12 @@ LUA_FUNC(luapyobject_unaryMinus) {
         return 0;
     }
 
-    convertPyToLua(LUA, negative);
+    bool converted = convertPyToLua(LUA, negative);
 
     Py_DECREF(negative);
     Py_DECREF(self);
+    if (!converted)
+        throwConversionError(LUA);
     return 1;
 }
 
@@ -135,11 +146,13 @@ LUA_FUNC(luapyobject_unaryMinus) {
             return 0; \
         } \
         \
-        convertPyToLua(LUA, result); \
+        bool converted = convertPyToLua(LUA, result); \
         \
         Py_DECREF(self); \
         Py_DECREF(other); \
         Py_DECREF(result); \
+        if (!converted) \
+            throwConversionError(LUA); \
         return 1; \
     }
 
@@ -163,11 +176,13 @@ LUA_FUNC(luapyobject_pow) {
         return 0;
     }
 
-    convertPyToLua(LUA, result);
+    bool converted = convertPyToLua(LUA, result);
 
     Py_DECREF(self);
     Py_DECREF(other);
     Py_DECREF(result);
+    if (!converted)
+        throwConversionError(LUA);
     return 1;
 }
 
@@ -187,11 +202,13 @@ LUA_FUNC(luapyobject_pow) {
             return 0; \
         } \
         \
-        convertPyToLua(LUA, result); \
+        bool converted = convertPyToLua(LUA, result); \
         \
         Py_DECREF(self); \
         Py_DECREF(other); \
         Py_DECREF(result); \
+        if (!converted) \
+            throwConversionError(LUA); \
         return 1; \
     }
 
@@ -15,6 +15,8 @@
 #include "lua2py_interop.hpp"
 #include "realms.hpp"
 #include "interpreter_states.hpp"
+#include "main_thread.hpp"
+#include "bridge_stats.hpp"
 
 #define STRINGIFY(x) #x
 #define TO_STRING(x) STRINGIFY(x)
@@ -100,7 +102,7 @@ void initLuastack(Console &cons, ILuaBase *ptr) {
 		throw SetupFailureException("Couldn't import or find _luastack module.");
 	}
 	PyObject *initFunc = PyObject_GetAttrString(luastackModule, "init");  // initFunc = _luastack.init
-	Py_DECREF(PyObject_CallFunction(initFunc, "n", reinterpret_cast<Py_ssize_t>(ptr)));  // initFunc(ILuaBase memory address)
+	Py_XDECREF(PyObject_CallFunction(initFunc, "n", reinterpret_cast<Py_ssize_t>(ptr)));  // initFunc(ILuaBase memory address)
 	Py_DECREF(initFunc);
 	Py_DECREF(luastackModule);
 }
@@ -132,6 +134,18 @@ void registerShutdownHook(lua_State *state) {
     LUA->Pop(2);  // "hook" table, _G
 }
 
+// Registers a Think hook which updates the per-second rates of the bridge counters.
+void registerStatsHook(lua_State *state) {
+    LUA->PushSpecial(SPECIAL_GLOB);
+    LUA->GetField(-1, "hook");
+    LUA->GetField(-1, "Add");
+    LUA->PushString("Think");
+    LUA->PushString("PyGmod bridge stats");
+    LUA->PushCFunction(updateBridgeRates);
+    LUA->Call(3, 0);
+    LUA->Pop(2);  // "hook" table, _G
+}
+
 void transitionToPythonLoader() {
 	PyObject *loader_module = nullptr, *main_func = nullptr;
 	bool errorOccurred = false;
@@ -167,6 +181,7 @@ exit:
 // This exception is handled at pygmod_run, the function just below.
 void pygmodRunThrowing(Console& cons, lua_State *state) {
 	cons.log("Binary module loaded");
+	setMainThread();
 
 	Realm currentRealm = getCurrentRealm(state);
 
@@ -203,6 +218,8 @@ void pygmodRunThrowing(Console& cons, lua_State *state) {
     registerShutdownHook(state);
     cons.log("Shutdown hook registered");
 
+    registerStatsHook(state);
+
 	transitionToPythonLoader();
 }
 
@@ -241,6 +258,7 @@ int finalize(lua_State *state) {  // TODO: rewrite
 		clientInterp = nullptr;
 	else
 		serverInterp = nullptr;
+	forgetRealm(state);
 
 	cons.log("Python finalized!");
 
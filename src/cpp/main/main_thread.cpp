@@ -0,0 +1,21 @@
+#include <thread>
+
+#include "main_thread.hpp"
+
+static std::thread::id mainThread;
+
+void setMainThread() {
+	mainThread = std::this_thread::get_id();
+}
+
+bool isMainThread() {
+	return std::this_thread::get_id() == mainThread;
+}
+
+bool checkMainThread() {
+	if (isMainThread())
+		return true;
+	PyErr_SetString(PyExc_RuntimeError,
+	                "Lua can only be used from the main thread, use pygmod.dispatch.call_soon_main() in other threads");
+	return false;
+}
@@ -0,0 +1,16 @@
+// Lua must only be used from the game thread. These functions let _luastack refuse calls from other threads
+// instead of crashing the game.
+
+#pragma once
+
+#include <Python.h>
+
+// Remembers the current thread as the game thread. Called when PyGmod is loaded.
+void setMainThread();
+
+// Returns true if the current thread is the game thread.
+bool isMainThread();
+
+// Returns true if the current thread is the game thread.
+// Otherwise returns false with RuntimeError set.
+bool checkMainThread();
@@ -0,0 +1,126 @@
+#include "method_cache.hpp"
+
+// How many MetaBaseClass levels are walked at most
+#define MAX_METATABLE_DEPTH 16
+
+// Pushes the method cache table, creating it on the first use.
+static void pushMethodCache(ILuaBase *lua) {
+	lua->PushSpecial(SPECIAL_REG);
+	lua->GetField(-1, METHOD_CACHE_NAME);
+	if (!lua->IsType(-1, Type::Table)) {
+		lua->Pop();
+		lua->CreateTable();
+		// Metatables are weak keys, so the cache doesn't keep them alive
+		lua->CreateTable();
+		lua->PushString("k");
+		lua->SetField(-2, "__mode");
+		lua->SetMetaTable(-2);
+		lua->Push(-1);
+		lua->SetField(-3, METHOD_CACHE_NAME);
+	}
+	lua->Remove(-2);  // The registry
+}
+
+// Pushes t[name] without invoking metamethods, where t is the table at the given stack index.
+static void rawGetField(ILuaBase *lua, int index, const char *name) {
+	lua->PushString(name);
+	lua->RawGet(index < 0 ? index - 1 : index);
+}
+
+// Pushes the metatable from the MetaBaseClass chain, starting with the metatable at mtIndex,
+// which defines the method, or nothing if none of them does.
+static bool pushMethodOwner(ILuaBase *lua, int mtIndex, const char *name) {
+	lua->Push(mtIndex);
+	for (int depth = 0; depth < MAX_METATABLE_DEPTH; depth++) {
+		rawGetField(lua, -1, name);
+		bool found = !lua->IsType(-1, Type::Nil);
+		lua->Pop();
+		if (found)
+			return true;
+
+		rawGetField(lua, -1, "MetaBaseClass");
+		lua->Remove(-2);  // The current metatable
+		if (!lua->IsType(-1, Type::Table))
+			break;
+	}
+	lua->Pop();
+	return false;
+}
+
+// Pushes the method from the metatable of the value at objIndex using the cache,
+// or nothing if the metatable doesn't define it.
+static bool pushMetatableMethod(ILuaBase *lua, int objIndex, const char *name) {
+	if (!lua->GetMetaTable(objIndex))
+		return false;
+	int mtIndex = lua->Top();
+
+	pushMethodCache(lua);
+	int cacheIndex = lua->Top();
+	lua->Push(mtIndex);
+	lua->RawGet(cacheIndex);
+	if (!lua->IsType(-1, Type::Table)) {
+		lua->Pop();
+		lua->CreateTable();
+		lua->Push(mtIndex);
+		lua->Push(-2);
+		lua->RawSet(cacheIndex);
+	}
+	int entryIndex = lua->Top();
+
+	// Checking the cached owner. It's valid as long as it still defines the method
+	// and the metatable itself hasn't got a method with this name since then.
+	bool found = false;
+	rawGetField(lua, entryIndex, name);
+	if (lua->IsType(-1, Type::Table)) {
+		int ownerIndex = lua->Top();
+		bool shadowed = false;
+		if (!lua->RawEqual(ownerIndex, mtIndex)) {
+			rawGetField(lua, mtIndex, name);
+			shadowed = !lua->IsType(-1, Type::Nil);
+			lua->Pop();
+		}
+		if (!shadowed) {
+			rawGetField(lua, ownerIndex, name);
+			found = !lua->IsType(-1, Type::Nil);
+			if (!found)
+				lua->Pop();
+		}
+		if (found)
+			lua->Remove(ownerIndex);
+		else
+			lua->Pop();  // The owner
+	} else {
+		lua->Pop();  // nil
+	}
+
+	// Resolving the owner again and caching it
+	if (!found && pushMethodOwner(lua, mtIndex, name)) {
+		lua->PushString(name);
+		lua->Push(-2);
+		lua->RawSet(entryIndex);
+		rawGetField(lua, -1, name);
+		lua->Remove(-2);  // The owner
+		found = true;
+	}
+
+	if (found) {
+		// Moving the method below the metatable, the cache and the cache entry
+		lua->Insert(mtIndex);
+		lua->Pop(3);
+	} else {
+		lua->Pop(3);
+	}
+	return found;
+}
+
+bool pushMethod(ILuaBase *lua, int objIndex, const char *name) {
+	int type = lua->GetType(objIndex);
+	if (type == Type::Nil || type == Type::Bool || type == Type::Number || type == Type::Function)
+		return false;
+
+	if (type != Type::Table && pushMetatableMethod(lua, objIndex, name))
+		return true;
+
+	lua->GetField(objIndex, name);
+	return true;
+}
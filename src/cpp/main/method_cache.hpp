@@ -0,0 +1,22 @@
+// Resolves methods of userdata objects, such as entities and players, through a per-metatable cache,
+// so all objects with the same metatable share the resolved method.
+
+#pragma once
+
+#include <GarrysMod/Lua/Interface.h>
+
+using namespace GarrysMod::Lua;
+
+// Name of the registry table which caches where methods are defined, keyed by metatable (with weak keys)
+#define METHOD_CACHE_NAME "pygmod_method_cache"
+
+// Pushes obj[name], where obj is the value at the given absolute stack index.
+//
+// For userdata, the method is first looked up in its metatable and then in the MetaBaseClass chain
+// (e.g. Player, then Entity), the same order in which Garry's Mod looks up methods.
+// The table where the method was found is cached per metatable, and the method itself
+// is read from it on every call, so replacing a metatable method takes effect immediately.
+// If no metatable defines the method, obj[name] is looked up normally, invoking __index.
+//
+// Returns false and pushes nothing if obj can't be indexed.
+bool pushMethod(ILuaBase *lua, int objIndex, const char *name);
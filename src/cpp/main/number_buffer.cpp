@@ -0,0 +1,50 @@
+#include <cmath>
+#include <cstring>
+
+#include "number_buffer.hpp"
+
+NumberBuffer::~NumberBuffer() {
+	if (acquired)
+		PyBuffer_Release(&view);
+}
+
+bool NumberBuffer::acquire(PyObject *obj, bool writable, const char *name) {
+	int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | (writable ? PyBUF_WRITABLE : 0);
+	if (PyObject_GetBuffer(obj, &view, flags) < 0)
+		return false;
+	acquired = true;
+
+	// Dropping the native byte order prefix
+	const char *format = view.format == NULL ? "B" : view.format;
+	if (format[0] == '@' || format[0] == '=' || format[0] == '<')
+		format++;
+
+	if (std::strlen(format) != 1 || std::strchr("dfilq", format[0]) == NULL) {
+		PyErr_Format(PyExc_TypeError, "%s must be a buffer of doubles, floats or integers, not '%s'", name, view.format);
+		return false;
+	}
+	kind = format[0];
+	return true;
+}
+
+double NumberBuffer::get(Py_ssize_t i) const {
+	switch (kind) {
+	case 'd': return reinterpret_cast<const double *>(view.buf)[i];
+	case 'f': return reinterpret_cast<const float *>(view.buf)[i];
+	case 'i': return reinterpret_cast<const int *>(view.buf)[i];
+	case 'l': return static_cast<double>(reinterpret_cast<const long *>(view.buf)[i]);
+	default: return static_cast<double>(reinterpret_cast<const long long *>(view.buf)[i]);
+	}
+}
+
+void NumberBuffer::set(Py_ssize_t i, double value) {
+	if (kind != 'd' && kind != 'f' && std::isnan(value))
+		value = 0;  // Integers can't be NaN
+	switch (kind) {
+	case 'd': reinterpret_cast<double *>(view.buf)[i] = value; break;
+	case 'f': reinterpret_cast<float *>(view.buf)[i] = static_cast<float>(value); break;
+	case 'i': reinterpret_cast<int *>(view.buf)[i] = static_cast<int>(value); break;
+	case 'l': reinterpret_cast<long *>(view.buf)[i] = static_cast<long>(value); break;
+	default: reinterpret_cast<long long *>(view.buf)[i] = static_cast<long long>(value); break;
+	}
+}
@@ -0,0 +1,30 @@
+// Access to Python buffers of numbers, such as NumPy arrays and array.array objects.
+
+#pragma once
+
+#include <Python.h>
+
+// C-contiguous buffer of doubles, floats or signed integers.
+// Items are read and written as doubles regardless of the item type; NaN is written to integer buffers as 0.
+class NumberBuffer {
+public:
+	NumberBuffer() : acquired(false), kind(0) {}
+	~NumberBuffer();
+	NumberBuffer(const NumberBuffer &) = delete;
+	NumberBuffer &operator=(const NumberBuffer &) = delete;
+
+	// Gets the buffer of obj. name is used in error messages.
+	// Returns false with a Python exception set if obj is not a C-contiguous buffer of supported numbers.
+	bool acquire(PyObject *obj, bool writable, const char *name);
+
+	// Number of items in the buffer
+	Py_ssize_t size() const { return view.len / view.itemsize; }
+
+	double get(Py_ssize_t i) const;
+	void set(Py_ssize_t i, double value);
+
+private:
+	Py_buffer view;
+	bool acquired;
+	char kind;  // Item format without the byte order prefix
+};
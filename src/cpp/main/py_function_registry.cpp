@@ -3,16 +3,53 @@
 PyFunctionRegistry pyFunctionRegistry;
 
 PyFuncId PyFunctionRegistry::add(PyObject *func) {
+    auto registered = idsByFunc.find(func);
+    if (registered != idsByFunc.end())
+        return registered->second;
+
     Py_INCREF(func);
-    funcTable.push_back(func);
-    return nextId++;
+
+    PyFuncId id = nextId++;
+    while (funcTable.count(id) != 0)
+        id = nextId++;
+    funcTable[id] = {func, 0};
+
+    idsByFunc[func] = id;
+    if (idsByFunc.size() > peak)
+        peak = idsByFunc.size();
+    return id;
 }
 
 void PyFunctionRegistry::remove(PyFuncId id) {
-    Py_DECREF(funcTable[id]);
-    funcTable[id] = nullptr;
+    PyObject *func = funcTable[id].func;
+    idsByFunc.erase(func);
+    funcTable.erase(id);
+    freed++;
+    Py_DECREF(func);
+}
+
+void PyFunctionRegistry::retain(PyFuncId id) {
+    funcTable[id].closures++;
+}
+
+void PyFunctionRegistry::release(PyFuncId id) {
+    if (--funcTable[id].closures == 0)
+        remove(id);
 }
 
 PyObject *PyFunctionRegistry::operator[](PyFuncId id) {
-    return funcTable[id];
+    auto found = funcTable.find(id);
+    return found != funcTable.end() ? found->second.func : nullptr;
+}
+
+size_t PyFunctionRegistry::liveCount() const {
+    return idsByFunc.size();
+}
+
+size_t PyFunctionRegistry::freedCount() const {
+    return freed;
+}
+
+size_t PyFunctionRegistry::peakCount() const {
+    return peak;
 }
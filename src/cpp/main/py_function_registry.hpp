@@ -1,22 +1,53 @@
 // Provides PyFunctionRegistry class for storing Python functions which were sent to Lua, for example, hook and timer callbacks.
 #pragma once
 
-#include <vector>
+#include <unordered_map>
 #include <Python.h>
 
 typedef unsigned int PyFuncId;
 
 class PyFunctionRegistry {
-    // Here we store Python functions that were sent to Lua.
-    std::vector<PyObject *> funcTable;
+    struct Entry {
+        PyObject *func;
+        // How many Lua closures of this function are alive
+        unsigned int closures;
+    };
 
+    // Here we store Python functions that were sent to Lua, by function ID.
+    std::unordered_map<PyFuncId, Entry> funcTable;
+    // IDs of the registered functions, for looking up functions which were already sent to Lua.
+    std::unordered_map<PyObject *, PyFuncId> idsByFunc;
+    // ID of the next registered function. IDs are not reused, so a stale ID held by Lua
+    // (e.g. passed to py._passCallToPyFunc) never calls a function registered later.
+    // The proxy userdata stores IDs in a pointer, so they are 32-bit: after 2^32 registrations
+    // the IDs wrap around, skipping the ones which are still registered.
     PyFuncId nextId = 0;
 
+    size_t freed = 0;
+    size_t peak = 0;
+
+    void remove(PyFuncId);
+
 public:
+    // Registers a function and returns its ID.
+    // If the function is already registered, returns its existing ID.
     PyFuncId add(PyObject *);
-    void remove(PyFuncId);
+
+    // Must be called when a Lua closure of the function is created.
+    void retain(PyFuncId);
+    // Must be called when a Lua closure of the function is collected.
+    // The function is removed from the registry when its last closure is collected.
+    void release(PyFuncId);
+
+    // Returns the function with the given ID or nullptr if there is no such function.
     PyObject *operator[](PyFuncId);
 
+    // How many functions are registered now.
+    size_t liveCount() const;
+    // How many functions were removed from the registry since the start.
+    size_t freedCount() const;
+    // The largest number of functions which were registered at the same time.
+    size_t peakCount() const;
 };
 
 extern PyFunctionRegistry pyFunctionRegistry;
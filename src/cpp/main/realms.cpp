@@ -1,7 +1,23 @@
 #include "realms.hpp"
 #include "interpreter_states.hpp"
+#include "bridge_stats.hpp"
 
-Realm getCurrentRealm(lua_State* state) {
+// Unlike PyThreadState_Get(), returns NULL instead of aborting if no thread state is current
+#if PY_VERSION_HEX >= 0x030D0000
+	#define CURRENT_THREAD_STATE() PyThreadState_GetUnchecked()
+#else
+	#define CURRENT_THREAD_STATE() _PyThreadState_UncheckedGet()
+#endif
+
+// Realms of the Lua states seen so far. There are at most two of them: the client and the server one.
+struct RealmCacheEntry {
+	lua_State *state;
+	Realm realm;
+};
+static RealmCacheEntry realmCache[2] = {{nullptr, SERVER}, {nullptr, SERVER}};
+
+// Reads the realm from the CLIENT global.
+static Realm lookUpRealm(lua_State *state) {
 	LUA->PushSpecial(GarrysMod::Lua::SPECIAL_GLOB);
 	LUA->GetField(-1, "CLIENT");
 	bool client = LUA->GetBool();
@@ -9,15 +25,48 @@ Realm getCurrentRealm(lua_State* state) {
 	return client ? CLIENT : SERVER;
 }
 
+Realm getCurrentRealm(lua_State* state) {
+	for (RealmCacheEntry &entry : realmCache) {
+		if (entry.state == state)
+			return entry.realm;
+	}
+
+	Realm realm = lookUpRealm(state);
+	for (RealmCacheEntry &entry : realmCache) {
+		if (entry.state == nullptr) {
+			entry.state = state;
+			entry.realm = realm;
+			break;
+		}
+	}
+	return realm;
+}
+
+void forgetRealm(lua_State *state) {
+	for (RealmCacheEntry &entry : realmCache) {
+		if (entry.state == state)
+			entry.state = nullptr;
+	}
+}
+
 bool prepareInterpreterForCurrentRealm(lua_State *state) {
     Realm currentRealm = getCurrentRealm(state);
     PyThreadState *targetState = currentRealm == CLIENT ? clientInterp : serverInterp;
 	if (targetState == nullptr)
 		return false;
 
+	// Most of the time only one realm runs Python code, so its interpreter is already current
+	if (CURRENT_THREAD_STATE() == targetState)
+		return true;
+
 	auto gil = PyGILState_Ensure();
     PyThreadState_Swap(targetState);
 	PyGILState_Release(gil);
-	
+	countCrossing(COUNTER_REALM_SWAP);
+
 	return true;
 }
+
+unsigned long long getInterpreterSwapCount() {
+	return bridgeCounters[COUNTER_REALM_SWAP];
+}
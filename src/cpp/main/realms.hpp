@@ -8,11 +8,20 @@ enum Realm {
 };
 
 // Retrieves the current realm.
+// The realm is looked up once per Lua state and cached until forgetRealm() is called.
 Realm getCurrentRealm(lua_State* state);
 
+// Drops the cached realm of the Lua state. Must be called when the Lua state is about to be closed,
+// since a new Lua state may get the same address.
+void forgetRealm(lua_State *state);
+
 // Prepares the Python interpreter for the current realm by
 // swapping to the corresponding PyThreadState.
-// Returns true if the interpreter was actually switch
+// The swap is skipped if the interpreter of the current realm is already current.
+// Returns true if the interpreter is ready
 // or false if the destination interpreter doesn't exist
 // (for example on a dedicated server).
 bool prepareInterpreterForCurrentRealm(lua_State *state);
+
+// Returns how many times prepareInterpreterForCurrentRealm() has actually swapped the interpreter.
+unsigned long long getInterpreterSwapCount();
@@ -0,0 +1,153 @@
+#include <cmath>
+
+#include "trace_batch.hpp"
+#include "number_buffer.hpp"
+#include "valueconv.hpp"
+#include "lua_call.hpp"
+
+// Acquires an optional output buffer and checks that it can hold width numbers per trace.
+static bool acquireOutput(NumberBuffer &buffer, PyObject *obj, const char *name, Py_ssize_t count, int width) {
+	if (obj == Py_None)
+		return true;
+	if (!buffer.acquire(obj, true, name))
+		return false;
+	if (buffer.size() < count * width) {
+		PyErr_Format(PyExc_ValueError, "%s is too small: %zd values are needed for %zd traces, but it holds %zd",
+		             name, count * width, count, buffer.size());
+		return false;
+	}
+	return true;
+}
+
+// Pushes a vector made of 3 numbers of the buffer, starting with the given offset.
+static void pushVectorFromBuffer(ILuaBase *lua, const NumberBuffer &buffer, Py_ssize_t offset) {
+	Vector v;
+	v.x = static_cast<float>(buffer.get(offset));
+	v.y = static_cast<float>(buffer.get(offset + 1));
+	v.z = static_cast<float>(buffer.get(offset + 2));
+	lua->PushVector(v);
+}
+
+// Writes the vector field of the table at the given stack index to 3 numbers of the buffer, NaN if it's not a vector.
+static void writeVectorField(ILuaBase *lua, int tableIndex, const char *name, NumberBuffer &buffer, Py_ssize_t offset) {
+	lua->GetField(tableIndex, name);
+	bool isVector = lua->IsType(-1, Type::Vector);
+	const Vector *v = isVector ? &lua->GetVector(-1) : nullptr;
+	buffer.set(offset, isVector ? v->x : NAN);
+	buffer.set(offset + 1, isVector ? v->y : NAN);
+	buffer.set(offset + 2, isVector ? v->z : NAN);
+	lua->Pop();
+}
+
+// Sets the field of the table at the given stack index to a Python value, unless it's None.
+// Returns false with a Python exception set if the value couldn't be converted.
+static bool setOptionalField(ILuaBase *lua, int tableIndex, const char *name, PyObject *value) {
+	if (value == Py_None)
+		return true;
+	if (!convertPyToLua(lua, value)) {
+		lua->Pop();  // nil pushed in place of the value
+		return false;
+	}
+	lua->SetField(tableIndex, name);
+	return true;
+}
+
+Py_ssize_t runTraceBatch(ILuaBase *lua, const TraceBatchArgs &args) {
+	NumberBuffer starts, ends;
+	if (!starts.acquire(args.starts, false, "starts") || !ends.acquire(args.ends, false, "ends"))
+		return -1;
+	if (starts.size() % 3 != 0 || starts.size() != ends.size()) {
+		PyErr_SetString(PyExc_ValueError, "starts and ends must have the same size, 3 numbers per trace");
+		return -1;
+	}
+	Py_ssize_t count = starts.size() / 3;
+
+	NumberBuffer hitPos, fraction, normal, entity;
+	if (!acquireOutput(hitPos, args.hitPos, "hit_pos", count, 3)
+			|| !acquireOutput(fraction, args.fraction, "fraction", count, 1)
+			|| !acquireOutput(normal, args.normal, "normal", count, 3)
+			|| !acquireOutput(entity, args.entity, "entity", count, 1))
+		return -1;
+
+	int topBefore = lua->Top();
+
+	// util.TraceLine or util.TraceHull
+	lua->PushSpecial(SPECIAL_GLOB);
+	lua->GetField(-1, "util");
+	lua->Remove(-2);
+	if (!lua->IsType(-1, Type::Table)) {
+		lua->Pop(lua->Top() - topBefore);
+		PyErr_SetString(PyExc_RuntimeError, "util library is not available");
+		return -1;
+	}
+	lua->GetField(-1, args.hull ? "TraceHull" : "TraceLine");
+	lua->Remove(-2);
+	int traceFuncIndex = lua->Top();
+
+	// Entity.EntIndex, taken once from the Entity metatable
+	lua->PushSpecial(SPECIAL_REG);
+	lua->GetField(-1, "Entity");
+	lua->GetField(-1, "EntIndex");
+	lua->Remove(-2);
+	lua->Remove(-2);
+	int entIndexFuncIndex = lua->Top();
+
+	// The result table, filled by the trace function on every call instead of creating a new one
+	lua->CreateTable();
+	int resultIndex = lua->Top();
+
+	// The trace structure. Only start and endpos change between traces
+	lua->CreateTable();
+	int traceIndex = lua->Top();
+	if (!setOptionalField(lua, traceIndex, "mask", args.mask)
+			|| !setOptionalField(lua, traceIndex, "filter", args.filter)
+			|| !setOptionalField(lua, traceIndex, "mins", args.mins)
+			|| !setOptionalField(lua, traceIndex, "maxs", args.maxs)) {
+		lua->Pop(lua->Top() - topBefore);
+		return -1;
+	}
+	lua->Push(resultIndex);
+	lua->SetField(traceIndex, "output");
+
+	for (Py_ssize_t i = 0; i < count; i++) {
+		pushVectorFromBuffer(lua, starts, i * 3);
+		lua->SetField(traceIndex, "start");
+		pushVectorFromBuffer(lua, ends, i * 3);
+		lua->SetField(traceIndex, "endpos");
+
+		lua->Push(traceFuncIndex);
+		lua->Push(traceIndex);
+		if (lua->PCall(1, 0, 0) != 0) {
+			raiseLuaError(lua);
+			lua->Pop(lua->Top() - topBefore);
+			return -1;
+		}
+
+		if (args.hitPos != Py_None)
+			writeVectorField(lua, resultIndex, "HitPos", hitPos, i * 3);
+		if (args.normal != Py_None)
+			writeVectorField(lua, resultIndex, "HitNormal", normal, i * 3);
+		if (args.fraction != Py_None) {
+			lua->GetField(resultIndex, "Fraction");
+			fraction.set(i, lua->IsType(-1, Type::Number) ? lua->GetNumber(-1) : NAN);
+			lua->Pop();
+		}
+		if (args.entity != Py_None) {
+			double index = -1;
+			lua->GetField(resultIndex, "Hit");
+			bool hit = lua->GetBool(-1);
+			lua->Pop();
+			if (hit) {
+				lua->Push(entIndexFuncIndex);
+				lua->GetField(resultIndex, "Entity");
+				if (lua->PCall(1, 1, 0) == 0 && lua->IsType(-1, Type::Number))
+					index = lua->GetNumber(-1);
+				lua->Pop();  // The index or the error message
+			}
+			entity.set(i, index);
+		}
+	}
+
+	lua->Pop(lua->Top() - topBefore);
+	return count;
+}
@@ -0,0 +1,23 @@
+// Runs many util.TraceLine or util.TraceHull traces in a single call.
+
+#pragma once
+
+#include <Python.h>
+#include <GarrysMod/Lua/Interface.h>
+
+using namespace GarrysMod::Lua;
+
+struct TraceBatchArgs {
+	bool hull;  // util.TraceHull instead of util.TraceLine
+	PyObject *starts, *ends;  // Buffers of 3 numbers per trace
+	// Trace structure fields shared by all traces, None if not used
+	PyObject *mask, *filter, *mins, *maxs;
+	// Output buffers, None if not needed
+	PyObject *hitPos, *fraction, *normal, *entity;
+};
+
+// Runs a trace for every start and end point, reusing the same trace structure and result tables.
+// Writes 3 numbers per trace to hitPos and normal, 1 number per trace to fraction
+// and the index of the hit entity (-1 if nothing was hit) to entity.
+// Returns the number of traces or -1 with a Python exception set.
+Py_ssize_t runTraceBatch(ILuaBase *lua, const TraceBatchArgs &args);
@@ -1,8 +1,128 @@
 #include <string>
+#include <vector>
+#include <unordered_map>
 #include "valueconv.hpp"
-#include "py_function_registry.hpp"
+#include "lua2py_interop.hpp"
+#include "_luastack.hpp"
+#include "bridge_stats.hpp"
+
+// Name of the Color metatable in the Lua registry
+#define COLOR_METATABLE_NAME "Color"
+
+// Attribute names of pygmod.valuetypes classes. Color attributes are also the keys of Lua Color tables.
+static const char *const vectorAttrs[] = {"x", "y", "z"};
+static const char *const angleAttrs[] = {"p", "y", "r"};
+static const char *const colorAttrs[] = {"r", "g", "b", "a"};
+
+// Turns a relative stack index into an absolute one, so it stays valid while values are being pushed.
+static int absoluteIndex(ILuaBase *lua, int index) {
+	return index < 0 ? lua->Top() + index + 1 : index;
+}
+
+// Pushes the Color metatable, or nil if Garry's Mod hasn't created it yet.
+// Every table conversion checks for it, so it's looked up in the registry only once per realm
+// and then pushed by a reference.
+static void pushColorMetatable(ILuaBase *lua) {
+	LuastackState *state = getLuastackState();
+	if (state != nullptr && state->colorMetatableRef != 0) {
+		lua->ReferencePush(state->colorMetatableRef);
+		return;
+	}
+
+	lua->PushSpecial(SPECIAL_REG);
+	lua->GetField(-1, COLOR_METATABLE_NAME);
+	lua->Remove(-2);  // The registry
+	if (state != nullptr && lua->IsType(-1, Type::Table)) {
+		lua->Push(-1);
+		state->colorMetatableRef = lua->ReferenceCreate();
+	}
+}
+
+// Returns true if the table at the given stack index has the Color metatable.
+static bool isColorTable(ILuaBase *lua, int index) {
+	if (!lua->GetMetaTable(index))
+		return false;
+	pushColorMetatable(lua);
+	bool isColor = lua->RawEqual(-1, -2);
+	lua->Pop(2);  // The metatable and the Color metatable
+	return isColor;
+}
+
+// Reads the numeric attributes of an instance of a pygmod.valuetypes class.
+// Returns false with a Python exception set on failure.
+static bool getNumberAttrs(PyObject *obj, const char *const names[], double values[], int count) {
+	for (int i = 0; i < count; i++) {
+		PyObject *attr = PyObject_GetAttrString(obj, names[i]);
+		if (attr == NULL)
+			return false;
+		values[i] = PyFloat_AsDouble(attr);
+		Py_DECREF(attr);
+		if (values[i] == -1.0 && PyErr_Occurred())
+			return false;
+	}
+	return true;
+}
+
+// Pushes a pygmod.valuetypes.Vector, Angle or Color as the corresponding Lua value.
+// Returns 1 if it was pushed, 0 if obj is not an instance of these classes and nothing was pushed,
+// or -1 with a Python exception set and nil pushed if it couldn't be converted.
+static int pushValueType(ILuaBase *lua, PyObject *obj) {
+	LuastackState *state = getCachedTypes();
+	if (state == nullptr) {
+		lua->PushNil();
+		return -1;
+	}
+
+	double values[4];
+
+	if (PyObject_TypeCheck(obj, reinterpret_cast<PyTypeObject *>(state->vectorType))) {
+		if (getNumberAttrs(obj, vectorAttrs, values, 3)) {
+			Vector v;
+			v.x = values[0];
+			v.y = values[1];
+			v.z = values[2];
+			lua->PushVector(v);
+			return 1;
+		}
+	}
+
+	else if (PyObject_TypeCheck(obj, reinterpret_cast<PyTypeObject *>(state->angleType))) {
+		if (getNumberAttrs(obj, angleAttrs, values, 3)) {
+			QAngle a;
+			a.x = values[0];
+			a.y = values[1];
+			a.z = values[2];
+			lua->PushAngle(a);
+			return 1;
+		}
+	}
+
+	else if (PyObject_TypeCheck(obj, reinterpret_cast<PyTypeObject *>(state->colorType))) {
+		if (getNumberAttrs(obj, colorAttrs, values, 4)) {
+			lua->CreateTable();
+			for (int i = 0; i < 4; i++) {
+				lua->PushNumber(values[i]);
+				lua->SetField(-2, colorAttrs[i]);
+			}
+			pushColorMetatable(lua);
+			lua->SetMetaTable(-2);
+			return 1;
+		}
+	}
+
+	else {
+		return 0;
+	}
+
+	// One of the attributes is missing or is not a number
+	lua->PushNil();
+	return -1;
+}
+
+bool convertPyToLua(ILuaBase *lua, PyObject *obj) {
+	countCrossing(COUNTER_PY_TO_LUA);
+	int valueTypePushed;
 
-void convertPyToLua(ILuaBase *lua, PyObject *obj) {
 	if (obj == Py_None) {
 		lua->PushNil();
 	}
@@ -26,16 +146,12 @@ void convertPyToLua(ILuaBase *lua, PyObject *obj) {
 	}
 
 	else if (PyFunction_Check(obj)) {
-		auto funcIdString = std::to_string(pyFunctionRegistry.add(obj));
+		pushPyFunction(lua, obj);
+	}
 
-		lua->PushSpecial(SPECIAL_GLOB);
-		lua->GetField(-1, "RunString");
-		lua->PushString((std::string("_pygmod_func = function(...) return py._passCallToPyFunc(") + funcIdString + ", ...) end").c_str());
-		lua->Call(1, 0);
-		lua->GetField(-1, "_pygmod_func");
-		lua->PushNil();
-		lua->SetField(-3, "_pygmod_func");
-		lua->Remove(-2);  // Removing _G
+	else if ((valueTypePushed = pushValueType(lua, obj)) != 0) {
+		// Already pushed, or nil was pushed in place of a value which couldn't be converted
+		return valueTypePushed > 0;
 	}
 
 	// obj is a pygmod.lua.LuaObject instance.
@@ -65,6 +181,40 @@ void convertPyToLua(ILuaBase *lua, PyObject *obj) {
 		}
 		lua->SetMetaTable(-2);
 	}
+	return true;
+}
+
+void throwConversionError(ILuaBase *lua) {
+	PyErr_Print();
+	lua->ThrowError("couldn't convert the Python value to a Lua value");
+}
+
+// Wraps the Lua value at the given stack index in a new instance of wrapperType,
+// which is pygmod.lua.Table or pygmod.lua.CallableLuaObject.
+// The instance is created without calling __init__() and __setattr__(),
+// so no Python code is run: only the reference is assigned to its "_ref" attribute.
+static PyObject *wrapLuaObject(ILuaBase *lua, int index, LuastackState *state, PyObject *wrapperType) {
+	PyTypeObject *type = reinterpret_cast<PyTypeObject *>(wrapperType);
+	PyObject *noArgs = PyTuple_New(0);
+	PyObject *obj = type->tp_new(type, noArgs, NULL);
+	Py_DECREF(noArgs);
+	if (obj == NULL)
+		return NULL;
+
+	lua->Push(index);
+	int ref = lua->ReferenceCreate();
+	countCrossing(COUNTER_REFERENCE_CREATE);
+	PyObject *refPyInt = PyLong_FromLong(ref);
+	if (refPyInt == NULL || PyObject_GenericSetAttr(obj, state->refAttrName, refPyInt) < 0) {
+		lua->ReferenceFree(ref);
+		countCrossing(COUNTER_REFERENCE_FREE);
+		Py_XDECREF(refPyInt);
+		Py_DECREF(obj);
+		return NULL;
+	}
+
+	Py_DECREF(refPyInt);
+	return obj;
 }
 
 bool isNumberFractional(double n) {
@@ -72,6 +222,7 @@ bool isNumberFractional(double n) {
 }
 
 PyObject *convertLuaToPy(ILuaBase *lua, int index) {
+	countCrossing(COUNTER_LUA_TO_PY);
 	int type = lua->GetType(index);
 
 	// switch statement is not used because it doesn't support declaring new variables inside of it
@@ -96,14 +247,42 @@ PyObject *convertLuaToPy(ILuaBase *lua, int index) {
 	}
 
 	if (type == Type::Function) {
-		PyObject *luaModule = PyImport_ImportModule("pygmod.lua");
-		if (luaModule == NULL)
+		LuastackState *state = getCachedTypes();
+		if (state == nullptr)
+			return NULL;
+		return wrapLuaObject(lua, index, state, state->callableType);
+	}
+
+	if (type == Type::Vector) {
+		LuastackState *state = getCachedTypes();
+		if (state == nullptr)
+			return NULL;
+		const Vector &v = lua->GetVector(index);
+		return PyObject_CallFunction(state->vectorType, "ddd",
+		                             static_cast<double>(v.x), static_cast<double>(v.y), static_cast<double>(v.z));
+	}
+
+	if (type == Type::Angle) {
+		LuastackState *state = getCachedTypes();
+		if (state == nullptr)
 			return NULL;
-		PyObject *luaFuncFromStackFunc = PyObject_GetAttrString(luaModule, "_lua_func_from_stack");
-		PyObject *luaFuncObject = PyObject_CallFunction(luaFuncFromStackFunc, "i", index);
-		Py_DECREF(luaFuncFromStackFunc);
-		Py_DECREF(luaModule);
-		return luaFuncObject;
+		const QAngle &a = lua->GetAngle(index);
+		return PyObject_CallFunction(state->angleType, "ddd",
+		                             static_cast<double>(a.x), static_cast<double>(a.y), static_cast<double>(a.z));
+	}
+
+	if (type == Type::Table && isColorTable(lua, index)) {
+		LuastackState *state = getCachedTypes();
+		if (state == nullptr)
+			return NULL;
+		index = absoluteIndex(lua, index);
+		double components[4];
+		for (int i = 0; i < 4; i++) {
+			lua->GetField(index, colorAttrs[i]);
+			components[i] = lua->GetNumber(-1);
+			lua->Pop();
+		}
+		return PyObject_CallFunction(state->colorType, "dddd", components[0], components[1], components[2], components[3]);
 	}
 
 	if (type == LUA_TYPE_PYOBJECT || type == LUA_TYPE_PYCALLABLE) {
@@ -115,12 +294,219 @@ PyObject *convertLuaToPy(ILuaBase *lua, int index) {
 
 	// else
 
-	PyObject *luaModule = PyImport_ImportModule("pygmod.lua");
-	if (luaModule == NULL)
+	LuastackState *state = getCachedTypes();
+	if (state == nullptr)
 		return NULL;
-	PyObject *tableFromStackFunc = PyObject_GetAttrString(luaModule, "_table_from_stack");
-	PyObject *tableObject = PyObject_CallFunction(tableFromStackFunc, "i", index);
-	Py_DECREF(tableFromStackFunc);
-	Py_DECREF(luaModule);
-	return tableObject;
+	return wrapLuaObject(lua, index, state, state->tableType);
+}
+
+// State of a single convertLuaTableToDict() call.
+struct TableToDictContext {
+	ILuaBase *lua;
+	int maxDepth;
+	// Stack index of the Lua table which maps already converted tables to their indices in "dicts"
+	int seenIndex;
+	// Dicts which were created during the conversion.
+	// These are borrowed references, the resulting dict owns all of them.
+	std::vector<PyObject *> dicts;
+};
+
+static PyObject *tableToDict(TableToDictContext &ctx, int index, int depth) {
+	ILuaBase *lua = ctx.lua;
+
+	PyObject *dict = PyDict_New();
+	if (dict == NULL)
+		return NULL;
+
+	// Remembering the table before walking through it, so the values referring to it will get the same dict
+	lua->Push(index);
+	lua->PushNumber(ctx.dicts.size());
+	lua->RawSet(ctx.seenIndex);
+	ctx.dicts.push_back(dict);
+
+	lua->PushNil();
+	while (lua->Next(index)) {
+		// The key is at -2, the value is at -1
+		PyObject *key = convertLuaToPy(lua, -2);
+		PyObject *value = NULL;
+
+		if (key == NULL) {
+			// Falling through to the error handling below
+		} else if (depth < ctx.maxDepth && lua->GetType(-1) == Type::Table && !isColorTable(lua, -1)) {
+			lua->Push(-1);
+			lua->RawGet(ctx.seenIndex);
+			if (lua->GetType(-1) == Type::Number) {  // This table was already converted
+				value = ctx.dicts[static_cast<size_t>(lua->GetNumber(-1))];
+				Py_INCREF(value);
+				lua->Pop();
+			} else {
+				lua->Pop();
+				value = tableToDict(ctx, lua->Top(), depth + 1);
+			}
+		} else {
+			value = convertLuaToPy(lua, -1);
+		}
+
+		if (value == NULL || PyDict_SetItem(dict, key, value) < 0) {
+			Py_XDECREF(key);
+			Py_XDECREF(value);
+			Py_DECREF(dict);
+			lua->Pop(2);  // The key and the value
+			return NULL;
+		}
+
+		Py_DECREF(key);
+		Py_DECREF(value);
+		lua->Pop();  // Popping the value and keeping the key for the next iteration
+	}
+
+	return dict;
+}
+
+PyObject *convertLuaTableToDict(ILuaBase *lua, int index, int maxDepth) {
+	index = absoluteIndex(lua, index);
+
+	TableToDictContext ctx;
+	ctx.lua = lua;
+	ctx.maxDepth = maxDepth;
+	lua->CreateTable();
+	ctx.seenIndex = lua->Top();
+
+	PyObject *dict = tableToDict(ctx, index, 0);
+
+	lua->Pop();  // The table of converted tables
+	return dict;
+}
+
+// State of a single updateLuaTable() call.
+struct UpdateTableContext {
+	ILuaBase *lua;
+	bool recursive;
+	int maxDepth;
+	// Lua references to the tables which were created from Python containers during the conversion.
+	// Keys are borrowed references.
+	std::unordered_map<PyObject *, int> tableRefs;
+};
+
+static bool fillTableFromMapping(UpdateTableContext &ctx, int index, PyObject *mapping, int depth);
+static bool fillTableFromSequence(UpdateTableContext &ctx, int index, PyObject *sequence, int depth);
+
+// Pushes a Python value, converting dicts, lists and tuples to new tables if the conversion is recursive.
+// depth is the nesting level of the value: 1 for the values of the mapping passed to updateLuaTable().
+static bool pushValue(UpdateTableContext &ctx, PyObject *obj, int depth) {
+	ILuaBase *lua = ctx.lua;
+
+	bool isDict = PyDict_Check(obj);
+	if (!ctx.recursive || !(isDict || PyList_Check(obj) || PyTuple_Check(obj))) {
+		if (convertPyToLua(lua, obj))
+			return true;
+		lua->Pop();  // nil pushed in place of the value
+		return false;
+	}
+
+	auto converted = ctx.tableRefs.find(obj);
+	if (converted != ctx.tableRefs.end()) {
+		lua->ReferencePush(converted->second);
+		return true;
+	}
+
+	// Every nested container is converted by a recursive call, so the depth is limited
+	// to keep deeply nested input from overflowing the C stack
+	if (depth > ctx.maxDepth) {
+		PyErr_Format(PyExc_RecursionError, "containers are nested more than %d levels deep", ctx.maxDepth);
+		return false;
+	}
+
+	lua->CreateTable();
+	lua->Push(-1);
+	ctx.tableRefs[obj] = lua->ReferenceCreate();
+
+	int tableIndex = lua->Top();
+	bool success = isDict ? fillTableFromMapping(ctx, tableIndex, obj, depth)
+		: fillTableFromSequence(ctx, tableIndex, obj, depth);
+	if (!success)
+		lua->Pop();  // The new table
+	return success;
+}
+
+// Does t[key] = value, where t is the table at the given stack index.
+static bool setTableItem(UpdateTableContext &ctx, int index, PyObject *key, PyObject *value, int depth) {
+	if (!convertPyToLua(ctx.lua, key)) {
+		ctx.lua->Pop();  // nil pushed in place of the key
+		return false;
+	}
+	if (!pushValue(ctx, value, depth)) {
+		ctx.lua->Pop();  // The key
+		return false;
+	}
+	ctx.lua->SetTable(index);
+	return true;
+}
+
+// depth is the nesting level of the mapping, its values are one level deeper.
+static bool fillTableFromMapping(UpdateTableContext &ctx, int index, PyObject *mapping, int depth) {
+	if (PyDict_Check(mapping)) {
+		Py_ssize_t pos = 0;
+		PyObject *key, *value;
+		while (PyDict_Next(mapping, &pos, &key, &value)) {
+			if (!setTableItem(ctx, index, key, value, depth + 1))
+				return false;
+		}
+		return true;
+	}
+
+	PyObject *items = PyMapping_Items(mapping);
+	if (items == NULL)
+		return false;
+
+	bool success = true;
+	for (Py_ssize_t i = 0; success && i < PyList_GET_SIZE(items); i++) {
+		PyObject *item = PyList_GET_ITEM(items, i);
+		if (!PyTuple_Check(item) || PyTuple_GET_SIZE(item) != 2) {
+			PyErr_SetString(PyExc_TypeError, "mapping items must be (key, value) pairs");
+			success = false;
+		} else {
+			success = setTableItem(ctx, index, PyTuple_GET_ITEM(item, 0), PyTuple_GET_ITEM(item, 1), depth + 1);
+		}
+	}
+	Py_DECREF(items);
+	return success;
+}
+
+static bool fillTableFromSequence(UpdateTableContext &ctx, int index, PyObject *sequence, int depth) {
+	PyObject *fast = PySequence_Fast(sequence, "expected a sequence");
+	if (fast == NULL)
+		return false;
+
+	bool success = true;
+	for (Py_ssize_t i = 0; success && i < PySequence_Fast_GET_SIZE(fast); i++) {
+		ctx.lua->PushNumber(i + 1);  // Lua arrays start at 1
+		success = pushValue(ctx, PySequence_Fast_GET_ITEM(fast, i), depth + 1);
+		if (success)
+			ctx.lua->SetTable(index);
+		else
+			ctx.lua->Pop();  // The key
+	}
+	Py_DECREF(fast);
+	return success;
+}
+
+bool updateLuaTable(ILuaBase *lua, int index, PyObject *mapping, bool recursive, int maxDepth) {
+	index = absoluteIndex(lua, index);
+
+	UpdateTableContext ctx;
+	ctx.lua = lua;
+	ctx.recursive = recursive;
+	ctx.maxDepth = maxDepth;
+	if (recursive) {
+		// The mapping may contain itself
+		lua->Push(index);
+		ctx.tableRefs[mapping] = lua->ReferenceCreate();
+	}
+
+	bool success = fillTableFromMapping(ctx, index, mapping, 0);
+
+	for (auto &converted : ctx.tableRefs)
+		lua->ReferenceFree(converted.second);
+	return success;
 }
@@ -12,9 +12,30 @@ using namespace GarrysMod::Lua;
 #define LUA_TYPE_PYCALLABLE (Type::Type_Count + 12)
 
 // Converts a Python object to a Lua object and pushes it to the stack.
-void convertPyToLua(ILuaBase *lua, PyObject *obj);
+// Exactly one value is always pushed. If the object can't be converted, e.g. a Vector whose
+// component is not a number, nil is pushed and false is returned with the Python exception set.
+bool convertPyToLua(ILuaBase *lua, PyObject *obj);
+
+// Prints the Python exception set by a failed convertPyToLua() and raises a Lua error.
+// Used by functions called from Lua after they have released their Python references.
+void throwConversionError(ILuaBase *lua);
 
 // Gets a Lua object from the given stack index,
 // converts it to a Python object and returns it.
 // Returns a new reference (reference counter will be already increased).
 PyObject *convertLuaToPy(ILuaBase *lua, int index = -1);
+
+// Converts the Lua table at the given stack index to a Python dict in a single pass.
+// Nested tables are converted to dicts as well until they are maxDepth levels deep;
+// deeper tables (and all nested tables if maxDepth is 0) are wrapped in pygmod.lua.Table.
+// A table met more than once, including a table which contains itself,
+// is converted only once and the same dict is shared between all places it occurs in.
+// Returns a new reference or NULL with a Python exception set.
+PyObject *convertLuaTableToDict(ILuaBase *lua, int index, int maxDepth = 0);
+
+// Sets t[k] = v for every item of the Python mapping, where t is the table at the given stack index.
+// If recursive is true, nested dicts, lists and tuples are converted to new Lua tables
+// instead of being wrapped in PyObject userdata. A container nested more than maxDepth levels deep
+// fails the conversion with RecursionError.
+// Returns false with a Python exception set on failure.
+bool updateLuaTable(ILuaBase *lua, int index, PyObject *mapping, bool recursive = false, int maxDepth = 32);
@@ -0,0 +1,160 @@
+#include <atomic>
+#include <chrono>
+
+#include "watchdog.hpp"
+#include "_luastack.hpp"
+
+const double watchdogBucketBounds[WATCHDOG_BUCKETS - 1] = {
+	0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.015, 0.025, 0.05, 0.1
+};
+
+static long long nowNanoseconds() {
+	return std::chrono::duration_cast<std::chrono::nanoseconds>(
+		std::chrono::steady_clock::now().time_since_epoch()).count();
+}
+
+// Callbacks created from the same definition, e.g. closures, share the statistics
+static PyObject *statsKey(PyObject *func) {
+	if (PyMethod_Check(func))
+		func = PyMethod_GET_FUNCTION(func);
+	if (PyFunction_Check(func))
+		return PyFunction_GET_CODE(func);
+	return reinterpret_cast<PyObject *>(Py_TYPE(func));
+}
+
+static PyObject *describeKey(PyObject *key) {
+	if (PyCode_Check(key)) {
+		PyCodeObject *code = reinterpret_cast<PyCodeObject *>(key);
+		#if PY_VERSION_HEX >= 0x030B0000
+			PyObject *name = code->co_qualname;
+		#else
+			PyObject *name = code->co_name;
+		#endif
+		return PyUnicode_FromFormat("%U (%U:%d)", name, code->co_filename, code->co_firstlineno);
+	}
+	return PyUnicode_FromFormat("%s object", reinterpret_cast<PyTypeObject *>(key)->tp_name);
+}
+
+WatchedCall watchdogBegin() {
+	LuastackState *moduleState = getLuastackState();
+	if (moduleState == nullptr || !moduleState->watchdog.enabled)
+		return WatchedCall{nullptr, 0, 0, 0, 0};
+
+	WatchdogState &state = moduleState->watchdog;
+	WatchedCall call{&state, nowNanoseconds(), ++state.lastSequence,
+	                 state.currentStart.load(), state.currentSequence.load()};
+	state.currentSequence.store(call.sequence);
+	state.currentStart.store(call.start);
+	return call;
+}
+
+static CallbackStats *getStats(WatchdogState &state, PyObject *func) {
+	if (state.stats == nullptr)
+		state.stats = new std::unordered_map<PyObject *, CallbackStats>();
+
+	PyObject *key = statsKey(func);
+	auto found = state.stats->find(key);
+	if (found != state.stats->end())
+		return &found->second;
+
+	PyObject *name = describeKey(key);
+	if (name == NULL)
+		return nullptr;
+	Py_INCREF(key);
+	CallbackStats &stats = (*state.stats)[key];
+	stats = CallbackStats{};
+	stats.name = name;
+	return &stats;
+}
+
+static void reportSlowCall(PyObject *name, double seconds, long long sequence) {
+	PyObject *watchdogModule = PyImport_ImportModule("pygmod.watchdog");
+	if (watchdogModule == NULL)
+		return;
+	PyObject *result = PyObject_CallMethod(watchdogModule, "_report_slow", "OdL", name, seconds, sequence);
+	Py_XDECREF(result);
+	Py_DECREF(watchdogModule);
+}
+
+void watchdogEnd(const WatchedCall &call, PyObject *func) {
+	if (call.state == nullptr)
+		return;
+
+	WatchdogState &state = *call.state;
+	double seconds = (nowNanoseconds() - call.start) / 1e9;
+	// The outer call, if any, is running again
+	state.currentSequence.store(call.outerSequence);
+	state.currentStart.store(call.outerStart);
+
+	PyObject *excType, *excValue, *excTraceback;
+	PyErr_Fetch(&excType, &excValue, &excTraceback);
+
+	CallbackStats *stats = getStats(state, func);
+	if (stats != nullptr) {
+		stats->calls++;
+		stats->totalSeconds += seconds;
+		if (seconds > stats->maxSeconds)
+			stats->maxSeconds = seconds;
+		int bucket = 0;
+		while (bucket < WATCHDOG_BUCKETS - 1 && seconds > watchdogBucketBounds[bucket])
+			bucket++;
+		stats->buckets[bucket]++;
+
+		if (seconds > state.thresholdSeconds) {
+			// The statistics may be cleared while the report is logged
+			PyObject *name = stats->name;
+			Py_INCREF(name);
+			reportSlowCall(name, seconds, call.sequence);
+			Py_DECREF(name);
+		}
+	}
+
+	// Errors of the watchdog itself must not replace the error of the callback
+	PyErr_Clear();
+	PyErr_Restore(excType, excValue, excTraceback);
+}
+
+PyObject *watchdogStatsList(WatchdogState &state) {
+	PyObject *result = PyList_New(0);
+	if (result == NULL || state.stats == nullptr)
+		return result;
+
+	for (auto &[key, stats] : *state.stats) {
+		PyObject *histogram = PyTuple_New(WATCHDOG_BUCKETS);
+		if (histogram == NULL) {
+			Py_DECREF(result);
+			return NULL;
+		}
+		for (int i = 0; i < WATCHDOG_BUCKETS; i++)
+			PyTuple_SET_ITEM(histogram, i, PyLong_FromUnsignedLongLong(stats.buckets[i]));
+
+		PyObject *item = Py_BuildValue("(OKddN)", stats.name, stats.calls, stats.totalSeconds,
+		                               stats.maxSeconds, histogram);
+		if (item == NULL || PyList_Append(result, item) < 0) {
+			Py_XDECREF(item);
+			Py_DECREF(result);
+			return NULL;
+		}
+		Py_DECREF(item);
+	}
+	return result;
+}
+
+PyObject *watchdogCurrent(WatchdogState &state) {
+	long long start = state.currentStart.load();
+	long long sequence = state.currentSequence.load();
+	if (start == 0)
+		Py_RETURN_NONE;
+	return Py_BuildValue("(Ld)", sequence, (nowNanoseconds() - start) / 1e9);
+}
+
+void clearWatchdogStats(WatchdogState &state) {
+	if (state.stats == nullptr)
+		return;
+	for (auto &[key, stats] : *state.stats) {
+		Py_DECREF(key);
+		Py_DECREF(stats.name);
+	}
+	delete state.stats;
+	state.stats = nullptr;
+}
@@ -0,0 +1,64 @@
+// Measures the wall time of Python callbacks called from Lua and reports the slow ones.
+
+#pragma once
+
+#include <atomic>
+#include <unordered_map>
+#include <Python.h>
+
+// Number of histogram buckets. The upper bounds of all buckets but the last one are in watchdogBucketBounds.
+constexpr int WATCHDOG_BUCKETS = 12;
+extern const double watchdogBucketBounds[WATCHDOG_BUCKETS - 1];
+
+// Timing statistics of a callable.
+struct CallbackStats {
+	PyObject *name;
+	unsigned long long calls;
+	double totalSeconds;
+	double maxSeconds;
+	unsigned long long buckets[WATCHDOG_BUCKETS];
+};
+
+// Per-interpreter state of the watchdog, kept in the _luastack module state.
+struct WatchdogState {
+	bool enabled;
+	double thresholdSeconds;
+	// Start time of the running callback in steady clock nanoseconds (0 if none) and its sequence number.
+	// Written by the game thread and read by the sampler thread of pygmod.watchdog.
+	// std::atomic keeps them 8-byte aligned in 32-bit builds, where plain long long struct members are not.
+	// The module state is zero-initialized, which is a valid value of both.
+	std::atomic<long long> currentStart;
+	std::atomic<long long> currentSequence;
+	// Sequence number of the last started callback
+	long long lastSequence;
+	// Statistics keyed by the code object of the callable (or its type if it's not a function).
+	// The keys are strong references.
+	std::unordered_map<PyObject *, CallbackStats> *stats;
+};
+
+// A callback call being timed. Returned by watchdogBegin() and passed to watchdogEnd().
+struct WatchedCall {
+	WatchdogState *state;  // nullptr if the watchdog is disabled
+	long long start;
+	long long sequence;
+	// The call which was running when this one started, restored when this one ends
+	long long outerStart;
+	long long outerSequence;
+};
+
+// Starts timing a Python callback called from Lua in the current interpreter.
+WatchedCall watchdogBegin();
+
+// Finishes timing the call of func and records it. If the call took longer than the threshold,
+// pygmod.watchdog reports it. A pending Python exception is preserved.
+void watchdogEnd(const WatchedCall &call, PyObject *func);
+
+// Returns a list of (name, calls, total seconds, max seconds, histogram tuple) tuples.
+PyObject *watchdogStatsList(WatchdogState &state);
+
+// Returns (sequence number, elapsed seconds) of the running callback or None.
+// Can be called from any thread.
+PyObject *watchdogCurrent(WatchdogState &state);
+
+// Drops all statistics.
+void clearWatchdogStats(WatchdogState &state);
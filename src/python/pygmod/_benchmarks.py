@@ -0,0 +1,64 @@
+"""
+Microbenchmarks of the Lua-Python bridge.
+
+They need the real :mod:`_luastack` module, so they can be run only inside Garry's Mod,
+for example, from the server console::
+
+    lua_run py.Exec("from pygmod import _benchmarks; _benchmarks.run()")
+"""
+
+import timeit
+from importlib import import_module
+
+import _luastack
+
+__all__ = ['run']
+
+# How many times each benchmarked operation is repeated
+NUMBER = 100000
+
+
+def legacy_convert(wrapper_class_name):
+    """
+    Converts the Lua value on the top of the stack like ``convertLuaToPy()`` did
+    before it cached the wrapper classes: by importing :mod:`pygmod.lua` on every conversion,
+    creating a reference to the value and wrapping it in ``wrapper_class_name`` from Python.
+    """
+    wrapper_class = getattr(import_module("pygmod.lua"), wrapper_class_name)
+    _luastack.push(-1)
+    return wrapper_class(_luastack.reference_create())
+
+
+def per_conversion_time(push_value, wrapper_class_name, number=NUMBER):
+    """
+    Pushes a value with ``push_value()`` and returns a tuple of per-conversion times,
+    in microseconds, of the old way to convert it (wrapping it in ``wrapper_class_name``
+    from Python) and the current one (the native ``_luastack.convert_lua_to_py()``).
+    """
+    values_before = _luastack.top()
+    push_value()
+    try:
+        legacy = timeit.timeit(lambda: legacy_convert(wrapper_class_name), number=number)
+        current = timeit.timeit(_luastack.convert_lua_to_py, number=number)
+    finally:
+        _luastack.pop(_luastack.top() - values_before)
+    return legacy / number * 1e6, current / number * 1e6
+
+
+def push_print_function():
+    """Pushes Lua ``print`` function."""
+    _luastack.push_globals()
+    _luastack.get_field(-1, "print")
+
+
+def run():
+    """Runs the benchmarks and prints the results."""
+    results = {
+        "table": per_conversion_time(_luastack.create_table, "Table"),
+        "function": per_conversion_time(push_print_function, "CallableLuaObject"),
+    }
+
+    print(f"Lua to Python conversion, {NUMBER} iterations, microseconds per conversion:")
+    for value_type, (legacy, current) in results.items():
+        print(f"  {value_type:<10} before: {legacy:8.3f}  after: {current:8.3f}  "
+              f"speedup: {legacy / current:.2f}x")
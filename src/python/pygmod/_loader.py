@@ -20,7 +20,8 @@ from pygmod import _streams, _logging_config, addons
 _streams.setup()
 _logging_config.configure()
 
-from pygmod import lua, _error_notif, _repl  # pylint: disable=wrong-import-position
+from pygmod import lua, dispatch, stats  # pylint: disable=wrong-import-position
+from pygmod import _error_notif, _repl  # pylint: disable=wrong-import-position
 
 __all__ = ['main']
 
@@ -148,10 +149,12 @@ def main():
     """
     Finishes the PyGmod initialization.
 
-    #. Sets up packages :mod:`pygmod._error_notif` and :mod:`pygmod._repl`.
+    #. Sets up packages :mod:`pygmod._error_notif`, :mod:`pygmod._repl` and :mod:`pygmod.dispatch`.
     #. Initializes PyGmod addons.
     """
     LOGGER.debug("pygmod.main()")
     _error_notif.setup()
     _repl.setup()
+    dispatch.setup()
+    stats.setup()
     load_addons()
@@ -4,7 +4,7 @@ import sys
 from io import TextIOBase
 from logging import getLogger
 
-from pygmod import lua
+from pygmod import lua, dispatch
 
 __all__ = ["setup"]
 
@@ -31,8 +31,14 @@ class GmodConsoleOut(GmodConsoleOutStream):
     """
 
     def write(self, s):
-        """Writes string ``s`` to Garry's Mod console with ``Msg`` Lua function."""
-        lua.G.Msg(s)
+        """
+        Writes string ``s`` to Garry's Mod console with ``Msg`` Lua function.
+        In other threads the string is written by the main thread later.
+        """
+        if not dispatch.is_main_thread():
+            dispatch.call_soon_main(self.write, s)
+        else:
+            lua.G.Msg(s)
         return len(s)
 
 
@@ -46,8 +52,12 @@ class GmodConsoleErr(GmodConsoleOutStream):
         """
         Writes string ``s`` to Garry's Mod console
         with ``MsgC`` Lua function with red color.
+        In other threads the string is written by the main thread later.
         """
-        lua.G.MsgC(lua.G.Color(255, 0, 0), s)
+        if not dispatch.is_main_thread():
+            dispatch.call_soon_main(self.write, s)
+        else:
+            lua.G.MsgC(lua.G.Color(255, 0, 0), s)
         return len(s)
 
 
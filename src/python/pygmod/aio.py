@@ -0,0 +1,175 @@
+"""
+Runs an :mod:`asyncio` event loop in the game thread, a few callbacks every frame.
+
+Nothing runs an event loop in Garry's Mod, and blocking in a hook freezes the game.
+This module drives a loop incrementally from a single ``Think`` hook: every frame the loop runs the
+callbacks which are ready, for at most the time slice set by :func:`set_time_slice`.
+Since the loop runs in the game thread, coroutines can use Lua directly::
+
+    from pygmod import aio
+    from pygmod.gmodapi import PrintMessage, HUD_PRINTTALK
+
+    async def announce():
+        await aio.sleep(5)
+        PrintMessage(HUD_PRINTTALK, "5 seconds have passed")
+        ply, text, *_ = await aio.hook_event("PlayerSay")
+        PrintMessage(HUD_PRINTTALK, f"{ply._.Nick()} said {text}")
+
+    aio.create_task(announce())
+
+Waiting for a frame, a tick or a hook event doesn't add a Lua hook per waiting task:
+all tasks waiting for the same event are woken by one hook call.
+
+The loop is created and the ``Think`` hook is added by the first call to :func:`get_loop` or
+:func:`create_task`. :func:`asyncio.get_event_loop` returns the same loop in the game thread.
+"""
+
+import asyncio
+from time import perf_counter
+
+from pygmod import lua
+
+__all__ = ["get_loop", "create_task", "set_time_slice", "sleep", "next_frame", "next_tick",
+           "hook_event"]
+
+# Maximum time spent running the loop per frame by default, in seconds
+DEFAULT_TIME_SLICE = 0.002
+
+# Identifier of the Think hook which runs the loop
+_HOOK_ID = "pygmod.aio"
+# Identifier of the hooks which wake tasks waiting for events. It differs from _HOOK_ID,
+# so waiting for "Think" doesn't replace and then remove the hook of the loop.
+_EVENT_HOOK_ID = f"{_HOOK_ID}.event"
+
+# The loop and the time slice are reassigned by get_loop() and set_time_slice(),
+# so they're not constants
+# pylint: disable=invalid-name
+_loop = None
+_time_slice = DEFAULT_TIME_SLICE
+# pylint: enable=invalid-name
+# Futures waiting for the next frame
+_frame_waiters = []
+# Futures waiting for hook events. Keys are event names.
+_event_waiters = {}
+
+
+def get_loop():
+    """
+    Returns the event loop of the game thread,
+    creating it and adding its ``Think`` hook on the first call.
+    """
+    global _loop  # pylint: disable=global-statement
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+        lua.G.hook.Add("Think", _HOOK_ID, _on_think)
+    return _loop
+
+
+def create_task(coro):
+    """
+    Schedules the coroutine to run in the event loop of the game thread.
+    Returns an :class:`asyncio.Task`.
+    """
+    return get_loop().create_task(coro)
+
+
+def set_time_slice(seconds):
+    """
+    Sets the maximum time the loop runs per frame. At least one loop iteration is run every frame,
+    even if it takes longer.
+    """
+    global _time_slice  # pylint: disable=global-statement
+    if seconds < 0:
+        raise ValueError("the time slice can't be negative")
+    _time_slice = seconds
+
+
+def sleep(seconds, result=None):
+    """
+    Like ``timer.Simple``: waits ``seconds`` and returns ``result``.
+    The delay is checked once per frame, so it's rounded up to the frame end.
+    """
+    return asyncio.sleep(seconds, result)
+
+
+async def next_frame():
+    """Waits until the next frame (``Think`` hook call)."""
+    future = get_loop().create_future()
+    _frame_waiters.append(future)
+    await future
+
+
+async def next_tick():
+    """Waits until the next tick (``Tick`` hook call)."""
+    await hook_event("Tick")
+
+
+async def hook_event(event):
+    """Waits until the Lua hook ``event`` is called and returns its arguments as a tuple."""
+    future = get_loop().create_future()
+    waiters = _event_waiters.get(event)
+    if waiters is None:
+        waiters = _event_waiters[event] = []
+        lua.G.hook.Add(event, _EVENT_HOOK_ID, _event_handler(event))
+    waiters.append(future)
+    return await future
+
+
+def _event_handler(event):
+    """
+    Returns the hook function which wakes all tasks waiting for the event, then removes itself.
+    """
+    # hook.Add() only accepts Lua functions, so it's a Python function rather than a callable object
+
+    def handler(*args):
+        # The hook is added again by the next hook_event() call,
+        # so events nobody waits for cost nothing
+        waiters = _event_waiters.pop(event, ())
+        lua.G.hook.Remove(event, _EVENT_HOOK_ID)
+        _wake(waiters, args)
+
+    return handler
+
+
+def _wake(futures, result):
+    """Sets ``result`` on the ``futures`` which aren't done yet, waking the tasks awaiting them."""
+    for future in futures:
+        if not future.done():
+            future.set_result(result)
+
+
+def _has_ready_callbacks(loop):
+    """
+    Returns ``True`` if ``loop`` has callbacks ready to run.
+
+    The queue of ready callbacks is an implementation detail of :class:`asyncio.BaseEventLoop`.
+    Loops without it report no ready callbacks, so they run one iteration per frame.
+    """
+    ready = getattr(loop, "_ready", None)
+    if ready is None:
+        return False
+    return bool(ready)
+
+
+def _run_iteration(loop):
+    """Runs one iteration of ``loop``: the callbacks which are ready and the due timers."""
+    # If stop() is called before run_forever(),
+    # the loop runs the callbacks which are ready and returns
+    loop.stop()
+    loop.run_forever()
+
+
+def _on_think(*_):
+    """
+    The ``Think`` hook of the loop. Wakes the tasks waiting for the next frame,
+    then runs loop iterations while callbacks are ready, within the time slice.
+    """
+    global _frame_waiters  # pylint: disable=global-statement
+    waiters, _frame_waiters = _frame_waiters, []
+    _wake(waiters, None)
+
+    deadline = perf_counter() + _time_slice
+    _run_iteration(_loop)
+    while _has_ready_callbacks(_loop) and perf_counter() < deadline:
+        _run_iteration(_loop)
@@ -0,0 +1,94 @@
+"""
+Reads the state of many entities at once.
+
+Every function of this module calls an ``Entity`` method for all given entities in a single call
+to the C++ module, writing the results straight into a buffer, instead of calling
+``ent._.GetPos()`` and converting its result for every entity.
+
+::
+
+    from pygmod import batch
+    from pygmod.gmodapi import player
+
+    players = player.GetAll()
+    pos = batch.positions(players)  # N×3 array of floats
+    hp = batch.health(players)  # N floats
+
+The results are written to ``out`` if it's given. ``out`` can be a NumPy array or any other object
+supporting the buffer protocol which holds C-contiguous doubles, floats or integers, at least as
+many as needed for all entities. Reusing the same ``out`` array every tick avoids allocating a new
+one. If ``out`` is not given, a new NumPy array is returned if NumPy is installed,
+or a flat :class:`array.array` of doubles otherwise.
+
+``entities`` can be a Lua table of entities, such as the result of ``ents.GetAll()``, or a Python
+sequence. Values of ``NULL`` and invalid entities are set to NaN (0 in integer arrays).
+"""
+
+from array import array
+
+import _luastack
+from pygmod.lua import Table
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ["positions", "velocities", "angles", "health", "new_output"]
+
+
+def new_output(count, width, typecode="d"):
+    """
+    Returns a new array for ``width`` numbers per item, such as the arrays which are created
+    when ``out`` is not given: a NumPy array of shape ``(count, width)`` (or ``(count,)`` if
+    ``width`` is 1) if NumPy is installed, otherwise a flat :class:`array.array`.
+    ``typecode`` is ``"d"`` for doubles or ``"q"`` for 64-bit integers.
+    """
+    if numpy is not None:
+        return numpy.zeros((count, width) if width > 1 else count, dtype=typecode)
+    return array(typecode, bytes(8 * count * width))
+
+
+def _fill(method, width, entities, out):
+    """
+    Calls ``Entity:<method>()`` for all ``entities`` and writes ``width`` values per entity
+    to ``out``, or to a new array if it's ``None``. Returns the array.
+    """
+    if isinstance(entities, Table):
+        count = len(entities)
+        # The C++ module takes the reference of a table directly. Table has no public accessor
+        # for it, since its public attributes would hide the Lua fields of the same name.
+        entities_arg = entities._ref  # pylint: disable=protected-access
+    else:
+        if not isinstance(entities, (list, tuple)):
+            entities = list(entities)
+        count = len(entities)
+        entities_arg = entities
+
+    if out is None:
+        out = new_output(count, width)
+    _luastack.entity_batch(method, width, entities_arg, out)
+    return out
+
+
+def positions(entities, out=None):
+    """Returns the positions of the entities (``Entity:GetPos()``), 3 values per entity."""
+    return _fill("GetPos", 3, entities, out)
+
+
+def velocities(entities, out=None):
+    """Returns the velocities of the entities (``Entity:GetVelocity()``), 3 values per entity."""
+    return _fill("GetVelocity", 3, entities, out)
+
+
+def angles(entities, out=None):
+    """
+    Returns the angles of the entities (``Entity:GetAngles()``),
+    3 values (pitch, yaw, roll) per entity.
+    """
+    return _fill("GetAngles", 3, entities, out)
+
+
+def health(entities, out=None):
+    """Returns the health of the entities (``Entity:Health()``), 1 value per entity."""
+    return _fill("Health", 1, entities, out)
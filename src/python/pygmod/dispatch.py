@@ -0,0 +1,120 @@
+"""
+Calls functions on the main thread from other threads.
+
+Lua can only be used from the main (game) thread: :mod:`_luastack` functions raise
+:exc:`RuntimeError` in other threads. To use the results of work done in a
+:class:`~concurrent.futures.ThreadPoolExecutor` or any other thread in Lua, schedule a call on the
+main thread::
+
+    from concurrent.futures import ThreadPoolExecutor
+    from pygmod import dispatch
+    from pygmod.gmodapi import PrintMessage, HUD_PRINTTALK
+
+    def find_path(start, goal):
+        path = ...  # CPU-heavy work, no Lua here
+        dispatch.call_soon_main(PrintMessage, HUD_PRINTTALK, f"Path found: {len(path)} nodes")
+
+    ThreadPoolExecutor().submit(find_path, start, goal)
+
+In asyncio code running in another thread, await :func:`run_in_main` instead.
+
+The scheduled calls are run by a ``Think`` hook in the order they were scheduled,
+until the calls of the current frame take longer than the frame budget (see
+:func:`set_frame_budget`). The remaining calls are run in the next frames.
+Exceptions raised by the calls are set on their futures.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import Future
+from time import perf_counter
+
+import _luastack
+from pygmod import lua
+
+__all__ = ["call_soon_main", "run_in_main", "is_main_thread", "set_frame_budget", "pending_calls"]
+
+# Time for the scheduled calls per frame by default, in seconds
+DEFAULT_FRAME_BUDGET = 0.002
+
+# Identifier of the Think hook which runs the scheduled calls
+_HOOK_ID = "pygmod.dispatch"
+
+# Scheduled calls. deque.append() and deque.popleft() are atomic,
+# so other threads don't need a lock.
+_calls = deque()
+# Reassigned by set_frame_budget(), so it's not a constant
+_frame_budget = DEFAULT_FRAME_BUDGET  # pylint: disable=invalid-name
+
+
+def is_main_thread():
+    """Returns ``True`` if called from the main thread, where Lua can be used."""
+    return _luastack.is_main_thread()
+
+
+def call_soon_main(func, *args, **kwargs):
+    """
+    Schedules ``func(*args, **kwargs)`` to be called on the main thread in one of the next frames.
+    Can be called from any thread, including the main one.
+
+    Returns a :class:`concurrent.futures.Future` of the call result.
+    """
+    future = Future()
+    _calls.append((future, func, args, kwargs))
+    return future
+
+
+async def run_in_main(func, *args, **kwargs):
+    """
+    Calls ``func(*args, **kwargs)`` on the main thread and returns its result.
+    Awaitable from an asyncio event loop running in any thread other than the main one.
+    """
+    return await asyncio.wrap_future(call_soon_main(func, *args, **kwargs))
+
+
+def set_frame_budget(seconds):
+    """
+    Sets how long the scheduled calls may run per frame. At least one call is run every frame,
+    even if it takes longer.
+    """
+    global _frame_budget  # pylint: disable=global-statement
+    if seconds < 0:
+        raise ValueError("the frame budget can't be negative")
+    _frame_budget = seconds
+
+
+def pending_calls():
+    """Returns the number of scheduled calls which haven't run yet."""
+    return len(_calls)
+
+
+def _run(future, func, args, kwargs):
+    """
+    Calls ``func(*args, **kwargs)`` and sets its result or exception on ``future``,
+    unless the future was cancelled.
+    """
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = func(*args, **kwargs)
+    except Exception as exc:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+def _run_pending(*_):
+    """
+    Runs the scheduled calls within the frame budget. Called by the ``Think`` hook every frame.
+    """
+    lua.free_pending_refs()
+    deadline = perf_counter() + _frame_budget
+    while _calls:
+        _run(*_calls.popleft())
+        if perf_counter() >= deadline:
+            break
+
+
+def setup():
+    """Registers the ``Think`` hook which runs the scheduled calls."""
+    lua.G.hook.Add("Think", _HOOK_ID, _run_pending)
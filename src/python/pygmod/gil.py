@@ -0,0 +1,63 @@
+"""
+Lets Python threads run between frames.
+
+The game thread holds the GIL while the game runs, so threads started by addons
+(:class:`threading.Thread` workers, :class:`concurrent.futures.ThreadPoolExecutor` pools)
+only run when Python happens to switch threads during a call from Lua. Their throughput is erratic,
+and they don't run at all while no Python code is called.
+
+:func:`set_yield_window` adds a ``Think`` hook, implemented in C++, which releases the GIL for a
+fixed time every frame::
+
+    from pygmod import gil
+
+    gil.set_yield_window(0.001)  # Give other threads 1 ms per frame
+    ...
+    print(gil.stats())
+
+The GIL is released only if the interpreter has other threads. If none of them takes the GIL,
+it's taken back at once. Otherwise the rest of the window is waited out on the game thread,
+so it adds up to the frame time. After the window, taking the GIL back can take up to
+:func:`sys.getswitchinterval` longer if a thread holds it; :func:`stats` shows how long
+it actually took.
+
+Each realm has its own window and statistics.
+"""
+
+from collections import namedtuple
+
+import _luastack
+
+__all__ = ["YieldStats", "set_yield_window", "disable_yield", "stats"]
+
+YieldStats = namedtuple("YieldStats", ["yields", "released_time", "wait_time", "max_wait_time"])
+YieldStats.__doc__ = """
+Statistics of the GIL yields:
+
+- ``yields``: in how many frames the GIL was released
+- ``released_time``: total time the game thread didn't hold the GIL, in seconds
+- ``wait_time``: total time spent waiting to take the GIL back after the window, in seconds
+- ``max_wait_time``: the longest of these waits, in seconds
+"""
+
+
+def set_yield_window(seconds):
+    """
+    Releases the GIL for up to ``seconds`` every frame while other threads take it.
+    ``0`` releases the GIL and takes it back immediately, which lets a waiting thread take it.
+    Raises :exc:`ValueError` if ``seconds`` is not between 0 and 1.
+    """
+    _luastack.set_gil_yield(float(seconds))
+
+
+def disable_yield():
+    """Stops releasing the GIL every frame. This is the default."""
+    _luastack.set_gil_yield(None)
+
+
+def stats(reset=False):
+    """
+    Returns :class:`YieldStats` of this realm.
+    Resets the statistics after reading them if ``reset`` is ``True``.
+    """
+    return YieldStats(*_luastack.gil_yield_stats(reset))
@@ -1,10 +1,28 @@
 """
 Contains all variables, functions, libraries, classes, etc.
 that are listed in Garry's Mod Wiki (https://wiki.garrysmod.com).
+
+By default, every name is looked up in :data:`pygmod.lua.G` each time it's accessed.
+In snapshot mode, enabled by :func:`enable_snapshot`, all names are looked up once and stored
+as module globals, so accessing them is a plain dict lookup. The snapshot is refreshed
+when the gamemode is initialized (``Initialize``), after the map entities are created
+(``InitPostEntity``) and after Lua is reloaded (``OnReloaded``).
 """
 
+import _luastack
 from pygmod import lua
 
+# Hook events which refresh the snapshot
+SNAPSHOT_REFRESH_HOOKS = ("Initialize", "InitPostEntity", "OnReloaded")
+# Identifier of the snapshot refresh hooks
+_SNAPSHOT_HOOK_ID = "pygmod.gmodapi snapshot"
+# Returned by globals().get() for names which aren't in the snapshot
+_MISSING = object()
+
+# Flag of snapshot mode. It's reassigned by enable_snapshot() and disable_snapshot(),
+# so it's not a constant
+_snapshot_enabled = False  # pylint: disable=invalid-name
+
 
 def __getattr__(name):
     return lua.G[name]
@@ -14,6 +32,72 @@ def __dir__():
     return __all__
 
 
+def _refresh_on_hook(*_):
+    """Handler of :data:`SNAPSHOT_REFRESH_HOOKS`, ignores the arguments of the event."""
+    refresh_snapshot()
+
+
+def refresh_snapshot():
+    """
+    Looks up every name again and updates the snapshot. Does nothing if snapshot mode is disabled.
+    """
+    if not _snapshot_enabled:
+        return
+    module_globals = globals()
+    for name in __all__:
+        module_globals[name] = lua.G[name]
+
+
+def enable_snapshot():
+    """
+    Enables snapshot mode: looks up every name once and stores it as a module global.
+
+    Names imported with ``from pygmod.gmodapi import ...`` are bound to the values at import time,
+    so use ``gmodapi.name`` to always get the refreshed value.
+    """
+    global _snapshot_enabled  # pylint: disable=global-statement
+    if _snapshot_enabled:
+        return
+    _snapshot_enabled = True
+    refresh_snapshot()
+    for event in SNAPSHOT_REFRESH_HOOKS:
+        lua.G.hook.Add(event, _SNAPSHOT_HOOK_ID, _refresh_on_hook)
+
+
+def disable_snapshot():
+    """
+    Disables snapshot mode. Every name is looked up in :data:`pygmod.lua.G` on each access again.
+    """
+    global _snapshot_enabled  # pylint: disable=global-statement
+    if not _snapshot_enabled:
+        return
+    _snapshot_enabled = False
+    module_globals = globals()
+    for name in __all__:
+        module_globals.pop(name, None)
+    for event in SNAPSHOT_REFRESH_HOOKS:
+        lua.G.hook.Remove(event, _SNAPSHOT_HOOK_ID)
+
+
+def is_stale(name):
+    """
+    Returns ``True`` if the snapshot value of ``name`` is no longer the current Lua global,
+    e.g. because an addon has replaced a library. Always ``False`` if snapshot mode is disabled.
+    Raises :exc:`NameError` if ``name`` is not a name of this module.
+
+    Values are compared with ``rawequal``,
+    so a table is stale only if the global refers to another table.
+    """
+    if name not in _api_names:
+        raise NameError(f"{name!r} is not a Garry's Mod API name")
+    if not _snapshot_enabled:
+        return False
+    value = globals().get(name, _MISSING)
+    if value is _MISSING:  # Not snapshotted yet
+        return True
+    return not _luastack.raw_equal(value, lua.G[name])
+
+
 # pylint: disable=undefined-all-variable
 
 # Global functions
@@ -401,3 +485,6 @@ __all__ += [
     'Weapon',
     'bf_read',
 ]
+
+# Names of __all__, for fast membership checks
+_api_names = frozenset(__all__)
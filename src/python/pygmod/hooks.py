@@ -0,0 +1,198 @@
+"""
+Subscribes Python functions to Lua hook events with a single Lua hook per event.
+
+Adding every Python handler with ``hook.Add`` creates a Lua closure per handler, and every one of
+them converts the hook arguments to Python again. :func:`on` adds one dispatcher per event instead,
+which converts the arguments once and calls all Python handlers of the event::
+
+    from pygmod import hooks
+
+    @hooks.on("Think")
+    def update_bots():
+        ...
+
+    @hooks.on("PlayerSay", priority=hooks.PRIORITY_HIGH)
+    def mute(ply, text, team_chat):
+        if is_muted(ply):
+            return ""
+
+Handlers with a higher priority are called first; handlers with the same priority are called in the
+order they were added. Like in the Lua hook library, a handler returning anything other than
+``None`` stops the event, and the value is returned to the game.
+An exception in a handler is logged and the next handlers are still called.
+
+With :func:`enable_timing`, the calls of every handler are timed,
+and :func:`timings` reports the results.
+"""
+
+from collections import namedtuple
+from logging import getLogger
+from time import perf_counter
+
+from pygmod import lua
+
+__all__ = ["PRIORITY_HIGH", "PRIORITY_NORMAL", "PRIORITY_LOW", "HandlerTiming",
+           "on", "off", "enable_timing", "disable_timing", "timings", "reset_timings"]
+
+LOGGER = getLogger("pygmod.hooks")
+
+PRIORITY_HIGH = 100
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -100
+
+# Identifier of the dispatcher hooks
+_HOOK_ID = "pygmod.hooks"
+
+HandlerTiming = namedtuple("HandlerTiming", ["event", "handler", "calls", "total_time", "max_time"])
+HandlerTiming.__doc__ = """
+Timing of a hook handler, measured while timing is enabled:
+
+- ``event``: the hook event name
+- ``handler``: the handler function
+- ``calls``: how many times the handler was called
+- ``total_time``: total time spent in the handler, in seconds
+- ``max_time``: the longest call, in seconds
+"""
+
+# Reassigned by enable_timing() and disable_timing(), so it's not a constant
+_timing_enabled = False  # pylint: disable=invalid-name
+# Events with Python handlers. Keys are event names.
+_events = {}
+# Incremented for every added handler, so handlers with the same priority keep their order
+_sequence = 0  # pylint: disable=invalid-name
+
+
+class _Handler:
+    """A handler of an event with its timing."""
+
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ("func", "priority", "sequence", "calls", "total_time", "max_time")
+
+    def __init__(self, func, priority, sequence):
+        self.func = func
+        self.priority = priority
+        self.sequence = sequence
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+
+class _Event:
+    """Python handlers of a hook event and the dispatcher which calls them."""
+
+    def __init__(self, name):
+        self.name = name
+        # Sorted tuple, replaced on every change,
+        # so handlers can be added and removed during the dispatch
+        self.handlers = ()
+
+        def dispatcher(*args):
+            # hook.Add() only accepts Lua functions,
+            # so the dispatcher is a Python function rather than a method
+            return self.dispatch_timed(args) if _timing_enabled else self.dispatch(args)
+
+        self.dispatcher = dispatcher
+
+    def add(self, handler):
+        """Adds the :class:`_Handler` ``handler``, keeping the handlers sorted by priority."""
+        self.handlers = tuple(sorted(self.handlers + (handler,),
+                                     key=lambda h: (-h.priority, h.sequence)))
+
+    def remove(self, func):
+        """Removes the handlers calling ``func``."""
+        self.handlers = tuple(handler for handler in self.handlers if handler.func != func)
+
+    def dispatch(self, args):
+        """
+        Calls the handlers with ``args`` until one of them returns a value other than ``None``.
+        Returns that value or ``None``.
+        """
+        for handler in self.handlers:
+            try:
+                result = handler.func(*args)
+            except Exception:
+                LOGGER.exception("Exception in %r handler %r", self.name, handler.func)
+                continue
+            if result is not None:
+                return result
+        return None
+
+    def dispatch_timed(self, args):
+        """Same as :meth:`dispatch`, but times the calls of every handler."""
+        for handler in self.handlers:
+            start = perf_counter()
+            try:
+                result = handler.func(*args)
+            except Exception:
+                LOGGER.exception("Exception in %r handler %r", self.name, handler.func)
+                result = None
+            elapsed = perf_counter() - start
+            handler.calls += 1
+            handler.total_time += elapsed
+            handler.max_time = max(handler.max_time, elapsed)
+            if result is not None:
+                return result
+        return None
+
+
+# Named like the on/off pairs of event libraries, it's short on purpose
+def on(event, func=None, *, priority=PRIORITY_NORMAL):  # pylint: disable=invalid-name
+    """
+    Adds ``func`` as a handler of the hook ``event``. Can be used as a decorator.
+    Adding the same function to the same event again changes its priority.
+    """
+    if func is None:
+        return lambda decorated: on(event, decorated, priority=priority)
+
+    global _sequence  # pylint: disable=global-statement
+    hook_event = _events.get(event)
+    if hook_event is None:
+        hook_event = _events[event] = _Event(event)
+        lua.G.hook.Add(event, _HOOK_ID, hook_event.dispatcher)
+    hook_event.remove(func)
+    _sequence += 1
+    hook_event.add(_Handler(func, priority, _sequence))
+    return func
+
+
+def off(event, func):
+    """
+    Removes the handler ``func`` of the hook ``event``.
+    Does nothing if it isn't a handler of the event.
+    """
+    hook_event = _events.get(event)
+    if hook_event is None:
+        return
+    hook_event.remove(func)
+    if not hook_event.handlers:
+        del _events[event]
+        lua.G.hook.Remove(event, _HOOK_ID)
+
+
+def enable_timing():
+    """Starts timing the handler calls."""
+    global _timing_enabled  # pylint: disable=global-statement
+    _timing_enabled = True
+
+
+def disable_timing():
+    """Stops timing the handler calls. This is the default."""
+    global _timing_enabled  # pylint: disable=global-statement
+    _timing_enabled = False
+
+
+def timings():
+    """Returns a list of :class:`HandlerTiming` of all handlers, the slowest in total first."""
+    result = [HandlerTiming(name, handler.func, handler.calls, handler.total_time, handler.max_time)
+              for name, hook_event in _events.items() for handler in hook_event.handlers]
+    result.sort(key=lambda timing: timing.total_time, reverse=True)
+    return result
+
+
+def reset_timings():
+    """Resets the timings of all handlers."""
+    for hook_event in _events.values():
+        for handler in hook_event.handlers:
+            handler.calls = 0
+            handler.total_time = handler.max_time = 0.0
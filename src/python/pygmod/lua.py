@@ -4,52 +4,168 @@ calling Lua functions and manipulating tables and objects.
 """
 
 from abc import ABC, abstractmethod
+from collections import OrderedDict, namedtuple, deque
 from collections.abc import Iterable, Mapping
-from functools import wraps, partial
+from functools import update_wrapper, partial
+from itertools import islice
 
 import _luastack
 
-__all__ = ["LuaError", "exec_lua", "eval_lua", "G", "Table"]
+__all__ = ["LuaError", "exec_lua", "eval_lua", "chunk_cache", "resolve", "registry_stats", "G",
+           "Table"]
+
+# How many levels of nested tables are converted by Table.to_dict(recursive=True) by default
+DEFAULT_MAX_DEPTH = 32
+# How many compiled chunks are kept by chunk_cache by default
+DEFAULT_CHUNK_CACHE_SIZE = 256
+# How many values are passed to a vararg helper per call. Every value takes a Lua stack slot,
+# and both the stack and the number of varargs are limited.
+HELPER_BATCH_SIZE = 200
 
 
 def auto_pop(func):
     """
     Decorator which automatically pops all Lua stack values
     which were pushed during the wrapped function execution.
-    """
 
-    @wraps(func)
-    def decorated(*args, **kwargs):
-        # Number of values in the stack before calling the function
-        values_before = _luastack.top()
-        try:
-            rtn = func(*args, **kwargs)
-        finally:
-            # Number of values in the stack after calling the function
-            values_after = _luastack.top()
-            # How much values we have to pop
-            values_to_pop = values_after - values_before
-            _luastack.pop(values_to_pop)
-        return rtn
-
-    return decorated
+    The wrapper is implemented in C++ (:class:`_luastack.auto_pop`),
+    so it saves and restores the stack top without any extra Python calls.
+    """
+    return update_wrapper(_luastack.auto_pop(func), func)
 
 
 class LuaError(Exception):
     """Raised when a Lua error occurs while running some Lua code in Python."""
 
 
+ChunkCacheInfo = namedtuple("ChunkCacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class ChunkCache:
+    """
+    Bounded LRU cache of Lua chunks compiled with ``CompileString``.
+    Keys are the source code strings. Used by :func:`exec_lua` and :func:`eval_lua`,
+    so running the same code again doesn't recompile it.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CHUNK_CACHE_SIZE):
+        self._chunks = OrderedDict()
+        self._maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, lua_code, identifier):
+        """
+        Returns the compiled chunk of ``lua_code``, compiling it on a cache miss.
+        ``identifier`` is the chunk name which is shown in Lua error messages.
+        Raises :exc:`LuaError` if the code can't be compiled.
+        """
+        chunk = self._chunks.get(lua_code)
+        if chunk is not None:
+            self._hits += 1
+            self._chunks.move_to_end(lua_code)
+            return chunk
+
+        self._misses += 1
+        chunk = G.CompileString(lua_code, identifier, False)
+        # CompileString returns the error message instead of a function on failure
+        if isinstance(chunk, str):
+            raise LuaError(chunk)
+
+        if self._maxsize > 0:
+            self._chunks[lua_code] = chunk
+            self._evict()
+        return chunk
+
+    def resize(self, maxsize):
+        """Sets the maximum number of cached chunks, evicting the least recently used ones."""
+        self._maxsize = maxsize
+        self._evict()
+
+    def clear(self):
+        """Removes all chunks from the cache and resets the statistics."""
+        self._chunks.clear()
+        self._hits = self._misses = 0
+
+    def info(self):
+        """Returns a :class:`ChunkCacheInfo` with the cache statistics."""
+        return ChunkCacheInfo(self._hits, self._misses, self._maxsize, len(self._chunks))
+
+    def _evict(self):
+        """Removes the least recently used chunks until the cache fits in its maximum size."""
+        while len(self._chunks) > max(self._maxsize, 0):
+            self._chunks.popitem(last=False)
+
+
+chunk_cache = ChunkCache()
+
+
 def exec_lua(lua_code):
     """Runs a string of Lua code."""
-    error = G.RunString(lua_code, '<pygmod lua_exec()>', False)
-    if error is not None:
-        raise LuaError(error)
+    chunk_cache.get(lua_code, '<pygmod exec_lua()>')()
 
 
 def eval_lua(lua_code):
     """Evaluates a Lua expression and returns the result."""
-    exec_lua('_pygmod_eval_result = ' + lua_code)
-    return G["_pygmod_eval_result"]
+    return chunk_cache.get('return ' + lua_code, '<pygmod eval_lua()>')()
+
+
+class ResolvedPath(partial):
+    """
+    Handle to a dotted global path, such as ``"net.WriteUInt"``. Returned by :func:`resolve`.
+
+    Calling the handle walks the path from ``_G`` and calls the value in a single call to the C++
+    module, without creating :class:`Table` wrappers and references for the intermediate tables.
+    Since the path is walked on every call, reassigning any part of it, from Python or from Lua,
+    takes effect immediately.
+    """
+
+    def __new__(cls, path):
+        # partial.__new__ takes the function and its arguments, pylint reads the signature of
+        # ResolvedPath.__new__ instead
+        # pylint: disable-next=too-many-function-args
+        return super().__new__(cls, _luastack.path_call, tuple(path.split(".")))
+
+    @property
+    def path(self):
+        """The dotted path of this handle."""
+        return ".".join(self.args[0])
+
+    def get(self):
+        """Returns the current value at the path."""
+        return _luastack.path_get(self.args[0])
+
+    def __repr__(self):
+        return f"<resolved Lua path {self.path!r}>"
+
+
+_resolved_paths = {}
+
+
+def resolve(path):
+    """
+    Returns a :class:`ResolvedPath` handle for a dotted global path. The handle object is cached
+    per path, but it walks the path on every call.
+    Calling it is the same as, but faster than, getting the value attribute by attribute from
+    :data:`G` and calling it::
+
+        write_uint = resolve("net.WriteUInt")
+        write_uint(123, 8)  # Same as G.net.WriteUInt(123, 8)
+    """
+    try:
+        return _resolved_paths[path]
+    except KeyError:
+        handle = _resolved_paths[path] = ResolvedPath(path)
+        return handle
+
+
+def registry_stats():
+    """
+    Returns the statistics of Python functions passed to Lua, such as hook and timer callbacks,
+    as a :class:`dict` with the ``live``, ``freed`` and ``peak`` counts.
+    The same as ``py.RegistryStats()`` in Lua.
+    """
+    return _luastack.registry_stats()
 
 
 class BaseGetNamespace(ABC):
@@ -175,9 +291,28 @@ class Globals(LuaNamespace):
     def _push_namespace_object(self):
         _luastack.push_globals()  # pragma: no cover (seriously, what could go wrong here?)
 
+    def _get(self, key):
+        return _luastack.global_get(key)
+
+    def _set(self, key, value):
+        _luastack.global_set(key, value)
+
 
 G = Globals()
 
+# References of Lua objects collected in other threads. Lua can't be used there,
+# so they are freed by pygmod.dispatch on the main thread.
+_refs_to_free = deque()
+
+
+def free_pending_refs():
+    """
+    Frees the references of Lua objects which were collected in other threads.
+    Must be called on the main thread.
+    """
+    while _refs_to_free:
+        _luastack.reference_free(_refs_to_free.popleft())
+
 
 class LuaObject:
     """Base class for all Lua object classes."""
@@ -188,40 +323,60 @@ class LuaObject:
         self._ref = ref
 
     def __del__(self):
-        _luastack.reference_free(self._ref)
+        if _luastack.is_main_thread():
+            _luastack.reference_free(self._ref)
+        else:
+            _refs_to_free.append(self._ref)
 
 
-class CallableLuaObject(LuaObject):
+class CallableLuaObject(LuaObject, _luastack.LuaCallable):
     """
     Class for callable Lua objects, such as functions and tables with
     ``__call`` metamethod.
+
+    Calling is implemented by :class:`_luastack.LuaCallable`: all arguments are pushed
+    and all results are collected in a single call to the C++ module.
+    The function returns ``None`` if Lua returned nothing, the only result or a tuple of results.
     """
 
     # pylint: disable=too-few-public-methods
 
-    @auto_pop
-    def __call__(self, *args):
-        # Saving the quantity of stack values before calling the function
-        vals_in_stack_before_call = _luastack.top()
+    def map(self, arg_tuples):
+        """
+        Calls this function once for every tuple of arguments from ``arg_tuples``
+        in a single call to the C++ module and returns the list of results.
+        Items which are not tuples are passed as the only argument::
+
+            entities = G.ents.GetByIndex.map(range(1, 1001))
+            distances = G.some_lib.Distance.map([(a, b), (c, d)])
+        """
+        return _luastack.map_call(self, arg_tuples)
+
+
+class LuaHelper(CallableLuaObject):
+    """
+    Function of the Lua helper library which is compiled once by :func:`_luastack.init`.
+    The reference belongs to :mod:`_luastack`, so it is never freed.
+    """
+
+    def __init__(self, name):
+        super().__init__(_luastack.helper_ref(name))
+
+    def __del__(self):
+        pass
+
+
+# Cache of LuaHelper objects. Keys are helper names.
+_helpers = {}
 
-        # Pushing the function
-        _luastack.reference_push(self._ref)
-        # Pushing the arguments
-        for arg in args:
-            _luastack.convert_py_to_lua(arg)
-        # Calling the function
-        _luastack.call(len(args), -1)
-
-        # How much values did the function return
-        values_returned = _luastack.top() - vals_in_stack_before_call
-        if values_returned == 0:  # Function returned nothing; returning None
-            return None
-        if values_returned == 1:  # One value - just returning it
-            return _luastack.convert_lua_to_py()
-        # Many values - putting them all in a tuple and returning it
-        return tuple(_luastack.convert_lua_to_py(i)
-                     for i in
-                     range(vals_in_stack_before_call + 1, _luastack.top() + 1))
+
+def _helper(name):
+    """Returns a :class:`LuaHelper` for the helper function ``name``."""
+    try:
+        return _helpers[name]
+    except KeyError:
+        helper = _helpers[name] = LuaHelper(name)
+        return helper
 
 
 class MethodCallNamespace(BaseGetNamespace):
@@ -240,6 +395,8 @@ class MethodCallNamespace(BaseGetNamespace):
         self._tbl = tbl
 
     def _get(self, key):
+        if isinstance(self._tbl, LuaObject):
+            return partial(_luastack.call_method, self._tbl, key)
         return partial(self._tbl[key], self._tbl)
 
 
@@ -277,18 +434,50 @@ class Table(CallableLuaObject, LuaNamespace):
             CallableLuaObject.__init__(self, ref_or_iterable)
         elif isinstance(ref_or_iterable, Mapping):  # Converting a dict
             self._init_empty_table()
-            for key, value in ref_or_iterable.items():
-                self[key] = value
+            self.update(ref_or_iterable)
         elif isinstance(ref_or_iterable, Iterable):  # Converting an iterable
             self._init_empty_table()
-            for value in ref_or_iterable:
-                # noinspection PyMethodFirstArgAssignment
-                self += value
+            self.extend(ref_or_iterable)
         else:
             raise ValueError('unknown constructor argument type: '
                              f'{type(ref_or_iterable).__name__}')
 
-        self._ = MethodCallNamespace(self)
+    # Tables which come from Lua are created by the C++ module without calling __init__(),
+    # so this is a property instead of an attribute assigned in __init__().
+    @property
+    def _(self):
+        """:class:`MethodCallNamespace` for making method calls on this table."""
+        return MethodCallNamespace(self)
+
+    def method(self, name):
+        """
+        Returns a handle which calls the method ``name`` of this object,
+        like ``obj:name(...)`` in Lua.
+
+        The method is looked up and called in a single call to the C++ module, without wrapping it
+        in a :class:`CallableLuaObject`. Methods of userdata, such as players and entities,
+        are resolved through a per-metatable cache, so all players share the resolved
+        ``Health`` method::
+
+            health = ply.method("Health")
+            if health() < 50:
+                ...
+
+        ``ply._.Health()`` uses the same mechanism.
+        """
+        return partial(_luastack.call_method, self, name)
+
+    @classmethod
+    def from_mapping(cls, mapping, recursive=False, max_depth=DEFAULT_MAX_DEPTH):
+        """
+        Creates a new table from ``mapping`` in a single Lua stack crossing.
+
+        If ``recursive`` is ``True``, nested :class:`dict`\\ s, :class:`list`\\ s
+        and :class:`tuple`\\ s are converted to tables too, as described in :meth:`update`.
+        """
+        table = cls()
+        table.update(mapping, recursive, max_depth)
+        return table
 
     def _init_empty_table(self):
         """Creates an empty table in the Lua stack and wraps it in this :class:`Table` instance."""
@@ -298,10 +487,50 @@ class Table(CallableLuaObject, LuaNamespace):
     def _push_namespace_object(self):
         _luastack.reference_push(self._ref)
 
+    def _get(self, key):
+        return _luastack.table_get(self._ref, key)
+
+    def _set(self, key, value):
+        _luastack.table_set(self._ref, key, value)
+
     def __iadd__(self, value):
-        G.table.insert(self, value)
+        _helper("insert")(self, value)
         return self
 
+    def extend(self, iterable):
+        """
+        Appends all values from ``iterable`` to the end of this table,
+        :data:`HELPER_BATCH_SIZE` values per Lua call.
+        """
+        insert_many = _helper("insert_many")
+        iterator = iter(iterable)
+        batch = tuple(islice(iterator, HELPER_BATCH_SIZE))
+        while batch:
+            insert_many(self, *batch)
+            batch = tuple(islice(iterator, HELPER_BATCH_SIZE))
+
+    def rawget(self, key):
+        """Returns the value by key ``key`` without invoking the ``__index`` metamethod."""
+        return _helper("rawget")(self, key)
+
+    def rawset(self, key, value):
+        """Sets the value by key ``key`` without invoking the ``__newindex`` metamethod."""
+        _helper("rawset")(self, key, value)
+
+    def get_many(self, *keys):
+        """
+        Returns a tuple of values by keys ``keys``,
+        fetched in one Lua call per :data:`HELPER_BATCH_SIZE` keys.
+        """
+        get_many = _helper("get_many")
+        result = ()
+        for start in range(0, len(keys), HELPER_BATCH_SIZE):
+            batch = keys[start:start + HELPER_BATCH_SIZE]
+            values = get_many(self, *batch)
+            # A single returned value is not wrapped in a tuple
+            result += (values,) if len(batch) == 1 else values
+        return result
+
     def __call__(self, *args):
         if G.getmetatable(self)["__call"] is None:
             raise ValueError("this table's metatable "
@@ -310,9 +539,7 @@ class Table(CallableLuaObject, LuaNamespace):
         super().__call__(*args)
 
     def __len__(self):
-        # ILuaBase doesn't feature a C++ way to retrieve the length of a table,
-        # so we have to be creative.
-        return eval_lua("function(tbl) return #tbl end")(self)  # pylint: disable=not-callable
+        return _helper("len")(self)
 
     # Iteration
 
@@ -334,12 +561,34 @@ class Table(CallableLuaObject, LuaNamespace):
         """
         return TableItemIterator(self)
 
+    def update(self, mapping, recursive=False, max_depth=DEFAULT_MAX_DEPTH):
+        """
+        Sets all key-value pairs of ``mapping`` to this table in a single Lua stack crossing.
+
+        If ``recursive`` is ``True``, nested :class:`dict`\\ s, :class:`list`\\ s
+        and :class:`tuple`\\ s are converted to tables too.
+        Containers nested more than ``max_depth`` levels deep raise :class:`RecursionError`.
+        """
+        _luastack.table_update(self._ref, mapping, recursive, max_depth)
+
+    def to_dict(self, recursive=False, max_depth=DEFAULT_MAX_DEPTH):
+        """
+        Returns this table as a :class:`dict`, converting it in a single Lua stack crossing.
+
+        If ``recursive`` is ``True``, nested tables are converted to :class:`dict`\\ s too
+        until they are ``max_depth`` levels deep.
+        Tables which are nested deeper are left as :class:`Table` objects.
+        A table that occurs several times, including a table which contains itself,
+        becomes a single shared :class:`dict`.
+        """
+        return _luastack.table_to_dict(self._ref, max_depth if recursive else 0)
+
     def __dict__(self):
         """
         Returns this table as a :class:`dict`.
-        Equivalent to ``dict(table.items())``.
+        Equivalent to ``table.to_dict()``.
         """
-        return dict(self.items())
+        return self.to_dict()
 
 
 class TableBaseIterator(ABC):
@@ -397,22 +646,3 @@ class TableItemIterator(TableBaseIterator):
     def __next__(self):
         super().__next__()
         return self._previous_key, _luastack.convert_lua_to_py()
-
-
-def _table_from_stack(stack_index):
-    """Wraps a table at the Lua stack index ``stack_index`` in a :class:`Table` instance."""
-    _luastack.push(stack_index)
-    ref = _luastack.reference_create()
-    table = Table(ref)
-    return table
-
-
-def _lua_func_from_stack(stack_index):
-    """
-    Wraps a function at the Lua stack index ``stack_index``
-    in a :class:`CallableLuaObject` instance.
-    """
-    _luastack.push(stack_index)
-    ref = _luastack.reference_create()
-    func = CallableLuaObject(ref)
-    return func
@@ -0,0 +1,204 @@
+"""
+Runs CPU-heavy functions in a pool of worker processes.
+
+Work which takes hundreds of milliseconds, such as navmesh analysis or report generation,
+stalls the game even in a thread, since the thread needs the GIL. :func:`submit` runs it in
+another process instead and delivers the result back on the main thread::
+
+    from pygmod import offload
+
+    def analyze(nodes):  # Must be picklable: a module-level function of an importable module
+        ...
+
+    future = offload.submit(analyze, nodes)
+    future.add_done_callback(lambda f: print(f.result()))
+
+The functions, their arguments and results must be picklable, and the functions can't use Lua.
+Worker processes import the modules of the functions, so keep them in modules which don't import
+:mod:`pygmod.lua` or :mod:`pygmod.gmodapi`.
+The returned :class:`concurrent.futures.Future` is completed on the main thread by
+:mod:`pygmod.dispatch`, so its callbacks can use Lua. Cancelling it cancels the call
+if it hasn't started in a worker process yet.
+
+The game is the executable of the embedded interpreter, so new worker processes are started
+with a standalone Python of the same version, found by :func:`find_python`.
+If there is none, :func:`submit` raises :exc:`RuntimeError`. Worker processes are never forked
+from the game process, since a fork would inherit the game's threads and engine state.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from pygmod import dispatch, lua
+
+__all__ = ["submit", "find_python", "set_max_workers", "shutdown"]
+
+# Environment variable with the path to the Python executable for worker processes
+PYTHON_ENV_VAR = "PYGMOD_PYTHON"
+
+# Identifier of the hook which shuts the pool down
+_HOOK_ID = "pygmod.offload"
+
+# The pool and its size are reassigned by submit(), shutdown() and set_max_workers(),
+# so they're not constants
+# pylint: disable=invalid-name
+_executor = None
+_max_workers = None
+# pylint: enable=invalid-name
+
+# Prints the major and the minor version of the Python running it
+_VERSION_SCRIPT = "import sys; print(*sys.version_info[:2])"
+# Prints the path to the Python executable running it
+_EXECUTABLE_SCRIPT = "import sys; print(sys.executable)"
+
+
+def find_python():
+    """
+    Returns the path to a Python executable for worker processes or ``None`` if there is none.
+
+    The executable is taken from the ``PYGMOD_PYTHON`` environment variable if it's set.
+    Otherwise it's looked up in the embedded Python home (``garrysmod/pygmod/stdlib``), then in
+    ``PATH`` and on Windows with the ``py`` launcher. Only executables of the same version as the
+    embedded interpreter are accepted, since the workers use the same standard library path:
+    the version of every found executable is checked by running it.
+    """
+    configured = os.environ.get(PYTHON_ENV_VAR)
+    if configured:
+        return configured
+
+    version = f"{sys.version_info.major}.{sys.version_info.minor}"
+    if sys.platform == "win32":
+        candidates = [os.path.join(sys.prefix, "python.exe"),
+                      shutil.which(f"python{version}.exe"),
+                      shutil.which("python.exe"),
+                      _py_launcher_python(version)]
+    else:
+        candidates = [os.path.join(sys.prefix, "bin", f"python{version}"),
+                      shutil.which(f"python{version}")]
+
+    for candidate in candidates:
+        if (candidate is not None and os.path.isfile(candidate) and os.access(candidate, os.X_OK)
+                and _python_version(candidate) == sys.version_info[:2]):
+            return candidate
+    return None
+
+
+def _run_python(args):
+    """
+    Runs a Python executable with ``args`` and returns its output
+    or ``None`` if it can't be run or fails.
+    """
+    try:
+        completed = subprocess.run(args, capture_output=True, text=True, timeout=10, check=True)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip()
+
+
+def _python_version(executable):
+    """Returns ``(major, minor)`` version of the Python ``executable`` or ``None`` if it fails."""
+    output = _run_python([executable, "-c", _VERSION_SCRIPT])
+    try:
+        major, minor = map(int, output.split())
+    except (AttributeError, ValueError):
+        return None
+    return major, minor
+
+
+def _py_launcher_python(version):
+    """
+    Returns the path to the Python ``version`` executable known to the Windows ``py`` launcher
+    or ``None`` if there is no launcher or no such version.
+    """
+    launcher = shutil.which("py.exe")
+    if launcher is None:
+        return None
+    return _run_python([launcher, f"-{version}", "-c", _EXECUTABLE_SCRIPT]) or None
+
+
+def _mp_context():
+    """
+    Returns the :mod:`multiprocessing` context which spawns worker processes with
+    the executable found by :func:`find_python`.
+    Raises :exc:`RuntimeError` if there is none: forking the game process isn't safe.
+    """
+    python = find_python()
+    if python is None:
+        version = f"{sys.version_info.major}.{sys.version_info.minor}"
+        raise RuntimeError(f"no Python {version} executable for worker processes found, "
+                           f"set {PYTHON_ENV_VAR}")
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(python)
+    return context
+
+
+def _get_executor():
+    """Returns the process pool, creating it and adding its ``ShutDown`` hook if there is none."""
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        _executor = ProcessPoolExecutor(_max_workers, mp_context=_mp_context())
+        lua.G.hook.Add("ShutDown", _HOOK_ID, _shutdown_on_hook)
+    return _executor
+
+
+def set_max_workers(count):
+    """
+    Sets the number of worker processes, :func:`os.cpu_count` by default.
+    Takes effect when the pool is created by the next :func:`submit` call after :func:`shutdown`.
+    """
+    global _max_workers  # pylint: disable=global-statement
+    if count is not None and count < 1:
+        raise ValueError("there must be at least 1 worker")
+    _max_workers = count
+
+
+def _copy_result(source, destination):
+    """
+    Copies the result, the exception or the cancellation of the worker future ``source``
+    to ``destination``, unless ``destination`` was cancelled.
+    """
+    if destination.cancelled():
+        return
+    if source.cancelled():
+        destination.cancel()
+    elif source.exception() is not None:
+        destination.set_exception(source.exception())
+    else:
+        destination.set_result(source.result())
+
+
+def submit(func, *args, **kwargs):
+    """
+    Schedules ``func(*args, **kwargs)`` to run in a worker process.
+
+    Returns a :class:`concurrent.futures.Future` which is completed on the main thread,
+    in the ``Think`` hook of :mod:`pygmod.dispatch`. Cancelling it cancels the call
+    unless a worker process has already started it.
+    Raises :exc:`RuntimeError` if no Python executable for worker processes is found.
+    """
+    result = Future()
+    worker_future = _get_executor().submit(func, *args, **kwargs)
+    # The worker future is completed in a thread of the pool,
+    # so the result is passed to the main thread
+    worker_future.add_done_callback(
+        lambda done: dispatch.call_soon_main(_copy_result, done, result))
+    result.add_done_callback(lambda done: worker_future.cancel() if done.cancelled() else None)
+    return result
+
+
+def shutdown(wait=True, cancel_futures=False):
+    """Stops the worker processes. The pool is created again by the next :func:`submit` call."""
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        return
+    executor, _executor = _executor, None
+    executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def _shutdown_on_hook(*_):
+    """The ``ShutDown`` hook. Stops the worker processes without waiting for them."""
+    shutdown(wait=False, cancel_futures=True)
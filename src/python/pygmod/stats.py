@@ -0,0 +1,133 @@
+"""
+Counts the crossings between Python and Lua.
+
+Every crossing of the bridge has a fixed cost, so code which converts values or calls Lua functions
+thousands of times per frame can be slow even though each crossing is cheap.
+The C++ module counts the crossings of each kind, see :data:`COUNTERS`,
+and measures their rates over the last second::
+
+    from pygmod import stats
+
+    print(stats.counters()["lua_call"].rate)
+
+In verbose mode the crossings are also attributed to the Python lines which made them,
+showing which code to batch or cache::
+
+    stats.enable_verbose()
+    ...
+    for site, counts in stats.call_sites().items():
+        print(site, counts)
+
+The ``pygmod_stats`` server console command prints the same report.
+``pygmod_stats verbose`` and ``pygmod_stats quiet`` turn verbose mode on and off.
+
+The counters are shared by both realms. Counting costs an increment per crossing;
+verbose mode walks the Python stack on every crossing, so it's meant for profiling sessions.
+"""
+
+from collections import namedtuple
+from os import path
+from logging import getLogger
+
+import _luastack
+import pygmod
+from pygmod import lua
+
+__all__ = ["COUNTERS", "Stat", "counters", "enable_verbose", "disable_verbose", "call_sites",
+           "format_report"]
+
+LOGGER = getLogger("pygmod.stats")
+
+COUNTERS = _luastack.bridge_counter_names
+"""
+Names of the counters, defined by the C++ module:
+
+- ``convert_py_to_lua``, ``convert_lua_to_py``: values converted between Python and Lua
+- ``lua_call``: Lua functions called from Python
+- ``reference_create``, ``reference_free``: Lua references created and freed,
+  mostly by Lua objects in Python
+- ``realm_swap``: swaps of the current interpreter between the client and the server realm
+- ``python_call``: Python functions called from Lua
+"""
+
+Stat = namedtuple("Stat", ["total", "rate"])
+Stat.__doc__ = """
+Value of a counter:
+
+- ``total``: number of crossings since the game started
+- ``rate``: crossings per second over the last second
+"""
+
+# Frames from files under this directory are skipped in verbose mode,
+# so the crossings are attributed to the code calling PyGmod
+_PACKAGE_DIR = path.dirname(pygmod.__file__) + path.sep
+
+
+def counters():
+    """Returns a dict of :class:`Stat` by the counter name."""
+    return {name: Stat(*value) for name, value in _luastack.bridge_stats().items()}
+
+
+def enable_verbose():
+    """Starts attributing the crossings to Python call sites. Clears the collected call sites."""
+    _luastack.set_call_site_tracking(_PACKAGE_DIR)
+
+
+def disable_verbose():
+    """Stops attributing the crossings to Python call sites. Clears the collected call sites."""
+    _luastack.set_call_site_tracking(None)
+
+
+def call_sites(reset=False):
+    """
+    Returns the crossings collected in verbose mode as ``{"file:line": {counter name: count}}``,
+    sorted by the total count, largest first. Clears them after reading if ``reset`` is ``True``.
+    """
+    sites = _luastack.call_sites(reset)
+    return dict(sorted(sites.items(), key=lambda item: sum(item[1].values()), reverse=True))
+
+
+def format_report(max_sites=10):
+    """Returns the counters and the top ``max_sites`` call sites as text."""
+    lines = [f"{'counter':<20}{'total':>14}{'per second':>14}"]
+    for name, stat in counters().items():
+        lines.append(f"{name:<20}{stat.total:>14}{stat.rate:>14.1f}")
+
+    sites = list(call_sites().items())[:max_sites]
+    if sites:
+        lines.append("")
+        lines.append("Top call sites:")
+        for site, counts in sites:
+            details = ", ".join(f"{name}={count}" for name, count in counts.items())
+            lines.append(f"  {site}: {details}")
+    return "\n".join(lines)
+
+
+def _command(ply, _cmd, _args, arg_str):
+    """
+    The ``pygmod_stats`` console command. Prints the report, or turns verbose mode on or off
+    with the ``verbose`` and ``quiet`` arguments.
+    """
+    # Only the server console may toggle verbose mode, since it slows every crossing down
+    if lua.G.IsValid(ply):
+        return
+
+    arg = arg_str.strip().lower()
+    if arg == "verbose":
+        enable_verbose()
+        print("pygmod_stats: verbose mode enabled")
+    elif arg == "quiet":
+        disable_verbose()
+        print("pygmod_stats: verbose mode disabled")
+    elif arg:
+        print("Usage: pygmod_stats [verbose|quiet]")
+    else:
+        print(format_report())
+
+
+def setup():
+    """Registers the ``pygmod_stats`` console command in the server realm."""
+    if lua.G.SERVER:
+        lua.G.concommand.Add("pygmod_stats", _command)
+
+    LOGGER.debug("stats.setup() complete")
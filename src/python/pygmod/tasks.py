@@ -0,0 +1,232 @@
+"""
+Runs long Python jobs a bit every frame.
+
+A job which runs to completion in one hook call, like rebuilding a leaderboard or scanning all
+props, causes a frame hitch. Written as a generator, which yields whenever it can be paused,
+it can be spread over many frames by :func:`spawn`::
+
+    from pygmod import tasks
+
+    def scan_props():
+        for ent in ents.GetAll():
+            check(ent)
+            yield
+
+    task = tasks.spawn(scan_props(), priority=tasks.PRIORITY_LOW)
+
+A coroutine can be spawned as well; it pauses with ``await tasks.yield_now()``.
+It can't await asyncio futures, use :mod:`pygmod.aio` for such coroutines.
+
+Every frame, a ``Think`` handler added with :mod:`pygmod.hooks` advances the tasks one step at a
+time, round-robin, until the frame budget (see :func:`set_frame_budget`) is spent.
+Every round gives high priority tasks 4 steps, normal priority tasks 2 steps and low priority tasks
+1 step, so low priority tasks are slower, but never starve.
+A single step which takes longer than the whole frame budget is logged as a warning:
+the task should yield more often. A frame budget of ``0`` runs one step per frame
+and reports no steps as over budget.
+"""
+
+from collections import deque, namedtuple
+from logging import getLogger
+from time import perf_counter
+
+from pygmod import hooks
+
+__all__ = ["PRIORITY_HIGH", "PRIORITY_NORMAL", "PRIORITY_LOW", "Task", "TaskStats",
+           "spawn", "yield_now", "set_frame_budget", "stats"]
+
+LOGGER = getLogger("pygmod.tasks")
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Steps per round of each priority class, indexed by priority
+_STEPS_PER_ROUND = (4, 2, 1)
+
+# Time for the tasks per frame by default, in seconds
+DEFAULT_FRAME_BUDGET = 0.002
+
+TaskStats = namedtuple("TaskStats", ["name", "priority", "steps", "total_time", "max_step_time",
+                                     "over_budget_steps"])
+TaskStats.__doc__ = """
+Statistics of a running task:
+
+- ``name``: the task name
+- ``priority``: the priority class
+- ``steps``: how many steps the task has run
+- ``total_time``: total time of these steps, in seconds
+- ``max_step_time``: the longest step, in seconds
+- ``over_budget_steps``: how many steps took longer than the whole frame budget
+"""
+
+# Reassigned by set_frame_budget(), so it's not a constant
+_frame_budget = DEFAULT_FRAME_BUDGET  # pylint: disable=invalid-name
+# Queues of the running tasks, indexed by priority
+_queues = tuple(deque() for _ in _STEPS_PER_ROUND)
+
+
+class _YieldNow:
+    """Awaitable which pauses a coroutine task until its next step."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __await__(self):
+        yield
+
+
+def yield_now():
+    """Returns an awaitable which pauses a coroutine task until its next step."""
+    return _YieldNow()
+
+
+class Task:
+    """A job spawned by :func:`spawn`."""
+
+    def __init__(self, job, priority, name):
+        self._job = job
+        self.priority = priority
+        self.name = name
+        self.steps = 0
+        self.total_time = 0.0
+        self.max_step_time = 0.0
+        self.over_budget_steps = 0
+        self._done = False
+        self._cancelled = False
+        self._result = None
+        self._exception = None
+
+    def __repr__(self):
+        return f"<Task {self.name!r}>"
+
+    def done(self):
+        """Returns ``True`` if the task has finished, failed or was cancelled."""
+        return self._done
+
+    def cancelled(self):
+        """Returns ``True`` if the task was cancelled."""
+        return self._cancelled
+
+    def cancel(self):
+        """
+        Stops the task. Does nothing if it's already done.
+        Called from the task itself, stops it when it pauses next time.
+        """
+        if self._done:
+            return
+        self._cancelled = True
+        # A running generator or coroutine can't be closed, _step() calls cancel() again after it
+        if not (getattr(self._job, "gi_running", False) or getattr(self._job, "cr_running", False)):
+            self._job.close()
+            self._done = True
+
+    def result(self):
+        """
+        Returns the value returned by the job. Raises the exception of the job if it failed.
+        Raises :exc:`RuntimeError` if the task isn't done or was cancelled.
+        """
+        if not self._done or self._cancelled:
+            raise RuntimeError("the task is not finished")
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def _step(self):
+        """
+        Runs the job until it pauses, updating the statistics.
+        Returns ``False`` when the task is done.
+        """
+        start = perf_counter()
+        try:
+            self._job.send(None)
+        except StopIteration as stop:
+            self._result = stop.value
+            self._done = True
+            # The job finished in the step which requested its cancellation
+            self._cancelled = False
+        except Exception as exc:
+            self._exception = exc
+            self._done = True
+            self._cancelled = False
+            LOGGER.exception("Exception in task %r", self.name)
+        if self._cancelled:
+            # Cancelled by the job itself during the step
+            self.cancel()
+        elapsed = perf_counter() - start
+
+        self.steps += 1
+        self.total_time += elapsed
+        self.max_step_time = max(self.max_step_time, elapsed)
+        if 0 < _frame_budget < elapsed:
+            self.over_budget_steps += 1
+            LOGGER.warning("Task %r took %.1f ms in one step, over the frame budget of %.1f ms",
+                           self.name, elapsed * 1000, _frame_budget * 1000)
+        return not self._done
+
+
+def spawn(job, priority=PRIORITY_NORMAL, name=None):
+    """
+    Runs the generator or coroutine ``job`` a step at a time, starting from the next frame.
+    ``priority`` is one of ``PRIORITY_HIGH``, ``PRIORITY_NORMAL`` and ``PRIORITY_LOW``.
+    ``name`` is used in logs and :func:`stats`, the job function name by default.
+
+    Returns a :class:`Task`.
+    """
+    if priority not in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW):
+        raise ValueError(f"unknown priority {priority!r}")
+    if name is None:
+        name = getattr(job, "__qualname__", repr(job))
+    task = Task(job, priority, name)
+    if not any(_queues):
+        hooks.on("Think", _run)
+    _queues[priority].append(task)
+    return task
+
+
+def set_frame_budget(seconds):
+    """
+    Sets how long the tasks may run per frame.
+    At least one step is run every frame, even if it takes longer.
+    ``0`` means no budget: one step per frame, and no step is reported as over budget.
+    """
+    global _frame_budget  # pylint: disable=global-statement
+    if seconds < 0:
+        raise ValueError("the frame budget can't be negative")
+    _frame_budget = seconds
+
+
+def stats():
+    """Returns a list of :class:`TaskStats` of the running tasks."""
+    return [TaskStats(task.name, task.priority, task.steps, task.total_time, task.max_step_time,
+                      task.over_budget_steps)
+            for queue in _queues for task in queue if not task.done()]
+
+
+def _run_round(deadline):
+    """
+    Runs one round: the steps of every priority class, round-robin within each class.
+    Returns ``False`` if the frame budget is spent before the round ends.
+    """
+    for queue, steps in zip(_queues, _STEPS_PER_ROUND):
+        for _ in range(steps):
+            if not queue:
+                break
+            task = queue.popleft()
+            # pylint: disable=protected-access
+            if not task._done and task._step():
+                queue.append(task)
+            if perf_counter() >= deadline:
+                return False
+    return True
+
+
+def _run(*_):
+    """
+    The ``Think`` handler. Runs rounds of steps until the frame budget is spent.
+    Removes itself when no tasks are left.
+    """
+    deadline = perf_counter() + _frame_budget
+    while any(_queues) and _run_round(deadline):
+        pass
+    if not any(_queues):
+        hooks.off("Think", _run)
@@ -0,0 +1,178 @@
+"""
+Python timers, all advanced by a single ``Tick`` hook.
+
+``timer.Create`` and ``timer.Simple`` with Python callbacks create a Lua timer and a Lua closure per
+timer, and every firing calls Python from Lua. This module keeps Python timers in a heap instead:
+adding and cancelling a timer costs O(log n), and one ``Tick`` handler, added with
+:mod:`pygmod.hooks`, fires the timers which are due::
+
+    from pygmod import timers
+
+    timers.simple(2, print, "2 seconds later")
+    # Every 0.5-0.6 seconds until cancelled
+    think = timers.create(0.5, 0, npc_think, npc, jitter=0.1)
+    ...
+    think.cancel()
+
+Times are in seconds of ``CurTime()``, like in the Lua timer library,
+so timers are paused with the game. Timers fire at most once per tick.
+An exception in a callback is logged and doesn't stop the timer.
+"""
+
+from heapq import heappush, heappop, heapify
+from logging import getLogger
+from random import uniform
+
+from pygmod import hooks, lua
+
+__all__ = ["Timer", "simple", "create", "count"]
+
+LOGGER = getLogger("pygmod.timers")
+
+# Heap of (fire time, sequence number, timer). Cancelled timers are removed lazily.
+_heap = []
+# The counters are reassigned as timers are scheduled and cancelled, so they're not constants
+# pylint: disable=invalid-name
+_cancelled_in_heap = 0
+# Sequence numbers keep timers with the same fire time in the order they were scheduled
+_sequence = 0
+# pylint: enable=invalid-name
+_cur_time = lua.resolve("CurTime")
+
+
+class Timer:
+    """A scheduled timer. Returned by :func:`simple` and :func:`create`."""
+
+    __slots__ = ("func", "args", "interval", "repetitions", "jitter",
+                 "_in_heap", "_cancelled", "_finished")
+
+    def __init__(self, interval, repetitions, jitter, func, args):
+        self.func = func
+        self.args = args
+        self.interval = interval
+        # Repetitions left, 0 means infinite
+        self.repetitions = repetitions
+        self.jitter = jitter
+        self._in_heap = False
+        self._cancelled = False
+        self._finished = False
+
+    @property
+    def active(self):
+        """``True`` if the timer will fire again."""
+        return not self._cancelled and not self._finished
+
+    def cancel(self):
+        """Stops the timer. Does nothing if it's already stopped or finished."""
+        global _cancelled_in_heap  # pylint: disable=global-statement
+        if not self.active:
+            return
+        self._cancelled = True
+        if not self._in_heap:
+            return
+        _cancelled_in_heap += 1
+        # Removing cancelled timers once they are the majority keeps the heap small
+        if _cancelled_in_heap > len(_heap) // 2:
+            _compact()
+
+    def _next_delay(self):
+        """Returns the delay until the next call: the interval plus a random jitter."""
+        if self.jitter:
+            return self.interval + uniform(0, self.jitter)
+        return self.interval
+
+    def __repr__(self):
+        state = "active" if self.active else "stopped"
+        return f"<Timer {self.func!r} every {self.interval}s, {state}>"
+
+
+def _compact():
+    """Removes the cancelled timers from the heap."""
+    global _cancelled_in_heap  # pylint: disable=global-statement
+    kept = []
+    for entry in _heap:
+        timer = entry[2]
+        if timer._cancelled:  # pylint: disable=protected-access
+            timer._in_heap = False  # pylint: disable=protected-access
+        else:
+            kept.append(entry)
+    _heap[:] = kept
+    heapify(_heap)
+    _cancelled_in_heap = 0
+
+
+def _schedule(timer, fire_time):
+    """
+    Adds ``timer`` to the heap to fire at ``fire_time``,
+    adding the ``Tick`` handler if the heap was empty.
+    """
+    global _sequence  # pylint: disable=global-statement
+    if not _heap:
+        hooks.on("Tick", _advance)
+    _sequence += 1
+    heappush(_heap, (fire_time, _sequence, timer))
+    timer._in_heap = True  # pylint: disable=protected-access
+
+
+def simple(delay, func, *args):
+    """Calls ``func(*args)`` once after ``delay`` seconds. Same as ``timer.Simple``."""
+    return create(delay, 1, func, *args)
+
+
+def create(interval, repetitions, func, *args, jitter=0.0):
+    """
+    Calls ``func(*args)`` every ``interval`` seconds, ``repetitions`` times or until cancelled
+    if it's 0. Same as ``timer.Create``, but timers have no names:
+    keep the returned :class:`Timer` to cancel it.
+
+    Every delay is increased by a random amount up to ``jitter`` seconds, which spreads timers
+    created at the same time (e.g. for every NPC) over several ticks.
+    """
+    if interval < 0 or jitter < 0:
+        raise ValueError("interval and jitter can't be negative")
+    if repetitions < 0:
+        raise ValueError("repetitions can't be negative")
+    timer = Timer(interval, repetitions, jitter, func, args)
+    _schedule(timer, _cur_time() + timer._next_delay())  # pylint: disable=protected-access
+    return timer
+
+
+def count():
+    """Returns the number of active timers."""
+    return len(_heap) - _cancelled_in_heap
+
+
+def _advance(*_):
+    """
+    The ``Tick`` handler. Calls the timers which are due and reschedules the repeating ones.
+    Removes itself when no timers are left.
+    """
+    global _cancelled_in_heap  # pylint: disable=global-statement
+    now = _cur_time()
+    # Timers scheduled by the callbacks of this tick fire in the next tick at the earliest
+    due = []
+    while _heap and _heap[0][0] <= now:
+        timer = heappop(_heap)[2]
+        timer._in_heap = False  # pylint: disable=protected-access
+        if timer._cancelled:  # pylint: disable=protected-access
+            _cancelled_in_heap -= 1
+        else:
+            due.append(timer)
+
+    for timer in due:
+        # pylint: disable=protected-access
+        if timer._cancelled:  # By a callback called earlier in this tick
+            continue
+        if timer.repetitions == 1:
+            timer._finished = True
+        else:
+            if timer.repetitions > 1:
+                timer.repetitions -= 1
+            _schedule(timer, now + timer._next_delay())
+        try:
+            timer.func(*timer.args)
+        except Exception:
+            LOGGER.exception("Exception in timer %r", timer)
+
+    if not _heap:
+        hooks.off("Tick", _advance)
@@ -0,0 +1,86 @@
+"""
+Runs many ``util.TraceLine`` and ``util.TraceHull`` traces at once.
+
+The start and end points are taken from arrays, all traces are run in a single call to the C++
+module reusing the same trace structure and result table, and the results are written to arrays::
+
+    from pygmod import traces
+
+    # N×3 arrays of start and end points
+    result = traces.trace_lines(eyes, targets, mask=MASK_SHOT)
+    visible = result.fraction == 1.0
+
+Points can be NumPy arrays or any other objects supporting the buffer protocol
+which hold C-contiguous doubles, floats or integers, 3 numbers per point.
+"""
+
+from collections import namedtuple
+
+import _luastack
+from pygmod.batch import new_output
+from pygmod.lua import Table
+
+__all__ = ["TraceResults", "trace_lines", "trace_hulls"]
+
+TraceResults = namedtuple("TraceResults", ["hit_pos", "fraction", "normal", "entity"])
+TraceResults.__doc__ = """
+Arrays of trace results:
+
+- ``hit_pos``: hit positions, 3 numbers per trace
+- ``fraction``: fractions of the way between the start and the end points, 1 number per trace
+- ``normal``: hit surface normals, 3 numbers per trace
+- ``entity``: indices of the hit entities (``0`` is the world, ``-1`` means nothing was hit),
+  1 number per trace
+"""
+
+
+def _point_count(points):
+    """Returns the number of 3D points in the buffer ``points``."""
+    view = memoryview(points)
+    return view.nbytes // view.itemsize // 3
+
+
+def _run(starts, ends, *, hull, mask, filter_, mins, maxs, out):
+    """
+    Runs the traces with :func:`_luastack.trace_batch`, creating the output arrays
+    if ``out`` is ``None``. Returns :class:`TraceResults`.
+    """
+    if out is None:
+        count = _point_count(starts)
+        out = TraceResults(new_output(count, 3), new_output(count, 1),
+                           new_output(count, 3), new_output(count, 1, "q"))
+    if isinstance(filter_, (list, tuple)):
+        filter_ = Table(filter_)
+    _luastack.trace_batch(hull, starts, ends, mask, filter_, mins, maxs, *out)
+    return out
+
+
+# The filter arguments are named after the field of the trace structure
+# pylint: disable=redefined-builtin
+
+
+def trace_lines(starts, ends, *, mask=None, filter=None, out=None):
+    """
+    Runs ``util.TraceLine`` from every point of ``starts`` to the corresponding point of ``ends``.
+
+    The keyword-only ``mask`` and ``filter`` are the ``mask`` and ``filter`` fields of the trace
+    structure, shared by all traces. A list or a tuple of entities is converted to a table
+    for ``filter``.
+
+    The results are written to ``out`` if it's given. It must be a :class:`TraceResults` of arrays
+    with enough space for all traces; fields which are ``None`` are not computed.
+    Otherwise new arrays are created, see :mod:`pygmod.batch`.
+
+    Returns :class:`TraceResults`.
+    """
+    return _run(starts, ends, hull=False, mask=mask, filter_=filter,
+                mins=None, maxs=None, out=out)
+
+
+def trace_hulls(starts, ends, mins, maxs, *, mask=None, filter=None, out=None):
+    """
+    Runs ``util.TraceHull`` with the box from ``mins`` to ``maxs``
+    (:class:`pygmod.valuetypes.Vector`) for every pair of points.
+    Same as :func:`trace_lines` otherwise.
+    """
+    return _run(starts, ends, hull=True, mask=mask, filter_=filter, mins=mins, maxs=maxs, out=out)
@@ -0,0 +1,308 @@
+"""
+Python versions of Garry's Mod value types: :class:`Vector`, :class:`Angle` and :class:`Color`.
+
+Lua vectors, angles and colors are converted to these classes when they are passed to Python,
+and back when they are passed to Lua, so reading their components and doing arithmetic
+with them never calls Lua. Lua methods which have no Python counterpart are still available
+through the ``_`` attribute::
+
+    pos._.Rotate(Angle(0, 90, 0))
+"""
+
+from functools import partial
+from math import sqrt, sin, cos, atan2, radians, degrees
+
+import _luastack
+
+__all__ = ["Vector", "Angle", "Color"]
+
+
+class _LuaMethods:
+    """
+    Calls Lua methods of a value, like the colon operator in Lua. Returned by the ``_`` attribute
+    of the value types.
+
+    The value is converted to Lua for every call. Methods which modify the Lua value in place,
+    such as ``Normalize`` or ``Rotate``, modify the Python value as well.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ("_value",)
+
+    def __init__(self, value):
+        self._value = value
+
+    def __getattr__(self, name):
+        return partial(self._call, name)
+
+    def _call(self, name, *args):
+        """Calls the Lua method ``name`` and copies the components of the value back from Lua."""
+        updated, result = _luastack.call_value_method(self._value, name, *args)
+        for component in self._value.__slots__:
+            setattr(self._value, component, getattr(updated, component))
+        return result
+
+
+class _ValueType:
+    """Base class of the value types."""
+
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ()
+
+    @property
+    def _(self):
+        """
+        Calls the Lua methods of this value, like the colon operator in Lua::
+
+            vec._.Normalize()
+            dot = vec._.Dot(other)
+        """
+        return _LuaMethods(self)
+
+
+class Vector(_ValueType):
+    """
+    3D vector. Same as ``Vector`` in Lua.
+
+    >>> v = Vector(1, 2, 3)
+    >>> v.x
+    1.0
+    >>> v + Vector(1, 1, 1)
+    Vector(2.0, 3.0, 4.0)
+    >>> v * 2
+    Vector(2.0, 4.0, 6.0)
+    """
+
+    # The components are named the same as in Lua
+    # pylint: disable=invalid-name
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __repr__(self):
+        return f"Vector({self.x!r}, {self.y!r}, {self.z!r})"
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __eq__(self, other):
+        if not isinstance(other, Vector):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y and self.z == other.z
+
+    # Vectors are mutable, so they are not hashable
+    __hash__ = None
+
+    def __add__(self, other):
+        if not isinstance(other, Vector):
+            return NotImplemented
+        return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        if not isinstance(other, Vector):
+            return NotImplemented
+        return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, other):
+        # Like in Lua, multiplying by a vector multiplies the components
+        if isinstance(other, Vector):
+            return Vector(self.x * other.x, self.y * other.y, self.z * other.z)
+        if isinstance(other, (int, float)):
+            return Vector(self.x * other, self.y * other, self.z * other)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if not isinstance(other, (int, float)):
+            return NotImplemented
+        return Vector(self.x / other, self.y / other, self.z / other)
+
+    def __neg__(self):
+        return Vector(-self.x, -self.y, -self.z)
+
+    def length(self):
+        """Returns the length of the vector."""
+        return sqrt(self.length_sqr())
+
+    def length_sqr(self):
+        """
+        Returns the squared length of the vector, which is faster to calculate than :meth:`length`.
+        """
+        return self.x * self.x + self.y * self.y + self.z * self.z
+
+    def length_2d(self):
+        """Returns the length of the vector in the XY plane."""
+        return sqrt(self.x * self.x + self.y * self.y)
+
+    def distance(self, other):
+        """Returns the distance between this and ``other`` vectors."""
+        return (self - other).length()
+
+    def dot(self, other):
+        """Returns the dot product of this and ``other`` vectors."""
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def cross(self, other):
+        """Returns the cross product of this and ``other`` vectors."""
+        return Vector(self.y * other.z - self.z * other.y,
+                      self.z * other.x - self.x * other.z,
+                      self.x * other.y - self.y * other.x)
+
+    def normalized(self):
+        """
+        Returns a vector with the same direction and the length of 1. A zero vector stays zero.
+        """
+        length = self.length()
+        if not length:
+            return Vector()
+        return self / length
+
+    def angle(self):
+        """Returns the :class:`Angle` which points in the direction of this vector."""
+        if not self.x and not self.y:
+            return Angle(270 if self.z > 0 else 90, 0, 0)
+        yaw = degrees(atan2(self.y, self.x)) % 360
+        pitch = degrees(atan2(-self.z, self.length_2d())) % 360
+        return Angle(pitch, yaw, 0)
+
+
+class Angle(_ValueType):
+    """
+    Euler angle in degrees. Same as ``Angle`` in Lua.
+
+    >>> a = Angle(0, 90, 0)
+    >>> a.y
+    90.0
+    """
+
+    # The components and the direction methods are named the same as in Lua
+    # pylint: disable=invalid-name
+
+    __slots__ = ("p", "y", "r")
+
+    def __init__(self, p=0.0, y=0.0, r=0.0):
+        self.p = float(p)
+        self.y = float(y)
+        self.r = float(r)
+
+    pitch = property(lambda self: self.p, lambda self, value: setattr(self, "p", value),
+                     doc="Alias for ``p``.")
+    yaw = property(lambda self: self.y, lambda self, value: setattr(self, "y", value),
+                   doc="Alias for ``y``.")
+    roll = property(lambda self: self.r, lambda self, value: setattr(self, "r", value),
+                    doc="Alias for ``r``.")
+
+    def __repr__(self):
+        return f"Angle({self.p!r}, {self.y!r}, {self.r!r})"
+
+    def __iter__(self):
+        yield self.p
+        yield self.y
+        yield self.r
+
+    def __eq__(self, other):
+        if not isinstance(other, Angle):
+            return NotImplemented
+        return self.p == other.p and self.y == other.y and self.r == other.r
+
+    # Angles are mutable, so they are not hashable
+    __hash__ = None
+
+    def __add__(self, other):
+        if not isinstance(other, Angle):
+            return NotImplemented
+        return Angle(self.p + other.p, self.y + other.y, self.r + other.r)
+
+    def __sub__(self, other):
+        if not isinstance(other, Angle):
+            return NotImplemented
+        return Angle(self.p - other.p, self.y - other.y, self.r - other.r)
+
+    def __mul__(self, other):
+        if not isinstance(other, (int, float)):
+            return NotImplemented
+        return Angle(self.p * other, self.y * other, self.r * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if not isinstance(other, (int, float)):
+            return NotImplemented
+        return Angle(self.p / other, self.y / other, self.r / other)
+
+    def __neg__(self):
+        return Angle(-self.p, -self.y, -self.r)
+
+    def normalized(self):
+        """Returns an angle with every component in the range [-180, 180)."""
+        return Angle(*((component + 180) % 360 - 180 for component in self))
+
+    def _sines_and_cosines(self):
+        """Returns the sine and the cosine of the pitch, the yaw and the roll."""
+        pitch, yaw, roll = radians(self.p), radians(self.y), radians(self.r)
+        return sin(pitch), cos(pitch), sin(yaw), cos(yaw), sin(roll), cos(roll)
+
+    def forward(self):
+        """Returns the normal vector which points forward relative to this angle."""
+        sin_p, cos_p, sin_y, cos_y, _, _ = self._sines_and_cosines()
+        return Vector(cos_p * cos_y, cos_p * sin_y, -sin_p)
+
+    def right(self):
+        """Returns the normal vector which points right relative to this angle."""
+        sin_p, cos_p, sin_y, cos_y, sin_r, cos_r = self._sines_and_cosines()
+        return Vector(-sin_r * sin_p * cos_y + cos_r * sin_y,
+                      -sin_r * sin_p * sin_y - cos_r * cos_y,
+                      -sin_r * cos_p)
+
+    def up(self):
+        """Returns the normal vector which points up relative to this angle."""
+        sin_p, cos_p, sin_y, cos_y, sin_r, cos_r = self._sines_and_cosines()
+        return Vector(cos_r * sin_p * cos_y + sin_r * sin_y,
+                      cos_r * sin_p * sin_y - sin_r * cos_y,
+                      cos_r * cos_p)
+
+
+class Color(_ValueType):
+    """
+    RGBA color with components in the range [0, 255]. Same as ``Color`` in Lua.
+
+    >>> Color(255, 0, 0)
+    Color(255, 0, 0, 255)
+    """
+
+    # The components are named the same as in Lua
+    # pylint: disable=invalid-name
+
+    __slots__ = ("r", "g", "b", "a")
+
+    def __init__(self, r=0, g=0, b=0, a=255):
+        self.r = int(r)
+        self.g = int(g)
+        self.b = int(b)
+        self.a = int(a)
+
+    def __repr__(self):
+        return f"Color({self.r!r}, {self.g!r}, {self.b!r}, {self.a!r})"
+
+    def __iter__(self):
+        yield self.r
+        yield self.g
+        yield self.b
+        yield self.a
+
+    def __eq__(self, other):
+        if not isinstance(other, Color):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    # Colors are mutable, so they are not hashable
+    __hash__ = None
@@ -0,0 +1,151 @@
+"""
+Finds Python callbacks which make the game lag.
+
+When enabled, every Python function called from Lua (hooks, timers, callbacks passed to Lua
+functions) is timed by the C++ module with a monotonic clock. For every callable the watchdog keeps
+the number of calls, the total and maximum time and a histogram of call durations, see
+:func:`stats`. A call which takes longer than the threshold is logged to ``pygmod.log``::
+
+    from pygmod import watchdog
+
+    watchdog.enable()  # The threshold is one server tick by default
+    ...
+    for callback in watchdog.stats()[:10]:
+        print(callback.name, callback.calls, callback.max_time)
+
+Since a slow call is only known to be slow after it returns, a sampler thread checks the running
+call periodically. When it runs longer than the threshold, its stack is logged as well,
+showing where the time goes.
+
+The sampler is a Python thread, so it needs the GIL. A callback running Python code lets it take
+the GIL every :func:`sys.getswitchinterval`, but a callback inside a Lua function or a C extension
+holds the GIL until it returns to Python code. The sampler can't run meanwhile: the stack is
+logged after the callback gets back to Python code, if it's still running, and a callback which
+spends all its time in Lua is only reported with its duration when it returns.
+
+Callbacks defined by the same code, such as closures created in a loop, share their statistics.
+"""
+
+import sys
+import threading
+import traceback
+from collections import namedtuple
+from logging import getLogger
+
+import _luastack
+from pygmod import lua
+
+__all__ = ["BUCKET_BOUNDS", "CallbackStats", "enable", "disable", "stats"]
+
+LOGGER = getLogger("pygmod.watchdog")
+
+# Upper bounds of the histogram buckets in seconds. The last bucket counts all longer calls.
+BUCKET_BOUNDS = _luastack.watchdog_bucket_bounds
+
+# Identifier of the hook which stops the sampler thread
+_HOOK_ID = "pygmod.watchdog"
+
+CallbackStats = namedtuple("CallbackStats",
+                           ["name", "calls", "total_time", "max_time", "histogram"])
+CallbackStats.__doc__ = """
+Timing statistics of a callable:
+
+- ``name``: the qualified name, file and line of the function, or the type name of other callables
+- ``calls``: how many times it was called from Lua
+- ``total_time``: total time of these calls, in seconds
+- ``max_time``: the longest call, in seconds
+- ``histogram``: numbers of calls by duration, one more than :data:`BUCKET_BOUNDS`
+"""
+
+# Reassigned by enable() and disable(), so it's not a constant
+_sampler = None  # pylint: disable=invalid-name
+
+
+class _Sampler(threading.Thread):
+    """
+    Thread which logs the stack of the running callback when it takes longer than the threshold.
+    """
+
+    def __init__(self, threshold, interval):
+        super().__init__(name="pygmod.watchdog sampler", daemon=True)
+        self.threshold = threshold
+        self.interval = interval
+        self.main_thread_id = threading.get_ident()
+        self.stop_event = threading.Event()
+        self.last_sampled = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Logs the stack of the running callback if it's slow and wasn't logged yet."""
+        current = _luastack.watchdog_current()
+        if current is None:
+            return
+        sequence, elapsed = current
+        if elapsed <= self.threshold or sequence == self.last_sampled:
+            return
+        self.last_sampled = sequence
+        frame = sys._current_frames().get(self.main_thread_id)  # pylint: disable=protected-access
+        if frame is not None:
+            stack = "".join(traceback.format_stack(frame))
+        else:
+            stack = "(no Python frames)\n"
+        LOGGER.warning("Callback #%d has been running for %.1f ms:\n%s",
+                       sequence, elapsed * 1000, stack.rstrip())
+
+
+def _report_slow(name, seconds, sequence):
+    """
+    Logs the call number ``sequence`` of the callable ``name`` which took ``seconds``.
+    Called by the C++ module when a callback has taken longer than the threshold.
+    """
+    LOGGER.warning("Callback #%d %s took %.1f ms", sequence, name, seconds * 1000)
+
+
+def enable(threshold=None, sample_interval=None):
+    """
+    Starts timing the Python callbacks called from Lua and logging the ones which take longer than
+    ``threshold`` seconds, one tick (``engine.TickInterval()``) by default.
+    The sampler thread checks the running callback every ``sample_interval`` seconds,
+    half the threshold by default, whenever it can take the GIL.
+    """
+    global _sampler  # pylint: disable=global-statement
+    if threshold is None:
+        threshold = lua.resolve("engine.TickInterval")()
+    if sample_interval is None:
+        sample_interval = threshold / 2
+    disable()
+    _luastack.set_watchdog(threshold)
+    _sampler = _Sampler(threshold, sample_interval)
+    _sampler.start()
+    # Subinterpreters can't be finalized while the sampler thread is running
+    lua.G.hook.Add("ShutDown", _HOOK_ID, _disable_on_hook)
+
+
+def disable():
+    """Stops timing the callbacks and stops the sampler thread. The statistics are kept."""
+    global _sampler  # pylint: disable=global-statement
+    _luastack.set_watchdog(None)
+    if _sampler is None:
+        return
+    sampler, _sampler = _sampler, None
+    sampler.stop_event.set()
+    sampler.join()
+    lua.G.hook.Remove("ShutDown", _HOOK_ID)
+
+
+def _disable_on_hook(*_):
+    """The ``ShutDown`` hook. Stops the sampler thread before the interpreter is finalized."""
+    disable()
+
+
+def stats(reset=False):
+    """
+    Returns a list of :class:`CallbackStats` of all timed callables, the slowest in total first.
+    Resets the statistics after reading them if ``reset`` is ``True``.
+    """
+    result = [CallbackStats(*item) for item in _luastack.watchdog_stats(reset)]
+    result.sort(key=lambda callback: callback.total_time, reverse=True)
+    return result
@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture
+def lua_hook(mocker):
+    """Mock of the Lua hook library, set as the ``hook`` global of the mock ``_luastack``."""
+    # The mock _luastack is next to the test modules, so it's importable only once they are collected
+    import _luastack  # pylint: disable=import-outside-toplevel
+
+    hook = _luastack.lua_globals["hook"] = mocker.Mock()
+    yield hook
+    _luastack.lua_globals.pop("hook", None)
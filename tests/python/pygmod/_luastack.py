@@ -4,6 +4,10 @@ Behaves like true _luastack module, but operates an imaginary Lua stack
 represented by a list.
 """
 
+from copy import copy
+from types import MethodType
+import threading
+
 
 class StackPad:
     """Stub for padding the stack to make indexing start at 1."""
@@ -14,6 +18,8 @@ class StackPad:
 
 stack = [StackPad()]  # Imaginary Lua stack
 references = {}  # Lua reference registry
+metatables = {}  # Named metatables from the Lua registry, such as "Entity"
+lua_globals = {}  # Lua global namespace
 
 
 def top():
@@ -34,7 +40,7 @@ def push_nil():
 
 
 def push_globals():
-    create_table()
+    stack.append(lua_globals)
 
 
 def convert_py_to_lua(o):
@@ -106,6 +112,95 @@ def set_table(i):
     print()
 
 
+def table_get(ref, key):
+    return references[ref][key]
+
+
+def table_set(ref, key, value):
+    references[ref][key] = value
+
+
+def global_get(key):
+    return lua_globals.get(key)
+
+
+def global_set(key, value):
+    lua_globals[key] = value
+
+
+def raw_equal(a, b):
+    return a is b or a == b
+
+
+def path_get(keys):
+    value = lua_globals
+    for key in keys:
+        value = value[key]
+    return value
+
+
+def path_call(keys, *args):
+    return path_get(keys)(*args)
+
+
+def call_method(obj, name, *args):
+    if hasattr(obj, "_ref"):
+        obj = references[obj._ref]
+    return obj[name](obj, *args)
+
+
+def call_value_method(obj, name, *args):
+    value = copy(obj)  # The Lua copy of the value
+    result = metatables[type(obj).__name__][name](value, *args)
+    return value, result
+
+
+class LuaCallable:
+    """Same protocol as the native class, implemented with the imaginary stack."""
+
+    def __call__(self, *args):
+        values_before = top()
+        reference_push(self._ref)
+        for arg in args:
+            convert_py_to_lua(arg)
+        call(len(args), -1)
+
+        values_returned = top() - values_before
+        try:
+            if values_returned == 0:
+                return None
+            if values_returned == 1:
+                return convert_lua_to_py()
+            return tuple(convert_lua_to_py(i) for i in range(values_before + 1, top() + 1))
+        finally:
+            pop(top() - values_before)
+
+
+def map_call(func, arg_tuples):
+    return [func(*(args if isinstance(args, tuple) else (args,))) for args in arg_tuples]
+
+
+class auto_pop:
+    """Same attribute contract as the native type: an instance dict, but no function attributes."""
+
+    def __init__(self, func):
+        if not callable(func):
+            raise TypeError("auto_pop() argument must be callable")
+        self._func = func
+
+    def __call__(self, *args, **kwargs):
+        values_before = top()
+        try:
+            return self._func(*args, **kwargs)
+        finally:
+            pop(top() - values_before)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return MethodType(self, obj)
+
+
 def call(n_args, n_returns):
     """Stub. Always replaced with a mock by mocker.patch()."""
     raise NotImplementedError("call() should always be mocked")
@@ -139,9 +234,183 @@ def reference_free(ref):
     del references[ref]
 
 
+def helper_ref(name):
+    references[name] = name
+    return name
+
+
 def create_table():
     stack.append({})
 
 
+def table_to_dict(ref, max_depth=0):
+    converted = {}
+
+    def convert(table, depth):
+        if id(table) in converted:
+            return converted[id(table)]
+        result = converted[id(table)] = {}
+        for key, value in table.items():
+            if isinstance(value, dict) and depth < max_depth:
+                value = convert(value, depth + 1)
+            result[key] = value
+        return result
+
+    return convert(references[ref], 0)
+
+
+def table_update(ref, mapping, recursive=False, max_depth=32):
+    converted = {}
+
+    def convert(value, depth):
+        if not recursive or not isinstance(value, (dict, list, tuple)):
+            return value
+        if id(value) in converted:
+            return converted[id(value)]
+        if depth > max_depth:
+            raise RecursionError(f"containers are nested more than {max_depth} levels deep")
+        table = converted[id(value)] = {}
+        items = value.items() if isinstance(value, dict) else enumerate(value, 1)
+        for key, item in items:
+            table[key] = convert(item, depth + 1)
+        return table
+
+    table = converted[id(mapping)] = references[ref]
+    for key, value in mapping.items():
+        table[key] = convert(value, 1)
+
+
+def entity_batch(method, width, entities, out):
+    if isinstance(entities, int):
+        table = references[entities]
+        entities = [table[i] for i in range(1, len(table) + 1)]
+
+    view = memoryview(out).cast("B")
+    view = view.cast(memoryview(out).format.lstrip("@=<"))
+    if len(view) < len(entities) * width:
+        raise ValueError("out is too small")
+
+    func = metatables["Entity"][method]
+    for i, ent in enumerate(entities):
+        try:
+            result = func(ent)
+            values = [result] if isinstance(result, (int, float)) else list(result)
+        except Exception:  # pylint: disable=broad-except
+            values = []
+        for j in range(width):
+            view[i * width + j] = values[j] if j < len(values) else float("nan")
+    return len(entities)
+
+
+def _number_view(buffer):
+    return memoryview(buffer).cast("B").cast(memoryview(buffer).format.lstrip("@=<"))
+
+
+def trace_batch(hull, starts, ends, mask, filter_, mins, maxs, hit_pos, fraction, normal, entity):
+    starts, ends = _number_view(starts), _number_view(ends)
+    trace = {"mask": mask, "filter": filter_, "mins": mins, "maxs": maxs}
+    func = lua_globals["util"]["TraceHull" if hull else "TraceLine"]
+    outputs = [(_number_view(out), key, width)
+               for out, key, width in ((hit_pos, "HitPos", 3), (fraction, "Fraction", 1),
+                                       (normal, "HitNormal", 3), (entity, "Entity", 1))
+               if out is not None]
+
+    count = len(starts) // 3
+    for i in range(count):
+        trace["start"] = tuple(starts[i * 3:i * 3 + 3])
+        trace["endpos"] = tuple(ends[i * 3:i * 3 + 3])
+        result = func(trace)
+        for view, key, width in outputs:
+            if key == "Entity" and not result["Hit"]:
+                values = [-1]
+            else:
+                values = list(result[key]) if width > 1 else [result[key]]
+            for j, value in enumerate(values):
+                view[i * width + j] = value
+    return count
+
+
+def interpreter_swaps():
+    return 0
+
+
+registry_counts = {"live": 0, "freed": 0, "peak": 0}  # Statistics returned by registry_stats()
+
+
+def registry_stats():
+    return dict(registry_counts)
+
+
+bridge_counter_names = ("convert_py_to_lua", "convert_lua_to_py", "lua_call", "reference_create",
+                        "reference_free", "realm_swap", "python_call")
+bridge_counters = {name: (0, 0.0) for name in bridge_counter_names}
+call_site_prefix = None  # Prefix set by set_call_site_tracking()
+call_site_counts = {}  # Items returned by call_sites()
+
+
+def bridge_stats():
+    return dict(bridge_counters)
+
+
+def set_call_site_tracking(skip_prefix):
+    global call_site_prefix
+    call_site_prefix = skip_prefix
+    call_site_counts.clear()
+
+
+def call_sites(reset=False):
+    result = {site: dict(counts) for site, counts in call_site_counts.items()}
+    if reset:
+        call_site_counts.clear()
+    return result
+
+
+gil_yield_window = None  # Window set by set_gil_yield()
+gil_yields = [0, 0.0, 0.0, 0.0]
+
+
+def set_gil_yield(window):
+    global gil_yield_window
+    if window is not None and not 0 <= window <= 1:
+        raise ValueError("the window must be between 0 and 1 second")
+    gil_yield_window = window
+
+
+def gil_yield_stats(reset=False):
+    result = tuple(gil_yields)
+    if reset:
+        gil_yields[:] = [0, 0.0, 0.0, 0.0]
+    return result
+
+
+watchdog_bucket_bounds = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.015, 0.025, 0.05,
+                          0.1)
+watchdog_threshold = None  # Threshold set by set_watchdog()
+watchdog_running = None  # (sequence, elapsed) of the running callback
+watchdog_records = []  # Items returned by watchdog_stats()
+
+
+def set_watchdog(threshold):
+    global watchdog_threshold
+    if threshold is not None and threshold < 0:
+        raise ValueError("the threshold can't be negative")
+    watchdog_threshold = threshold
+
+
+def watchdog_stats(reset=False):
+    result = list(watchdog_records)
+    if reset:
+        watchdog_records.clear()
+    return result
+
+
+def watchdog_current():
+    return watchdog_running
+
+
+def is_main_thread():
+    return threading.current_thread() is threading.main_thread()
+
+
 def stack_dump():
     print("Stack:", stack)
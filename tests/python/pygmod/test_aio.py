@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+import _luastack
+from pygmod import aio
+
+
+@pytest.fixture(autouse=True)
+def hook(lua_hook):
+    yield lua_hook
+    if aio._loop is not None:
+        aio._loop.close()
+        asyncio.set_event_loop(None)
+    aio._loop = None
+    aio._frame_waiters.clear()
+    aio._event_waiters.clear()
+
+
+def added_hook(hook, event):
+    return next(call.args[2] for call in hook.Add.call_args_list if call.args[0] == event)
+
+
+def test_get_loop_adds_think_hook(hook):
+    loop = aio.get_loop()
+    assert aio.get_loop() is loop
+    hook.Add.assert_called_once_with("Think", aio._HOOK_ID, aio._on_think)
+
+
+def test_task_runs_in_think(hook):
+    steps = []
+
+    async def task():
+        steps.append(1)
+        await aio.next_frame()
+        steps.append(2)
+
+    aio.create_task(task())
+    assert not steps
+    think = added_hook(hook, "Think")
+    think()
+    assert steps == [1]
+    think()
+    assert steps == [1, 2]
+
+
+def test_hook_event_wakes_all_waiters(hook):
+    results = []
+
+    async def task():
+        results.append(await aio.hook_event("PlayerSay"))
+
+    for _ in range(3):
+        aio.create_task(task())
+    think = added_hook(hook, "Think")
+    think()
+    assert [call.args[0] for call in hook.Add.call_args_list].count("PlayerSay") == 1
+
+    added_hook(hook, "PlayerSay")("ply", "hi")
+    hook.Remove.assert_called_once_with("PlayerSay", aio._EVENT_HOOK_ID)
+    think()
+    assert results == [("ply", "hi")] * 3
+
+
+class HookTable:
+    """Stands in for the Lua hook library: one function per event and identifier."""
+
+    def __init__(self):
+        self.hooks = {}
+
+    def Add(self, event, identifier, func):  # pylint: disable=invalid-name
+        self.hooks.setdefault(event, {})[identifier] = func
+
+    def Remove(self, event, identifier):  # pylint: disable=invalid-name
+        self.hooks.get(event, {}).pop(identifier, None)
+
+    def call(self, event, *args):
+        for func in list(self.hooks.get(event, {}).values()):
+            func(*args)
+
+
+def test_waiting_for_think_keeps_loop_hook():
+    hook = _luastack.lua_globals["hook"] = HookTable()
+    frames = []
+
+    async def task():
+        await aio.hook_event("Think")
+        frames.append(1)
+        await aio.next_frame()
+        frames.append(2)
+
+    aio.create_task(task())
+    for _ in range(4):
+        hook.call("Think")
+    assert frames == [1, 2]
+    assert aio._HOOK_ID in hook.hooks["Think"]
+
+
+def test_sleep(hook):
+    done = []
+
+    async def task():
+        await aio.sleep(0)
+        done.append(True)
+
+    aio.create_task(task())
+    added_hook(hook, "Think")()
+    assert done
+
+
+def test_time_slice_out_of_range():
+    with pytest.raises(ValueError):
+        aio.set_time_slice(-1)
+
+
+def test_has_ready_callbacks():
+    loop = asyncio.new_event_loop()
+    try:
+        assert not aio._has_ready_callbacks(loop)
+        loop.call_soon(print)
+        assert aio._has_ready_callbacks(loop)
+    finally:
+        loop.close()
+    # Loops without the queue of ready callbacks run one iteration per frame
+    assert not aio._has_ready_callbacks(object())
@@ -0,0 +1,63 @@
+import math
+from array import array
+
+import pytest
+
+import _luastack
+from pygmod import batch, lua
+from pygmod.valuetypes import Vector
+
+
+class FakeEntity:
+    def __init__(self, pos, hp):
+        self.pos = pos
+        self.hp = hp
+
+
+def get_pos(ent):
+    if ent is None:
+        raise RuntimeError("Tried to use a NULL entity!")
+    return ent.pos
+
+
+@pytest.fixture(autouse=True)
+def entity_metatable(monkeypatch):
+    monkeypatch.setattr(batch, "numpy", None)
+    _luastack.metatables["Entity"] = {"GetPos": get_pos, "Health": lambda ent: ent.hp}
+    yield
+    _luastack.metatables.clear()
+
+
+def test_positions_from_list():
+    ents = [FakeEntity(Vector(1, 2, 3), 100), FakeEntity(Vector(4, 5, 6), 50)]
+    assert list(batch.positions(ents)) == [1, 2, 3, 4, 5, 6]
+
+
+def test_health_from_table(mocker):
+    mocker.patch("pygmod.lua._helper")
+    lua._helper.return_value.return_value = 2
+    table = lua.Table({1: FakeEntity(Vector(), 100), 2: FakeEntity(Vector(), 25)})
+    assert list(batch.health(table)) == [100, 25]
+
+
+def test_fills_given_buffer():
+    out = array("f", [0.0] * 6)
+    result = batch.positions([FakeEntity(Vector(1, 2, 3), 1)], out)
+    assert result is out
+    assert list(out) == [1, 2, 3, 0, 0, 0]
+
+
+def test_invalid_entity_gives_nan():
+    result = batch.positions([None])
+    assert all(math.isnan(value) for value in result)
+
+
+def test_too_small_buffer():
+    with pytest.raises(ValueError):
+        batch.positions([FakeEntity(Vector(), 1)] * 2, array("d", [0.0] * 3))
+
+
+def test_new_output_without_numpy():
+    out = batch.new_output(2, 3, "q")
+    assert out.typecode == "q"
+    assert list(out) == [0] * 6
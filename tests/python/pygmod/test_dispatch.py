@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+
+import _luastack
+from pygmod import dispatch, lua
+
+
+@pytest.fixture(autouse=True)
+def clean_queue():
+    yield
+    dispatch._calls.clear()
+    dispatch.set_frame_budget(dispatch.DEFAULT_FRAME_BUDGET)
+
+
+def run_in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_call_soon_main_from_thread():
+    calls = []
+    future = run_in_thread(lambda: dispatch.call_soon_main(calls.append, 1))
+    assert not calls and dispatch.pending_calls() == 1
+
+    dispatch._run_pending()
+    assert calls == [1]
+    assert future.result() is None
+    assert dispatch.pending_calls() == 0
+
+
+def test_exception_is_set_on_future():
+    future = dispatch.call_soon_main(int, "not a number")
+    dispatch._run_pending()
+    assert isinstance(future.exception(), ValueError)
+
+
+def test_cancelled_call_is_skipped():
+    calls = []
+    dispatch.call_soon_main(calls.append, 1).cancel()
+    dispatch._run_pending()
+    assert not calls
+
+
+def test_frame_budget():
+    dispatch.set_frame_budget(0)
+    calls = []
+    for i in range(3):
+        dispatch.call_soon_main(calls.append, i)
+    dispatch._run_pending()
+    assert calls == [0]
+    dispatch._run_pending()
+    assert calls == [0, 1]
+
+
+def test_run_in_main():
+    def worker():
+        async def main():
+            task = asyncio.ensure_future(dispatch.run_in_main(pow, 2, 10))
+            while not dispatch.pending_calls():
+                await asyncio.sleep(0)
+            dispatch._run_pending()  # Normally run by the Think hook on the main thread
+            return await task
+
+        return asyncio.run(main())
+
+    assert run_in_thread(worker) == 1024
+
+
+def test_setup_registers_think_hook(lua_hook):
+    dispatch.setup()
+    lua_hook.Add.assert_called_once_with("Think", dispatch._HOOK_ID, dispatch._run_pending)
+
+
+def test_lua_object_collected_in_thread(mocker):
+    free = mocker.patch("_luastack.reference_free")
+    objects = [lua.LuaObject(42)]
+    run_in_thread(objects.clear)  # The last reference is dropped in the thread
+    free.assert_not_called()
+
+    dispatch._run_pending()
+    free.assert_called_once_with(42)
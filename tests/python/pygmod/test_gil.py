@@ -0,0 +1,30 @@
+import pytest
+
+import _luastack
+from pygmod import gil
+
+
+@pytest.fixture(autouse=True)
+def reset_gil_yield():
+    yield
+    _luastack.gil_yield_window = None
+    _luastack.gil_yields[:] = [0, 0.0, 0.0, 0.0]
+
+
+def test_set_yield_window():
+    gil.set_yield_window(0.002)
+    assert _luastack.gil_yield_window == 0.002
+    gil.disable_yield()
+    assert _luastack.gil_yield_window is None
+
+
+def test_set_yield_window_out_of_range():
+    with pytest.raises(ValueError):
+        gil.set_yield_window(-1)
+
+
+def test_stats():
+    _luastack.gil_yields[:] = [3, 0.01, 0.002, 0.001]
+    assert gil.stats() == gil.YieldStats(3, 0.01, 0.002, 0.001)
+    assert gil.stats(reset=True).yields == 3
+    assert gil.stats().yields == 0
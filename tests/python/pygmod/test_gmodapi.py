@@ -0,0 +1,61 @@
+import pytest
+
+import _luastack
+from pygmod import gmodapi
+
+
+@pytest.fixture(autouse=True)
+def lua_globals(lua_hook):  # pylint: disable=unused-argument
+    _luastack.lua_globals["net"] = {"WriteUInt": 1}
+    yield _luastack.lua_globals
+    gmodapi.disable_snapshot()
+    del _luastack.lua_globals["net"]
+
+
+def test_lookup_without_snapshot():
+    assert "net" not in vars(gmodapi)
+    assert gmodapi.net == {"WriteUInt": 1}
+
+
+def test_enable_snapshot(lua_globals):
+    gmodapi.enable_snapshot()
+    assert vars(gmodapi)["net"] == {"WriteUInt": 1}
+    assert vars(gmodapi)["Vector"] is None
+    registered = {call.args[0] for call in lua_globals["hook"].Add.call_args_list}
+    assert registered == set(gmodapi.SNAPSHOT_REFRESH_HOOKS)
+
+
+def test_refresh_and_staleness(lua_globals):
+    gmodapi.enable_snapshot()
+    assert not gmodapi.is_stale("net")
+
+    lua_globals["net"] = {"WriteUInt": 2}
+    assert gmodapi.is_stale("net")
+    assert gmodapi.net == {"WriteUInt": 1}
+
+    refresh = lua_globals["hook"].Add.call_args.args[2]
+    refresh()
+    assert not gmodapi.is_stale("net")
+    assert gmodapi.net == {"WriteUInt": 2}
+
+
+def test_disable_snapshot(lua_globals):
+    gmodapi.enable_snapshot()
+    gmodapi.disable_snapshot()
+    assert "net" not in vars(gmodapi)
+    assert lua_globals["hook"].Remove.call_count == len(gmodapi.SNAPSHOT_REFRESH_HOOKS)
+    assert not gmodapi.is_stale("net")
+
+
+def test_is_stale_unknown_name():
+    with pytest.raises(NameError):
+        gmodapi.is_stale("not_an_api_name")
+    gmodapi.enable_snapshot()
+    with pytest.raises(NameError):
+        gmodapi.is_stale("refresh_snapshot")
+
+
+def test_is_stale_name_missing_from_snapshot():
+    gmodapi.enable_snapshot()
+    del vars(gmodapi)["net"]
+    assert gmodapi.is_stale("net")
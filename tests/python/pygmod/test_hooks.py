@@ -0,0 +1,75 @@
+import pytest
+
+from pygmod import hooks
+
+
+@pytest.fixture(autouse=True)
+def hook(lua_hook):
+    yield lua_hook
+    hooks._events.clear()
+    hooks.disable_timing()
+
+
+def dispatcher(hook, event):
+    return next(call.args[2] for call in hook.Add.call_args_list if call.args[0] == event)
+
+
+def test_one_dispatcher_per_event(hook):
+    calls = []
+    hooks.on("Think", lambda: calls.append(1))
+    hooks.on("Think", lambda: calls.append(2))
+    hook.Add.assert_called_once()
+
+    dispatcher(hook, "Think")()
+    assert calls == [1, 2]
+
+
+def test_priorities_and_early_return(hook):
+    calls = []
+
+    @hooks.on("PlayerSay", priority=hooks.PRIORITY_LOW)
+    def low(_ply, _text):
+        calls.append("low")
+
+    @hooks.on("PlayerSay", priority=hooks.PRIORITY_HIGH)
+    def high(_ply, text):
+        calls.append("high")
+        return "" if text == "mute me" else None
+
+    assert dispatcher(hook, "PlayerSay")("ply", "hello") is None
+    assert calls == ["high", "low"]
+    assert dispatcher(hook, "PlayerSay")("ply", "mute me") == ""
+    assert calls == ["high", "low", "high"]
+
+
+def test_exception_doesnt_stop_other_handlers(hook):
+    calls = []
+    hooks.on("Think", lambda: 1 / 0)
+    hooks.on("Think", lambda: calls.append(1))
+    dispatcher(hook, "Think")()
+    assert calls == [1]
+
+
+def test_off_removes_dispatcher(hook):
+    def handler():
+        pass
+
+    hooks.on("Tick", handler)
+    hooks.off("Tick", handler)
+    hook.Remove.assert_called_once_with("Tick", hooks._HOOK_ID)
+    assert not hooks.timings()
+
+
+def test_timings(hook):
+    def handler():
+        pass
+
+    hooks.on("Think", handler)
+    hooks.enable_timing()
+    dispatcher(hook, "Think")()
+    dispatcher(hook, "Think")()
+
+    (timing,) = hooks.timings()
+    assert timing.event == "Think" and timing.handler is handler and timing.calls == 2
+    hooks.reset_timings()
+    assert hooks.timings()[0].calls == 0
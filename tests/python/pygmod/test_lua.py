@@ -38,28 +38,62 @@ def test_auto_pop_from_non_empty_stack():
     assert _luastack.top() == 2
 
 
-def test_exec_no_error(mocker):
-    mocker.patch("pygmod.lua.G")
-    lua.G.RunString.return_value = None
-    lua.exec_lua("")  # Shouldn't raise LuaError
+def test_auto_pop_wrapper_attributes():
+    def func():
+        """Docstring."""
 
+    wrapper = lua.auto_pop(func)
+    assert wrapper.__name__ == "func"
+    assert wrapper.__doc__ == "Docstring."
+    assert wrapper.__wrapped__ is func
 
-def test_exec_error(mocker):
+
+@pytest.fixture
+def chunk_cache(mocker):
     mocker.patch("pygmod.lua.G")
-    lua.G.RunString.return_value = "you should not see a LuaError"
+    cache = lua.ChunkCache(maxsize=2)
+    mocker.patch("pygmod.lua.chunk_cache", cache)
+    return cache
+
+
+def test_exec(chunk_cache):
+    lua.exec_lua("a = 1")
+    lua.G.CompileString.assert_called_with("a = 1", "<pygmod exec_lua()>", False)
+    lua.G.CompileString.return_value.assert_called_with()
+
+
+def test_exec_compile_error(chunk_cache):
+    lua.G.CompileString.return_value = "you should not see a LuaError"
     with pytest.raises(lua.LuaError):
         lua.exec_lua("")
 
 
-def test_eval(mocker):
-    mocker.patch("pygmod.lua.exec_lua")
-    mocker.patch.object(lua.G, "_get")
-    lua.G._get.return_value = 1
+def test_eval(chunk_cache):
+    lua.G.CompileString.return_value.return_value = 1
     result = lua.eval_lua("smth")
-    lua.exec_lua.assert_called_with("_pygmod_eval_result = smth")
+    lua.G.CompileString.assert_called_with("return smth", "<pygmod eval_lua()>", False)
     assert result == 1
 
 
+def test_chunk_cache_hits(chunk_cache):
+    lua.exec_lua("a = 1")
+    lua.exec_lua("a = 1")
+    lua.G.CompileString.assert_called_once()
+    assert chunk_cache.info() == lua.ChunkCacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+
+
+def test_chunk_cache_eviction(chunk_cache):
+    lua.exec_lua("a = 1")
+    lua.exec_lua("a = 2")
+    lua.exec_lua("a = 1")  # "a = 2" is the least recently used now
+    lua.exec_lua("a = 3")
+    lua.exec_lua("a = 1")
+    assert chunk_cache.info().currsize == 2
+    assert lua.G.CompileString.call_count == 3
+    chunk_cache.resize(0)
+    assert chunk_cache.info().currsize == 0
+
+
 @pytest.fixture
 def base_get_namespace_instance():
     class A(lua.BaseGetNamespace):
@@ -153,10 +187,16 @@ def test_lua_namespace_delattr_underscore(lua_namespace_instance):
     assert not hasattr(lua_namespace_instance, "_to_delete")
 
 
+def callable_from_stack():
+    """Wraps the function on the top of the mock Lua stack in a CallableLuaObject."""
+    _luastack.push(-1)
+    return lua.CallableLuaObject(_luastack.reference_create())
+
+
 def test_callable_constructor(mocker):
     mock = mocker.Mock()
     _luastack.stack.append(mock)
-    func = lua._lua_func_from_stack(-1)
+    func = callable_from_stack()
     assert mock == _luastack.references[func._ref]
 
 
@@ -168,7 +208,7 @@ def test_callable_returns_none(mocker):
 
     mock = mocker.Mock()
     _luastack.stack.append(mock)
-    func = lua._lua_func_from_stack(-1)
+    func = callable_from_stack()
     returned_value = func(1, 2, 3)
     assert returned_value is None
 
@@ -182,7 +222,7 @@ def test_callable_returns_one_val(mocker):
 
     mock = mocker.Mock()
     _luastack.stack.append(mock)
-    func = lua._lua_func_from_stack(-1)
+    func = callable_from_stack()
     returned_value = func(1, 2, 3)
     assert returned_value == "returned value"
 
@@ -197,11 +237,24 @@ def test_callable_returns_many_vals(mocker):
 
     mock = mocker.Mock()
     _luastack.stack.append(mock)
-    func = lua._lua_func_from_stack(-1)
+    func = callable_from_stack()
     returned_value = func(1, 2, 3)
     assert returned_value == ("returned value 1", "returned value 2")
 
 
+def test_callable_map(mocker):
+    def call(n_args, _):
+        args = _luastack.stack[-n_args:]
+        _luastack.pop(n_args + 1)
+        _luastack.stack.append(sum(args))
+
+    mocker.patch("_luastack.call", side_effect=call)
+
+    _luastack.stack.append(mocker.Mock())
+    func = callable_from_stack()
+    assert func.map([(1, 2), (3, 4), 5]) == [3, 7, 5]
+
+
 def test_method_call_namespace(mocker):
     mock = mocker.Mock()
     table = {"method": mock}
@@ -217,6 +270,21 @@ def test_method_call_namespace(mocker):
     a["method"]()
     mock.assert_called_with(table)
 
+
+def test_method_call_namespace_on_table(mocker):
+    mock = mocker.Mock(return_value=100)
+    tbl = lua.Table({"Health": mock})
+    assert tbl._.Health() == 100
+    mock.assert_called_with(_luastack.references[tbl._ref])
+
+
+def test_table_method(mocker):
+    mock = mocker.Mock(return_value=(1, 2))
+    tbl = lua.Table({"GetPos": mock})
+    get_pos = tbl.method("GetPos")
+    assert get_pos(3) == (1, 2)
+    mock.assert_called_with(_luastack.references[tbl._ref], 3)
+
 # TODO: Table tests: iterator classes
 
 
@@ -227,14 +295,98 @@ def test_table_from_dict():
 
 
 def test_table_from_list(mocker):
-    mocker.patch("pygmod.lua.G")
+    mocker.patch("pygmod.lua._helper")
     i = [1, 2, [3, 4, {"a": "?"}]]
-    lua.Table(i)
+    tbl = lua.Table(i)
+
+    lua._helper.assert_called_with("insert_many")
+    lua._helper.return_value.assert_called_with(tbl, *i)
+
+
+def test_table_len(mocker):
+    mocker.patch("pygmod.lua._helper")
+    lua._helper.return_value.return_value = 3
+    tbl = lua.Table()
+    assert len(tbl) == 3
+    lua._helper.assert_called_with("len")
+
+
+def test_table_get_many(mocker):
+    mocker.patch("pygmod.lua._helper")
+    tbl = lua.Table()
+    lua._helper.return_value.return_value = 1
+    assert tbl.get_many("a") == (1,)
+    lua._helper.return_value.return_value = (1, 2)
+    assert tbl.get_many("a", "b") == (1, 2)
+    lua._helper.return_value.return_value = None
+    assert tbl.get_many() == ()
 
-    table_insert_calls = lua.G.table.insert.call_args_list
-    table_insert_call_args = [call[0] for call in table_insert_calls]
-    table_insert_call_second_args = [args[1] for args in table_insert_call_args]
-    assert table_insert_call_second_args == i
+
+def test_table_extend_large_iterable(mocker):
+    mocker.patch("pygmod.lua._helper")
+    tbl = lua.Table()
+    tbl.extend(range(5000))
+
+    calls = lua._helper.return_value.call_args_list
+    assert len(calls) == 5000 // lua.HELPER_BATCH_SIZE
+    assert all(len(call.args) == lua.HELPER_BATCH_SIZE + 1 for call in calls)
+    assert [value for call in calls for value in call.args[1:]] == list(range(5000))
+
+
+def test_table_get_many_large(mocker):
+    mocker.patch("pygmod.lua._helper")
+    lua._helper.return_value.side_effect = lambda tbl, *keys: keys if len(keys) > 1 else keys[0]
+    tbl = lua.Table()
+    keys = tuple(range(lua.HELPER_BATCH_SIZE * 2 + 1))
+    assert tbl.get_many(*keys) == keys
+    assert lua._helper.return_value.call_count == 3
+
+
+def test_helper_is_cached():
+    lua._helpers.clear()
+    assert lua._helper("len") is lua._helper("len")
+    assert lua._helper("len")._ref == _luastack.helper_ref("len")
+
+
+def test_table_get_set():
+    tbl = lua.Table({"a": 1})
+    assert tbl.a == tbl["a"] == 1
+    tbl.b = 2
+    tbl[3] = "c"
+    assert _luastack.references[tbl._ref] == {"a": 1, "b": 2, 3: "c"}
+    assert _luastack.top() == 0
+
+
+def test_globals_get_set():
+    lua.G.abc = 1
+    assert lua.G["abc"] == 1
+    del lua.G.abc
+    assert lua.G.abc is None
+    assert _luastack.top() == 0
+
+
+def test_resolve_is_cached():
+    handle = lua.resolve("net.WriteUInt")
+    assert handle is lua.resolve("net.WriteUInt")
+    assert handle.path == "net.WriteUInt"
+
+
+def test_resolve_follows_reassignment(mocker):
+    first, second = mocker.Mock(return_value=1), mocker.Mock(return_value=2)
+    _luastack.lua_globals["net"] = {"WriteUInt": first}
+    handle = lua.resolve("net.WriteUInt")
+    assert handle(5, 8) == 1
+    first.assert_called_with(5, 8)
+
+    _luastack.lua_globals["net"] = {"WriteUInt": second}
+    assert handle(5, 8) == 2
+    assert handle.get() is second
+    del _luastack.lua_globals["net"]
+
+
+def test_registry_stats(mocker):
+    mocker.patch.dict(_luastack.registry_counts, live=3, freed=10, peak=5)
+    assert lua.registry_stats() == {"live": 3, "freed": 10, "peak": 5}
 
 
 def test_table_unknown_constructor_arg():
@@ -249,3 +401,38 @@ def test_table_call(mocker):
     t = lua.Table()
     t(1, 2, 3)
     t.__call__.assert_called_with(1, 2, 3)
+
+
+def test_table_from_mapping_recursive():
+    d = {"a": 1, "b": {"c": [1, 2]}}
+    tbl = lua.Table.from_mapping(d, recursive=True)
+    assert _luastack.references[tbl._ref] == {"a": 1, "b": {"c": {1: 1, 2: 2}}}
+
+
+def test_table_from_mapping_too_deep():
+    nested = []
+    for _ in range(lua.DEFAULT_MAX_DEPTH):
+        nested = [nested]
+    lua.Table.from_mapping({"a": nested[0]}, recursive=True)  # Exactly DEFAULT_MAX_DEPTH levels deep
+    with pytest.raises(RecursionError):
+        lua.Table.from_mapping({"a": nested}, recursive=True)
+
+
+def test_table_update():
+    tbl = lua.Table({"a": 1})
+    tbl.update({"a": 2, "b": 3})
+    assert _luastack.references[tbl._ref] == {"a": 2, "b": 3}
+
+
+def test_table_to_dict():
+    tbl = lua.Table({"a": 1, "b": {"c": 2}})
+    assert tbl.to_dict() == {"a": 1, "b": {"c": 2}}
+
+
+def test_table_to_dict_recursive_cycle():
+    tbl = lua.Table()
+    inner = {"x": 1}
+    inner["self"] = inner
+    tbl["inner"] = inner
+    result = tbl.to_dict(recursive=True)
+    assert result["inner"]["self"] is result["inner"]
@@ -0,0 +1,124 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pygmod import dispatch, offload
+
+# The autouse fixture replaces find_python(), the tests of the lookup restore it
+FIND_PYTHON = offload.find_python
+requires_posix_shell = pytest.mark.skipif(sys.platform == "win32",
+                                          reason="fake executables are shell scripts")
+
+
+@pytest.fixture(autouse=True)
+def thread_pool(mocker, lua_hook):
+    # Worker processes can't import the mock _luastack, so threads stand in for them
+    mocker.patch("pygmod.offload.ProcessPoolExecutor",
+                 side_effect=lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    mocker.patch("pygmod.offload.find_python", return_value=sys.executable)
+    yield lua_hook
+    offload.shutdown()
+    dispatch._calls.clear()
+
+
+def wait_for_dispatch(future):
+    while not future.done():
+        dispatch._run_pending()
+
+
+def test_result_is_delivered_on_main_thread(lua_hook):
+    future = offload.submit(pow, 2, 10)
+    wait_for_dispatch(future)
+    assert future.result() == 1024
+    lua_hook.Add.assert_called_once_with("ShutDown", offload._HOOK_ID, offload._shutdown_on_hook)
+
+
+def test_exception_is_delivered():
+    future = offload.submit(int, "not a number")
+    wait_for_dispatch(future)
+    assert isinstance(future.exception(), ValueError)
+
+
+def test_cancel_cancels_the_worker_call():
+    offload.set_max_workers(1)
+    release = threading.Event()
+    calls = []
+    try:
+        blocking = offload.submit(release.wait)
+        queued = offload.submit(calls.append, "queued")
+        assert queued.cancel()
+    finally:
+        release.set()
+        offload.set_max_workers(None)
+    wait_for_dispatch(blocking)
+    offload.shutdown()
+    assert not calls
+    dispatch._run_pending()
+    assert queued.cancelled()
+
+
+def test_no_python_for_workers(mocker):
+    mocker.patch("pygmod.offload.find_python", return_value=None)
+    with pytest.raises(RuntimeError):
+        offload.submit(pow, 2, 10)
+
+
+def fake_python(directory, name, output):
+    """Creates an executable named ``name`` in ``directory`` which prints ``output``."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_text(f"#!/bin/sh\necho {output}\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def real_find_python(monkeypatch, tmp_path):
+    monkeypatch.setattr(offload, "find_python", FIND_PYTHON)
+    monkeypatch.delenv(offload.PYTHON_ENV_VAR, raising=False)
+    monkeypatch.setattr(sys, "prefix", str(tmp_path / "prefix"))
+    monkeypatch.setenv("PATH", str(tmp_path / "path"))
+    return tmp_path
+
+
+def test_find_python_from_env(real_find_python, monkeypatch):
+    monkeypatch.setenv(offload.PYTHON_ENV_VAR, "/opt/python/bin/python3")
+    assert offload.find_python() == "/opt/python/bin/python3"
+
+
+@requires_posix_shell
+def test_find_python_in_prefix(real_find_python):
+    major, minor = sys.version_info[:2]
+    in_prefix = fake_python(real_find_python / "prefix" / "bin", f"python{major}.{minor}",
+                            f"{major} {minor}")
+    fake_python(real_find_python / "path", f"python{major}.{minor}", f"{major} {minor}")
+    assert offload.find_python() == in_prefix
+
+
+@requires_posix_shell
+def test_find_python_checks_the_version(real_find_python):
+    major, minor = sys.version_info[:2]
+    fake_python(real_find_python / "prefix" / "bin", f"python{major}.{minor}",
+                f"{major} {minor + 1}")
+    in_path = fake_python(real_find_python / "path", f"python{major}.{minor}", f"{major} {minor}")
+    assert offload.find_python() == in_path
+
+
+@requires_posix_shell
+def test_find_python_without_matching_version(real_find_python):
+    major, minor = sys.version_info[:2]
+    fake_python(real_find_python / "path", f"python{major}.{minor}", "not python")
+    assert offload.find_python() is None
+
+
+@requires_posix_shell
+def test_py_launcher_python(real_find_python):
+    fake_python(real_find_python / "path", "py.exe", "/opt/python/python.exe")
+    assert offload._py_launcher_python("3.11") == "/opt/python/python.exe"
+
+
+def test_set_max_workers_out_of_range():
+    with pytest.raises(ValueError):
+        offload.set_max_workers(0)
@@ -0,0 +1,73 @@
+import pytest
+
+import _luastack
+from pygmod import stats
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    yield
+    for name in _luastack.bridge_counters:
+        _luastack.bridge_counters[name] = (0, 0.0)
+    _luastack.call_site_prefix = None
+    _luastack.call_site_counts.clear()
+
+
+@pytest.fixture
+def lua_globals(mocker):
+    _luastack.lua_globals.update(SERVER=True, IsValid=mocker.Mock(return_value=False),
+                                 concommand=mocker.Mock())
+    yield _luastack.lua_globals
+    for name in ("SERVER", "IsValid", "concommand"):
+        del _luastack.lua_globals[name]
+
+
+def test_counters():
+    _luastack.bridge_counters["lua_call"] = (120, 60.0)
+    counters = stats.counters()
+    assert set(counters) == set(stats.COUNTERS)
+    assert counters["lua_call"] == stats.Stat(120, 60.0)
+    assert counters["lua_call"].rate == 60.0
+
+
+def test_verbose_skips_package():
+    stats.enable_verbose()
+    assert stats.__file__.startswith(_luastack.call_site_prefix)
+    stats.disable_verbose()
+    assert _luastack.call_site_prefix is None
+
+
+def test_call_sites_sorted():
+    _luastack.call_site_counts.update({"a.py:1": {"lua_call": 1},
+                                       "b.py:2": {"lua_call": 5, "convert_py_to_lua": 10}})
+    assert list(stats.call_sites()) == ["b.py:2", "a.py:1"]
+    assert stats.call_sites(reset=True)["a.py:1"] == {"lua_call": 1}
+    assert stats.call_sites() == {}
+
+
+def test_format_report():
+    _luastack.bridge_counters["python_call"] = (7, 3.5)
+    _luastack.call_site_counts["addon.py:12"] = {"lua_call": 4}
+    report = stats.format_report()
+    assert "python_call" in report
+    assert "3.5" in report
+    assert "addon.py:12: lua_call=4" in report
+
+
+def test_command(lua_globals, capsys):
+    stats.setup()
+    lua_globals["concommand"].Add.assert_called_once_with("pygmod_stats", stats._command)
+
+    stats._command(None, "pygmod_stats", None, "verbose")
+    assert _luastack.call_site_prefix is not None
+    stats._command(None, "pygmod_stats", None, "")
+    assert "realm_swap" in capsys.readouterr().out
+    stats._command(None, "pygmod_stats", None, "quiet")
+    assert _luastack.call_site_prefix is None
+
+
+def test_command_from_player(lua_globals, capsys):
+    lua_globals["IsValid"].return_value = True
+    stats._command(object(), "pygmod_stats", None, "verbose")
+    assert _luastack.call_site_prefix is None
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+import _luastack
+from pygmod import _streams, dispatch
+
+
+@pytest.fixture(autouse=True)
+def console(mocker):
+    _luastack.lua_globals.update(Msg=mocker.Mock(), MsgC=mocker.Mock(),
+                                 Color=mocker.Mock(return_value="red"))
+    yield _luastack.lua_globals
+    dispatch._calls.clear()
+    for name in ("Msg", "MsgC", "Color"):
+        del _luastack.lua_globals[name]
+
+
+def write_in_thread(stream, s):
+    thread = threading.Thread(target=stream.write, args=(s,))
+    thread.start()
+    thread.join()
+
+
+def test_out_writes_in_main_thread(console):
+    assert _streams.GmodConsoleOut().write("hello") == 5
+    console["Msg"].assert_called_once_with("hello")
+
+
+def test_out_write_from_thread_is_dispatched(console):
+    write_in_thread(_streams.GmodConsoleOut(), "hello")
+    console["Msg"].assert_not_called()
+
+    dispatch._run_pending()
+    console["Msg"].assert_called_once_with("hello")
+
+
+def test_err_write_from_thread_is_dispatched(console):
+    write_in_thread(_streams.GmodConsoleErr(), "oops")
+    console["MsgC"].assert_not_called()
+
+    dispatch._run_pending()
+    console["MsgC"].assert_called_once_with("red", "oops")
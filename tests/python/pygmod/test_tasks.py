@@ -0,0 +1,113 @@
+import pytest
+
+from pygmod import hooks, tasks
+
+
+@pytest.fixture(autouse=True)
+def clean_tasks(lua_hook):  # pylint: disable=unused-argument
+    yield
+    for queue in tasks._queues:
+        queue.clear()
+    hooks._events.clear()
+    tasks.set_frame_budget(tasks.DEFAULT_FRAME_BUDGET)
+
+
+def counter(log, label, steps):
+    for i in range(steps):
+        log.append((label, i))
+        yield
+    return label
+
+
+def test_generator_task_result():
+    log = []
+    task = tasks.spawn(counter(log, "a", 3))
+    assert "Think" in hooks._events
+    tasks._run()
+    assert task.done() and task.result() == "a"
+    assert len(log) == 3
+    assert "Think" not in hooks._events
+
+
+def test_coroutine_task():
+    steps = []
+
+    async def job():
+        steps.append(1)
+        await tasks.yield_now()
+        steps.append(2)
+        return "done"
+
+    task = tasks.spawn(job())
+    tasks._run()
+    assert steps == [1, 2] and task.result() == "done"
+
+
+def test_frame_budget_runs_one_step():
+    tasks.set_frame_budget(0)
+    log = []
+    tasks.spawn(counter(log, "a", 3))
+    tasks.spawn(counter(log, "b", 3))
+    tasks._run()
+    assert log == [("a", 0)]
+    tasks._run()
+    assert log == [("a", 0), ("b", 0)]
+
+
+def test_priority_weights():
+    log = []
+    tasks.spawn(counter(log, "low", 10), priority=tasks.PRIORITY_LOW)
+    tasks.spawn(counter(log, "high", 10), priority=tasks.PRIORITY_HIGH)
+    tasks._run_round(float("inf"))
+    labels = [label for label, _ in log]
+    assert labels == ["high"] * 4 + ["low"]
+
+
+def test_cancel():
+    log = []
+    task = tasks.spawn(counter(log, "a", 3))
+    task.cancel()
+    tasks._run()
+    assert not log and task.cancelled()
+    with pytest.raises(RuntimeError):
+        task.result()
+
+
+def test_cancel_from_inside_the_task():
+    log = []
+
+    def job():
+        log.append(1)
+        task.cancel()
+        yield
+        log.append(2)
+
+    task = tasks.spawn(job())
+    tasks._run()
+    assert log == [1]
+    assert task.done() and task.cancelled()
+    assert "Think" not in hooks._events
+
+
+def test_zero_frame_budget_reports_no_steps(caplog):
+    tasks.set_frame_budget(0)
+    tasks.spawn(counter([], "a", 1))
+    tasks._run()
+    assert "over the frame budget" not in caplog.text
+
+
+def test_exception_and_over_budget_report(caplog):
+    tasks.set_frame_budget(1e-9)
+
+    def failing():
+        yield
+        raise ValueError("broken")
+
+    task = tasks.spawn(failing(), name="failing")
+    tasks._run()
+    assert tasks.stats()[0].over_budget_steps == 1
+    tasks._run()
+    with pytest.raises(ValueError):
+        task.result()
+    assert "over the frame budget" in caplog.text
+    assert "Exception in task 'failing'" in caplog.text
@@ -0,0 +1,93 @@
+import pytest
+
+import _luastack
+from pygmod import hooks, timers
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clock(lua_hook):  # pylint: disable=unused-argument
+    clock = _luastack.lua_globals["CurTime"] = Clock()
+    yield clock
+    timers._heap.clear()
+    timers._cancelled_in_heap = 0
+    hooks._events.clear()
+    del _luastack.lua_globals["CurTime"]
+
+
+def tick(clock, now):
+    clock.now = now
+    timers._advance()
+
+
+def test_simple(clock):
+    calls = []
+    timer = timers.simple(1, calls.append, "fired")
+    tick(clock, 0.5)
+    assert not calls and timer.active
+    tick(clock, 1)
+    assert calls == ["fired"]
+    assert not timer.active and timers.count() == 0
+
+
+def test_repetitions(clock):
+    calls = []
+    timers.create(1, 3, calls.append, 1)
+    for now in range(1, 6):
+        tick(clock, now)
+    assert calls == [1, 1, 1]
+
+
+def test_cancel(clock):
+    calls = []
+    timer = timers.create(1, 0, calls.append, 1)
+    tick(clock, 1)
+    timer.cancel()
+    tick(clock, 2)
+    assert calls == [1]
+    assert timers.count() == 0
+
+
+def test_cancel_from_callback(clock):
+    calls = []
+    later = []
+    timers.simple(1, lambda: later[0].cancel())
+    # Due in the same tick, after the cancelling timer
+    later.append(timers.simple(1, calls.append, 2))
+    first = timers.simple(0.5, calls.append, 1)
+    tick(clock, 1)
+    assert calls == [1]
+    assert not first.active and not later[0].active
+
+
+def test_many_cancelled_timers_are_compacted():
+    timers_ = [timers.create(1, 0, print) for _ in range(100)]
+    for timer in timers_[:60]:
+        timer.cancel()
+    # The heap is compacted when the 51st timer is cancelled
+    assert len(timers._heap) == 49
+    assert timers.count() == 40
+
+
+def test_jitter(clock, mocker):
+    mocker.patch("pygmod.timers.uniform", return_value=0.25)
+    calls = []
+    timers.create(1, 0, calls.append, 1, jitter=0.5)
+    tick(clock, 1)
+    assert not calls
+    tick(clock, 1.25)
+    assert calls == [1]
+
+
+def test_tick_hook_is_removed_when_idle(clock):
+    timers.simple(1, print)
+    assert "Tick" in hooks._events
+    tick(clock, 1)
+    assert "Tick" not in hooks._events
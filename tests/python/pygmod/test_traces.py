@@ -0,0 +1,52 @@
+from array import array
+
+import pytest
+
+import _luastack
+from pygmod import batch, lua, traces
+from pygmod.valuetypes import Vector
+
+
+def trace_line(trace):
+    # Everything below z = 0 is a wall of the entity 5
+    start, end = Vector(*trace["start"]), Vector(*trace["endpos"])
+    if end.z >= 0:
+        return {"Hit": False, "HitPos": end, "Fraction": 1.0, "HitNormal": Vector(), "Entity": None}
+    fraction = start.z / (start.z - end.z)
+    return {"Hit": True, "HitPos": start + (end - start) * fraction, "Fraction": fraction,
+            "HitNormal": Vector(0, 0, 1), "Entity": 5}
+
+
+@pytest.fixture(autouse=True)
+def util(mocker):
+    mocker.patch.object(batch, "numpy", None)
+    _luastack.lua_globals["util"] = {"TraceLine": trace_line,
+                                     "TraceHull": mocker.Mock(side_effect=trace_line)}
+    yield _luastack.lua_globals["util"]
+    _luastack.lua_globals.clear()
+
+
+def test_trace_lines():
+    starts = array("d", [0, 0, 10, 0, 0, 10])
+    ends = array("d", [0, 0, 5, 0, 0, -10])
+    result = traces.trace_lines(starts, ends)
+    assert list(result.fraction) == [1.0, 0.5]
+    assert list(result.hit_pos) == [0, 0, 5, 0, 0, 0]
+    assert list(result.normal)[3:] == [0, 0, 1]
+    assert list(result.entity) == [-1, 5]
+
+
+def test_trace_lines_into_given_arrays():
+    out = traces.TraceResults(None, array("f", [0.0]), None, None)
+    result = traces.trace_lines(array("f", [0, 0, 10]), array("f", [0, 0, -10]), out=out)
+    assert result is out
+    assert list(out.fraction) == [0.5]
+
+
+def test_trace_hulls_share_the_box(util, mocker):
+    mocker.patch("pygmod.lua._helper")
+    mins, maxs = Vector(-1, -1, -1), Vector(1, 1, 1)
+    traces.trace_hulls(array("d", [0, 0, 1]), array("d", [0, 0, 2]), mins, maxs, filter=["ent"])
+    trace = util["TraceHull"].call_args.args[0]
+    assert (trace["mins"], trace["maxs"]) == (mins, maxs)
+    assert isinstance(trace["filter"], lua.Table)
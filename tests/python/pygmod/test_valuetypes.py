@@ -0,0 +1,79 @@
+import pytest
+
+import _luastack
+from pygmod.valuetypes import Vector, Angle, Color
+
+
+def test_vector_components_are_floats():
+    v = Vector(1, 2, 3)
+    assert (v.x, v.y, v.z) == (1.0, 2.0, 3.0)
+    assert isinstance(v.x, float)
+
+
+def test_vector_has_no_dict():
+    with pytest.raises(AttributeError):
+        Vector().w = 1
+
+
+def test_vector_arithmetic():
+    a = Vector(1, 2, 3)
+    b = Vector(4, 5, 6)
+    assert a + b == Vector(5, 7, 9)
+    assert b - a == Vector(3, 3, 3)
+    assert a * 2 == 2 * a == Vector(2, 4, 6)
+    assert a * b == Vector(4, 10, 18)
+    assert b / 2 == Vector(2, 2.5, 3)
+    assert -a == Vector(-1, -2, -3)
+
+
+def test_vector_math():
+    v = Vector(3, 4, 0)
+    assert v.length() == 5
+    assert v.length_sqr() == 25
+    assert v.distance(Vector()) == 5
+    assert v.normalized() == Vector(0.6, 0.8, 0)
+    assert Vector().normalized() == Vector()
+    assert Vector(1, 0, 0).dot(Vector(0, 1, 0)) == 0
+    assert Vector(1, 0, 0).cross(Vector(0, 1, 0)) == Vector(0, 0, 1)
+
+
+def test_vector_angle_round_trip():
+    direction = Angle(30, 60, 0).forward()
+    assert direction.angle().p == pytest.approx(30)
+    assert direction.angle().y == pytest.approx(60)
+    assert Vector(0, 0, 1).angle() == Angle(270, 0, 0)
+
+
+def test_angle_directions():
+    a = Angle(0, 90, 0)
+    assert list(a.forward()) == pytest.approx([0, 1, 0], abs=1e-9)
+    assert list(a.right()) == pytest.approx([1, 0, 0], abs=1e-9)
+    assert list(a.up()) == pytest.approx([0, 0, 1], abs=1e-9)
+
+
+def test_angle_aliases_and_normalization():
+    a = Angle(10, 370, -190)
+    a.pitch = 20
+    assert a.p == 20
+    assert a.yaw == 370
+    assert a.normalized() == Angle(20, 10, 170)
+
+
+def test_color():
+    c = Color(255, 128, 0)
+    assert tuple(c) == (255, 128, 0, 255)
+    assert c == Color(255, 128, 0, 255)
+    assert c != Color(0, 0, 0)
+    assert repr(c) == "Color(255, 128, 0, 255)"
+
+
+def test_lua_methods(mocker):
+    def normalize(vec):
+        vec.x, vec.y, vec.z = vec.normalized()
+
+    mocker.patch.dict(_luastack.metatables, {"Vector": {"Normalize": normalize, "Dot": Vector.dot}})
+    v = Vector(3, 4, 0)
+    assert v._.Dot(Vector(1, 0, 0)) == 3
+    # Methods which modify the Lua copy in place modify the Python value too
+    assert v._.Normalize() is None
+    assert v == Vector(0.6, 0.8, 0)
@@ -0,0 +1,58 @@
+import logging
+
+import pytest
+
+import _luastack
+from pygmod import watchdog
+
+
+@pytest.fixture(autouse=True)
+def lua_globals(lua_hook):  # pylint: disable=unused-argument
+    _luastack.lua_globals["engine"] = {"TickInterval": lambda: 0.015}
+    yield _luastack.lua_globals
+    watchdog.disable()
+    _luastack.watchdog_running = None
+    _luastack.watchdog_records.clear()
+    del _luastack.lua_globals["engine"]
+
+
+def test_enable_with_tick_threshold(lua_globals):
+    watchdog.enable()
+    assert _luastack.watchdog_threshold == 0.015
+    assert watchdog._sampler.is_alive()
+    lua_globals["hook"].Add.assert_called_once_with("ShutDown", watchdog._HOOK_ID,
+                                                    watchdog._disable_on_hook)
+
+    watchdog.disable()
+    assert _luastack.watchdog_threshold is None
+    assert watchdog._sampler is None
+
+
+def test_sampler_logs_stack_once(caplog):
+    sampler = watchdog._Sampler(0.01, 1)
+    _luastack.watchdog_running = (7, 0.005)
+    sampler.sample()
+    assert not caplog.records
+
+    _luastack.watchdog_running = (7, 0.02)
+    with caplog.at_level(logging.WARNING, "pygmod.watchdog"):
+        sampler.sample()
+        sampler.sample()
+    assert len(caplog.records) == 1
+    assert "Callback #7 has been running for 20.0 ms" in caplog.text
+    assert "test_sampler_logs_stack_once" in caplog.text  # The stack of the main thread
+
+
+def test_report_slow(caplog):
+    with caplog.at_level(logging.WARNING, "pygmod.watchdog"):
+        watchdog._report_slow("think (addon.py:1)", 0.03, 3)
+    assert "Callback #3 think (addon.py:1) took 30.0 ms" in caplog.text
+
+
+def test_stats_sorted_by_total_time():
+    histogram = (0,) * (len(watchdog.BUCKET_BOUNDS) + 1)
+    _luastack.watchdog_records[:] = [("fast", 10, 0.001, 0.0002, histogram),
+                                     ("slow", 2, 0.05, 0.04, histogram)]
+    assert [callback.name for callback in watchdog.stats()] == ["slow", "fast"]
+    assert watchdog.stats(reset=True)[0].calls == 2
+    assert not watchdog.stats()